@@ -1,3 +1,11 @@
 from django.contrib import admin
 
 # Register your models here.
+from .models import LLMResponseCache
+
+
+@admin.register(LLMResponseCache)
+class LLMResponseCacheAdmin(admin.ModelAdmin):
+    list_display = ['transcript_hash', 'prompt_version', 'model', 'size', 'hits', 'last_used_at']
+    list_filter = ['model', 'prompt_version']
+    readonly_fields = ['response']
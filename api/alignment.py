@@ -0,0 +1,111 @@
+import numpy as np
+
+
+def diarization_turns(diarization_result):
+    """Flattens a pyannote annotation into (starts, ends, speakers) arrays sorted by start time."""
+    starts, ends, speakers = [], [], []
+    for turn, _, speaker in diarization_result.itertracks(yield_label=True):
+        starts.append(turn.start)
+        ends.append(turn.end)
+        speakers.append(speaker)
+
+    starts = np.asarray(starts, dtype=float)
+    ends = np.asarray(ends, dtype=float)
+    speakers = np.asarray(speakers, dtype=object)
+    order = np.argsort(starts, kind='stable')
+    return starts[order], ends[order], speakers[order]
+
+
+def assign_words_to_turns(word_starts, word_ends, turn_starts, turn_ends):
+    """Returns the index of the speaker turn each word belongs to.
+
+    Turns must be sorted by start time. A word belongs to the turn covering its midpoint. Where
+    turns overlap, the latest-starting turn wins if it covers the midpoint; otherwise the word goes
+    to the earlier turn reaching furthest in time. Words falling in silence between turns go to
+    the nearest turn. All words are placed with one vectorized binary search over the turn
+    starts, so the cost is O(words log turns) instead of a per-word scan over every turn.
+    """
+    word_starts = np.asarray(word_starts, dtype=float)
+    word_ends = np.asarray(word_ends, dtype=float)
+    turn_starts = np.asarray(turn_starts, dtype=float)
+    turn_ends = np.asarray(turn_ends, dtype=float)
+
+    if len(turn_starts) == 0:
+        raise ValueError("Cannot align words without speaker turns")
+    if len(word_starts) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    midpoints = (word_starts + word_ends) / 2
+
+    # For each prefix of turns, the turn reaching furthest in time. With overlapping turns this
+    # is the one that can still cover a word even if a later, shorter turn started after it.
+    furthest = np.maximum.accumulate(turn_ends)
+    furthest_index = np.zeros(len(turn_ends), dtype=np.intp)
+    is_new_max = np.concatenate(([True], turn_ends[1:] > furthest[:-1]))
+    furthest_index[is_new_max] = np.flatnonzero(is_new_max)
+    furthest_index = np.maximum.accumulate(furthest_index)
+
+    # Last turn starting at or before each word's midpoint (-1 if the word precedes every turn)
+    previous = np.searchsorted(turn_starts, midpoints, side='right') - 1
+    has_previous = previous >= 0
+    previous_clipped = np.clip(previous, 0, None)
+
+    assigned = np.where(midpoints < turn_ends[previous_clipped], previous_clipped, furthest_index[previous_clipped])
+    covered = has_previous & (midpoints < turn_ends[assigned])
+
+    # Words in a gap go to whichever of the neighbouring turns is closer
+    following = np.clip(previous + 1, 0, len(turn_starts) - 1)
+    gap_after_previous = np.where(has_previous, midpoints - furthest[previous_clipped], np.inf)
+    gap_before_next = np.where(previous + 1 < len(turn_starts), turn_starts[following] - midpoints, np.inf)
+    nearest = np.where(gap_after_previous <= gap_before_next, furthest_index[previous_clipped], following)
+
+    return np.where(covered, assigned, nearest)
+
+
+def group_speaker_text(words, speakers):
+    """Merges consecutive words of the same speaker into [{"speaker", "text"}] blocks."""
+    if len(words) == 0:
+        return []
+
+    speakers = np.asarray(speakers, dtype=object)
+    boundaries = np.flatnonzero(speakers[1:] != speakers[:-1]) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(words)]))
+
+    return [
+        {"speaker": speakers[start], "text": " ".join(words[start:end]).strip()}
+        for start, end in zip(starts, ends)
+    ]
+
+
+def align_words(diarization_result, words):
+    """Aligns Whisper word timestamps ([{"word", "start", "end"}]) with diarization speaker turns."""
+    turn_starts, turn_ends, turn_speakers = diarization_turns(diarization_result)
+    word_text = [word['word'].strip() for word in words]
+    word_starts = np.fromiter((word['start'] for word in words), dtype=float, count=len(words))
+    word_ends = np.fromiter((word['end'] for word in words), dtype=float, count=len(words))
+
+    turn_index = assign_words_to_turns(word_starts, word_ends, turn_starts, turn_ends)
+    return group_speaker_text(word_text, turn_speakers[turn_index])
+
+
+def align_proportionally(diarization_result, transcription_text):
+    """Hands out words to speaker turns in proportion to each turn's duration.
+
+    Used when no word timestamps are available. The timeline extent is computed once rather
+    than once per turn.
+    """
+    words = transcription_text.split()
+    turn_starts, turn_ends, turn_speakers = diarization_turns(diarization_result)
+    if len(turn_starts) == 0:
+        return []
+
+    extent = diarization_result.get_timeline().extent().duration
+    word_counts = (len(words) * ((turn_ends - turn_starts) / extent)).astype(int) if extent else np.zeros(len(turn_starts), dtype=int)
+    # Overlapping turns can add up to more than the timeline; later turns then get fewer words
+    offsets = np.minimum(np.concatenate(([0], np.cumsum(word_counts))), len(words))
+    word_counts = np.diff(offsets)
+
+    # Repeat each turn's speaker once per word it was given, then merge consecutive speakers
+    speakers = np.repeat(turn_speakers, word_counts)
+    return group_speaker_text(words[:offsets[-1]], speakers)
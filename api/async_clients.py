@@ -0,0 +1,32 @@
+import asyncio
+import weakref
+import httpx
+from django.conf import settings
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_http_client():
+    """Returns the shared httpx.AsyncClient of the running event loop: one per ASGI worker process.
+
+    Connections to each API are kept alive and reused, so many concurrent requests share at most
+    ASYNC_HTTP_MAX_CONNECTIONS sockets instead of opening one each.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = httpx.AsyncClient(
+            timeout=httpx.Timeout(getattr(settings, 'ASYNC_HTTP_TIMEOUT', 120), connect=10),
+            limits=httpx.Limits(
+                max_connections=getattr(settings, 'ASYNC_HTTP_MAX_CONNECTIONS', 100),
+                max_keepalive_connections=getattr(settings, 'ASYNC_HTTP_MAX_KEEPALIVE', 20),
+            ),
+        )
+    return client
+
+
+async def close_http_client():
+    """Closes the running loop's client, e.g. at the end of a benchmark."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,144 @@
+import os
+import re
+import logging
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from api.metrics import counter
+
+logger = logging.getLogger(__name__)
+
+FILE_DOWNLOADS = counter('themis_file_downloads_total', "File download responses, by how they were served.")
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+CHUNK_SIZE = 64 * 1024
+
+
+def file_etag(stat):
+    """Strong validator from the file's size and modification time; it changes whenever the file is rewritten."""
+    return quote_etag(f"{stat.st_size:x}-{stat.st_mtime_ns:x}")
+
+
+def parse_range(header, size):
+    """Returns (start, end) inclusive for a single `bytes=` range, None to serve the whole file, or
+    'unsatisfiable'.
+
+    Multiple ranges and malformed headers are served as the whole file, which RFC 9110 permits.
+    A range ending before it starts is invalid rather than unsatisfiable (RFC 9110 section 14.1.1),
+    so it is ignored as well.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if start >= size:
+        return 'unsatisfiable'
+    if last and int(last) < start:
+        return None
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+
+def _offload_headers(path):
+    """The header that makes the front-end server send the file itself, or None to stream it from Django.
+
+    FILE_DOWNLOAD_OFFLOAD is 'x-sendfile' (Apache mod_xsendfile, lighttpd) or 'x-accel-redirect'
+    (nginx, which needs an `internal` location at FILE_DOWNLOAD_ACCEL_PREFIX aliasing
+    FILE_DOWNLOAD_ROOT). Files outside FILE_DOWNLOAD_ROOT are never offloaded.
+    """
+    mode = getattr(settings, 'FILE_DOWNLOAD_OFFLOAD', None)
+    if not mode:
+        return None
+
+    root = os.path.abspath(getattr(settings, 'FILE_DOWNLOAD_ROOT', None) or settings.BASE_DIR)
+    path = os.path.abspath(path)
+    if os.path.commonpath([root, path]) != root:
+        logger.warning(f"Not offloading {path}: it is outside FILE_DOWNLOAD_ROOT {root}")
+        return None
+
+    if mode == 'x-sendfile':
+        return {'X-Sendfile': path}
+    if mode == 'x-accel-redirect':
+        prefix = getattr(settings, 'FILE_DOWNLOAD_ACCEL_PREFIX', '/protected/').rstrip('/')
+        return {'X-Accel-Redirect': f"{prefix}/{os.path.relpath(path, root).replace(os.sep, '/')}"}
+    raise ValueError(f"Unknown FILE_DOWNLOAD_OFFLOAD '{mode}'. Expected 'x-sendfile' or 'x-accel-redirect'")
+
+
+def serve_file(request, path, filename, content_type='application/octet-stream', stat=None):
+    """Serves a file as an attachment with ETag/Last-Modified validation and single byte-range support.
+
+    Unchanged files get a 304 (or 412 for a failed If-Match) without being opened. When offloading
+    is configured the response carries only headers, and the front-end server sends the body and
+    handles ranges itself.
+    """
+    stat = stat or os.stat(path)
+    etag = file_etag(stat)
+    last_modified = int(stat.st_mtime)
+
+    def finish(response, served):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Accept-Ranges'] = 'bytes'
+        # Briefs are regenerated in place, so clients keep their copy but always revalidate it
+        response['Cache-Control'] = 'private, no-cache'
+        FILE_DOWNLOADS.inc(served=served)
+        return response
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return finish(not_modified, str(not_modified.status_code))
+
+    disposition = f'attachment; filename="{filename}"'
+    offload = _offload_headers(path)
+    if offload:
+        response = HttpResponse(content_type=content_type)
+        response['Content-Disposition'] = disposition
+        for header, value in offload.items():
+            response[header] = value
+        return finish(response, 'offload')
+
+    byte_range = parse_range(request.META.get('HTTP_RANGE'), stat.st_size)
+    if byte_range is not None and request.method in ('GET', 'HEAD') and _if_range_matches(request, etag, last_modified):
+        if byte_range == 'unsatisfiable':
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f"bytes */{stat.st_size}"
+            return finish(response, '416')
+
+        start, end = byte_range
+        response = StreamingHttpResponse(_read_range(path, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f"bytes {start}-{end}/{stat.st_size}"
+        response['Content-Disposition'] = disposition
+        return finish(response, '206')
+
+    response = FileResponse(open(path, 'rb'), as_attachment=True, filename=filename, content_type=content_type)
+    return finish(response, '200')
@@ -0,0 +1,291 @@
+import re
+import json
+import asyncio
+import logging
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from api.llm import get_async_llm_client, get_llm_client
+from api.llm_cache import content_hash, get_cached_response, store_response
+from transcription_chunks.dispatch import dispatch, get_provider_limiter
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER = "......."
+
+CASE_INFO_PROMPT = """
+    From this court hearing transcription provided, extract the following information:
+    "case_title, case_number, judge_name, accused_name, filtered_transcript, court_type, country, court_location, date, prosecutor_name, defense_counsel_name, charges, plea, verdict, sentence, mitigating_factors, aggravating_factors, legal_principles, precedents_cited"
+
+    For the following fields, provide more detailed and comprehensive information:
+
+    1. charges: List all charges in detail, including the specific laws or statutes violated.
+    2. plea: Describe the plea entered for each charge, including any explanations or context provided.
+    3. verdict: Provide the verdict for each charge, including any reasoning given by the court.
+    4. sentence: Detail the full sentence, including any fines, imprisonment terms, probation, or other penalties for each charge.
+    5. mitigating_factors: Elaborate on each mitigating factor considered by the court, including how it influenced the decision.
+    6. aggravating_factors: Explain each aggravating factor in detail, including its impact on the court's decision.
+    7. legal_principles: Provide a comprehensive explanation of each legal principle applied, formatted as numbered paragraphs. Each principle should start with its name in bold, followed by a colon and its explanation.
+    8. precedents_cited: For each precedent, include the case name, citation, and a brief explanation of how it relates to the current case.
+
+    Return a valid JSON blob with key-value pairs. Format the detailed fields as follows:
+
+    {
+    "case_title": ".....",
+    "case_number": ".....",
+    ...
+    "charges": "1. [Charge 1]: [Detailed description]\\n2. [Charge 2]: [Detailed description]\\n...",
+    "plea": "[Detailed description of plea(s)]",
+    "verdict": "[Comprehensive verdict description]",
+    "sentence": "[Detailed sentence information]",
+    "mitigating_factors": "1. [Factor 1]: [Detailed explanation]\\n2. [Factor 2]: [Detailed explanation]\\n...",
+    "aggravating_factors": "1. [Factor 1]: [Detailed explanation]\\n2. [Factor 2]: [Detailed explanation]\\n...",
+    "legal_principles": "1. [b]Principle 1[/b]: [Detailed explanation]\\n2. [b]Principle 2[/b]: [Detailed explanation]\\n...",
+    "precedents_cited": "1. [Case name] ([Citation]): [Brief explanation of relevance]\\n2. [Case name] ([Citation]): [Brief explanation of relevance]\\n..."
+    }
+
+    For the filtered_transcript, provide detailed information as a single string value with paragraphs separated by newline characters (\\n).
+
+    Ensure that all multi-line values are returned as a single string with appropriate newline characters.
+
+    For all fields that involve legal references (charges, legal_principles, precedents_cited), enclose penal code sections, case names, and key legal phrases in [b][/b] tags for bolding.
+    When displaying the values of the json, make them into capital case except for the detailed fields (filtered_transcript, mitigating_factors, etc.).
+    Where there's no information, replace with "......." ensure all keys are in small letters.
+
+    NB: Only return the object nothing else
+    """
+
+SECTION_PROMPT_PREFIX = """
+    The transcription below is section {number} of {total} of a longer court hearing, in order.
+    Extract only what is stated in this section. Use "......." for anything this section does not mention,
+    and give the filtered_transcript for this section alone.
+    """
+
+# How the reduce step combines a field across sections
+SCALAR_FIELDS = [
+    'case_title', 'case_number', 'judge_name', 'accused_name', 'court_type', 'country',
+    'court_location', 'date', 'prosecutor_name', 'defense_counsel_name',
+]
+NARRATIVE_FIELDS = ['plea', 'verdict', 'sentence']
+LIST_FIELDS = ['charges', 'mitigating_factors', 'aggravating_factors', 'legal_principles', 'precedents_cited']
+
+LIST_ITEM_NUMBER_RE = re.compile(r"^\s*\d+[.)]\s*")
+
+
+def parse_json_response(response):
+    """Parses the JSON object in an LLM response, tolerating text around it. Returns {} if there is none."""
+    response = response or ""
+    start, end = response.find('{'), response.rfind('}')
+    for candidate in (response, response[start:end + 1] if start != -1 and end > start else None):
+        if candidate is None:
+            continue
+        try:
+            parsed = json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(parsed, dict):
+            return parsed
+    logger.error(f"The response is not a valid JSON. Raw response: {response}")
+    return {}
+
+
+def split_transcript(text, section_chars):
+    """Splits a transcript into sections of at most `section_chars`, breaking between lines where possible."""
+    sections, current, length = [], [], 0
+    for line in text.split("\n"):
+        # A single line longer than a section is split between words
+        while len(line) > section_chars:
+            cut = line.rfind(" ", 0, section_chars)
+            cut = cut if cut > 0 else section_chars
+            line_part, line = line[:cut], line[cut:].lstrip()
+            if current:
+                sections.append("\n".join(current))
+                current, length = [], 0
+            sections.append(line_part)
+
+        if current and length + len(line) + 1 > section_chars:
+            sections.append("\n".join(current))
+            current, length = [], 0
+        current.append(line)
+        length += len(line) + 1
+
+    if any(part.strip() for part in current):
+        sections.append("\n".join(current))
+    return [section for section in sections if section.strip()]
+
+
+def _as_text(value):
+    """Field values are usually strings, but models sometimes return lists for the numbered fields."""
+    if isinstance(value, list):
+        return "\n".join(str(item) for item in value)
+    return value if isinstance(value, str) else ("" if value is None else str(value))
+
+
+def _has_value(value):
+    return isinstance(value, str) and value.strip().strip('.') != ''
+
+
+def merge_case_info(partials):
+    """Reduces per-section extractions into one dict with the keys format_case_brief expects.
+
+    Identifying fields take the first value any section found. Plea, verdict and sentence keep every
+    distinct statement in transcript order. Numbered lists are merged, de-duplicated and renumbered,
+    and the filtered transcript is the sections' filtered transcripts in order.
+    """
+    partials = [{field: _as_text(value) for field, value in partial.items()} for partial in partials]
+    merged = {}
+    for field in SCALAR_FIELDS:
+        merged[field] = next((p[field].strip() for p in partials if _has_value(p.get(field))), PLACEHOLDER)
+
+    for field in NARRATIVE_FIELDS:
+        statements = dict.fromkeys(p[field].strip() for p in partials if _has_value(p.get(field)))
+        merged[field] = "\n".join(statements) or PLACEHOLDER
+
+    for field in LIST_FIELDS:
+        items = {}
+        for partial in partials:
+            if not _has_value(partial.get(field)):
+                continue
+            for line in partial[field].split("\n"):
+                item = LIST_ITEM_NUMBER_RE.sub("", line).strip()
+                if item:
+                    items.setdefault(" ".join(item.lower().split()), item)
+        merged[field] = "\n".join(f"{number}. {item}" for number, item in enumerate(items.values(), 1)) or PLACEHOLDER
+
+    transcripts = [p['filtered_transcript'].strip() for p in partials if _has_value(p.get('filtered_transcript'))]
+    merged['filtered_transcript'] = "\n".join(transcripts) or PLACEHOLDER
+    return merged
+
+
+def extract_single(transcription_text, client):
+    """Extracts the case information with one LLM call over the whole transcript."""
+    return parse_json_response(client.complete(CASE_INFO_PROMPT, transcription_text, max_output_size=4000))
+
+
+def section_prompt(number, total):
+    return SECTION_PROMPT_PREFIX.format(number=number, total=total) + CASE_INFO_PROMPT
+
+
+def merge_section_results(results, total):
+    partials = [result for result in results if isinstance(result, dict) and result]
+    logger.info(f"Extracted {len(partials)} of {total} transcript sections")
+    if not partials:
+        return {}
+    return merge_case_info(partials)
+
+
+def extract_map_reduce(transcription_text, client, section_chars):
+    """Extracts each section of the transcript concurrently, then merges the partial results.
+
+    A failed or unparseable section is left out of the merge instead of failing the whole brief.
+    """
+    sections = split_transcript(transcription_text, section_chars)
+
+    def extract_section(numbered_section):
+        number, section = numbered_section
+        return parse_json_response(client.complete(section_prompt(number, len(sections)), section, max_output_size=4000))
+
+    results = dispatch(extract_section, enumerate(sections, 1), provider=client.name)
+    return merge_section_results(results, len(sections))
+
+
+async def aextract_single(transcription_text, client):
+    return parse_json_response(await client.complete(CASE_INFO_PROMPT, transcription_text, max_output_size=4000))
+
+
+async def aextract_map_reduce(transcription_text, client, section_chars):
+    """extract_map_reduce for async clients: the sections are requested concurrently on the event loop."""
+    sections = split_transcript(transcription_text, section_chars)
+    limiter = get_provider_limiter(client.name)
+
+    async def extract_section(number, section):
+        try:
+            async with limiter:
+                return parse_json_response(await client.complete(section_prompt(number, len(sections)), section, max_output_size=4000))
+        except Exception as e:
+            logger.error(f"{client.name} request failed: {e}")
+            return e
+
+    results = await asyncio.gather(*(extract_section(number, section) for number, section in enumerate(sections, 1)))
+    return merge_section_results(results, len(sections))
+
+
+EXTRACTION_MODES = ['single', 'map_reduce', 'auto']
+
+
+def prompt_version(mode, section_chars=None):
+    """Identifies the prompts (and section size) a response was produced with, for the response cache."""
+    if mode == 'single':
+        material = CASE_INFO_PROMPT
+    else:
+        material = f"{SECTION_PROMPT_PREFIX}{CASE_INFO_PROMPT}{section_chars}"
+    return f"{mode}-{content_hash(material)[:16]}"
+
+
+def current_prompt_versions():
+    section_chars = getattr(settings, 'CASE_BRIEF_SECTION_CHARS', 30000)
+    return [prompt_version('single'), prompt_version('map_reduce', section_chars)]
+
+
+def extraction_plan(transcription_text, mode, client, use_cache):
+    """Resolves the extraction mode and section size, and the response cache key (None when not caching)."""
+    mode = mode or getattr(settings, 'CASE_BRIEF_EXTRACTION_MODE', 'auto')
+    if mode not in EXTRACTION_MODES:
+        raise ValueError(f"Unknown extraction mode '{mode}'. Expected one of: {', '.join(EXTRACTION_MODES)}")
+
+    section_chars = getattr(settings, 'CASE_BRIEF_SECTION_CHARS', 30000)
+    if mode == 'auto':
+        mode = 'single' if len(transcription_text) <= section_chars else 'map_reduce'
+
+    key = None
+    if use_cache and getattr(settings, 'LLM_CACHE_ENABLED', True):
+        key = (content_hash(transcription_text), prompt_version(mode, section_chars), f"{client.name}:{client.model}")
+    return mode, section_chars, key
+
+
+def extract_case_info_from_transcription(transcription_text, mode=None, client=None, use_cache=True):
+    """Extracts the fields used by format_case_brief from a hearing transcript.
+
+    'single' sends the whole transcript in one request, 'map_reduce' extracts sections concurrently and
+    merges them, and 'auto' uses map_reduce only for transcripts longer than one section.
+    Results are cached by transcript hash, prompt version and model (see api.llm_cache), so
+    extracting an unchanged transcript again makes no LLM request.
+    """
+    client = client or get_llm_client()
+    mode, section_chars, key = extraction_plan(transcription_text, mode, client, use_cache)
+    if key:
+        case_info = get_cached_response(*key)
+        if case_info is not None:
+            return case_info
+
+    if mode == 'single':
+        case_info = extract_single(transcription_text, client)
+    else:
+        case_info = extract_map_reduce(transcription_text, client, section_chars)
+
+    # Failed extractions come back empty and are not cached, so the next attempt calls the model again
+    if key and case_info:
+        store_response(*key, case_info)
+    return case_info
+
+
+async def aextract_case_info_from_transcription(transcription_text, mode=None, client=None, use_cache=True):
+    """extract_case_info_from_transcription for the async views, with an async client (ASYNC_LLM_CLIENT).
+
+    Waiting on the model holds no thread, so one process can extract many briefs at once.
+    """
+    client = client or get_async_llm_client()
+    mode, section_chars, key = extraction_plan(transcription_text, mode, client, use_cache)
+    if key:
+        case_info = await sync_to_async(get_cached_response)(*key)
+        if case_info is not None:
+            return case_info
+
+    if mode == 'single':
+        case_info = await aextract_single(transcription_text, client)
+    else:
+        case_info = await aextract_map_reduce(transcription_text, client, section_chars)
+
+    if key and case_info:
+        await sync_to_async(store_response)(*key, case_info)
+    return case_info
+
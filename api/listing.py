@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+
+
+class ListCursorPagination(CursorPagination):
+    """Newest-first cursor pagination on the primary key.
+
+    Every page is an index range scan from the cursor, with no COUNT or OFFSET, so a page costs
+    the same however large the table gets.
+    """
+
+    ordering = '-id'
+    page_size = getattr(settings, 'API_PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 500)
+
+
+def model_columns(serializer):
+    """The model fields a serializer reads, for .only(); None if any field is not a plain column."""
+    model = serializer.Meta.model
+    columns = []
+    for field in serializer.fields.values():
+        name = field.source.split('.')[0]
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete or model_field.many_to_many:
+            return None
+        columns.append(name)
+    return columns
+
+
+class ProjectedListMixin:
+    """List action for viewsets and generic views: cursor-paginated, lightweight by default.
+
+    Without `fields`, rows are rendered with `summary_serializer_class`, which leaves out the large
+    text columns. `?fields=a,b` picks any fields of the full serializer instead. Either way only the
+    columns the serializer reads are loaded from the database.
+    """
+
+    pagination_class = ListCursorPagination
+    summary_serializer_class = None
+
+    def requested_fields(self):
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+        fields = [name.strip() for name in fields.split(',') if name.strip()]
+        available = list(self.get_serializer_class()().fields)
+        unknown = [name for name in fields if name not in available]
+        if unknown:
+            raise ValidationError({'fields': f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(available)}"})
+        return fields
+
+    def list(self, request, *args, **kwargs):
+        fields = self.requested_fields()
+        if fields is None:
+            serializer_class, serializer_kwargs = self.summary_serializer_class, {}
+        else:
+            serializer_class, serializer_kwargs = self.get_serializer_class(), {'fields': fields}
+
+        queryset = self.filter_queryset(self.get_queryset())
+        columns = model_columns(serializer_class(**serializer_kwargs))
+        if columns is not None:
+            queryset = queryset.only(*columns)
+
+        page = self.paginate_queryset(queryset)
+        serializer = serializer_class(page, many=True, context=self.get_serializer_context(), **serializer_kwargs)
+        return self.get_paginated_response(serializer.data)
@@ -0,0 +1,119 @@
+import json
+import time
+import asyncio
+import assemblyai as aai
+from django.conf import settings
+from django.utils.module_loading import import_string
+from api.async_clients import get_http_client
+from api.metrics import counter
+
+LLM_REQUESTS = counter('themis_llm_requests_total', "Requests sent to an LLM, by client and model.")
+
+
+class LemurClient:
+    """Runs prompts through AssemblyAI LeMUR."""
+
+    name = 'lemur'
+
+    def __init__(self, model='claude3_5_sonnet'):
+        self.model = model
+
+    def complete(self, prompt, input_text, max_output_size=4000):
+        """Returns the model's response text for `prompt` applied to `input_text`."""
+        LLM_REQUESTS.inc(client=self.name, model=self.model)
+        result = aai.Lemur().task(
+            prompt,
+            final_model=getattr(aai.LemurModel, self.model),
+            input_text=input_text,
+            max_output_size=max_output_size,
+            timeout=settings.LEMUR_TIMEOUT_SECONDS,
+        )
+        return result.response
+
+
+class AsyncLemurClient(LemurClient):
+    """LemurClient for coroutines: sends the same LeMUR task request over the shared async HTTP client.
+
+    Responses are cached under the same client name and model as LemurClient's.
+    """
+
+    async def complete(self, prompt, input_text, max_output_size=4000):
+        LLM_REQUESTS.inc(client=self.name, model=self.model)
+        response = await get_http_client().post(
+            f"{aai.settings.base_url}/lemur/v3/generate/task",
+            headers={'authorization': aai.settings.api_key},
+            json={
+                'prompt': prompt,
+                'final_model': getattr(aai.LemurModel, self.model).value,
+                'input_text': input_text,
+                'max_output_size': max_output_size,
+            },
+            timeout=settings.LEMUR_TIMEOUT_SECONDS,
+        )
+        if response.status_code != 200:
+            raise aai.types.LemurError(f"failed to call Lemur task: {response.status_code} {response.text}")
+        return response.json()['response']
+
+
+def get_llm_client():
+    """Returns an instance of the LLM_CLIENT class, e.g. a canned client for offline benchmarks."""
+    client_class = import_string(getattr(settings, 'LLM_CLIENT', 'api.llm.LemurClient'))
+    return client_class(**getattr(settings, 'LLM_CLIENT_OPTIONS', {}))
+
+
+def get_async_llm_client():
+    """Returns an instance of the ASYNC_LLM_CLIENT class, the async counterpart of LLM_CLIENT."""
+    client_class = import_string(getattr(settings, 'ASYNC_LLM_CLIENT', 'api.llm.AsyncLemurClient'))
+    return client_class(**getattr(settings, 'LLM_CLIENT_OPTIONS', {}))
+
+
+class SimulatedLLMClient:
+    """Offline stand-in for an LLM: sleeps like a remote call and returns canned case information.
+
+    Latency grows with the input and output size, so benchmarks of how transcripts are split
+    and sent are meaningful without network access or API keys.
+    """
+
+    name = 'simulated'
+
+    def __init__(self, base_latency=1.0, seconds_per_1k_input_chars=0.05, seconds_per_1k_output_chars=0.5):
+        self.base_latency = base_latency
+        self.seconds_per_1k_input_chars = seconds_per_1k_input_chars
+        self.seconds_per_1k_output_chars = seconds_per_1k_output_chars
+        self.model = 'simulated'
+
+    def complete(self, prompt, input_text, max_output_size=4000):
+        response, latency = self.respond(input_text, max_output_size)
+        time.sleep(latency)
+        return response
+
+    def respond(self, input_text, max_output_size):
+        """The canned response and how long the remote call would take."""
+        LLM_REQUESTS.inc(client=self.name, model=self.model)
+        first_words = " ".join(input_text.split()[:12])
+        response = json.dumps({
+            'case_title': "Republic v Accused",
+            'case_number': "E001 of 2024",
+            'judge_name': ".......",
+            'accused_name': "Accused",
+            'charges': f"1. [b]Charge[/b]: {first_words}",
+            'plea': "Not guilty",
+            'verdict': ".......",
+            'sentence': ".......",
+            'filtered_transcript': input_text[:max_output_size // 2],
+        })
+        latency = (
+            self.base_latency
+            + self.seconds_per_1k_input_chars * len(input_text) / 1000
+            + self.seconds_per_1k_output_chars * len(response) / 1000
+        )
+        return response, latency
+
+
+class AsyncSimulatedLLMClient(SimulatedLLMClient):
+    """SimulatedLLMClient for coroutines: waits without holding a thread."""
+
+    async def complete(self, prompt, input_text, max_output_size=4000):
+        response, latency = self.respond(input_text, max_output_size)
+        await asyncio.sleep(latency)
+        return response
@@ -0,0 +1,88 @@
+import json
+import hashlib
+import logging
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+from api.metrics import counter
+from api.models import LLMResponseCache
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_REQUESTS = counter('themis_llm_cache_requests_total', "Case-information cache lookups, by result.")
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def get_cached_response(transcript_hash, prompt_version, model):
+    """Returns the stored response for this key, or None, and records the hit."""
+    entry = (
+        LLMResponseCache.objects
+        .filter(transcript_hash=transcript_hash, prompt_version=prompt_version, model=model)
+        .only('id', 'response')
+        .first()
+    )
+    if entry is None:
+        LLM_CACHE_REQUESTS.inc(result='miss')
+        return None
+
+    LLM_CACHE_REQUESTS.inc(result='hit')
+    LLMResponseCache.objects.filter(id=entry.id).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    return entry.response
+
+
+def store_response(transcript_hash, prompt_version, model, response):
+    """Stores a response, replacing any entry with the same key, then applies the storage cap."""
+    LLMResponseCache.objects.bulk_create(
+        [LLMResponseCache(
+            transcript_hash=transcript_hash,
+            prompt_version=prompt_version,
+            model=model,
+            response=response,
+            size=len(json.dumps(response).encode('utf-8')),
+        )],
+        update_conflicts=True,
+        unique_fields=['transcript_hash', 'prompt_version', 'model'],
+        update_fields=['response', 'size', 'last_used_at'],
+    )
+    enforce_storage_cap()
+
+
+def enforce_storage_cap(max_bytes=None):
+    """Deletes the least recently used entries until the cache holds at most max_bytes of responses."""
+    max_bytes = max_bytes if max_bytes is not None else getattr(settings, 'LLM_CACHE_MAX_BYTES', 50 * 1024 * 1024)
+    total = LLMResponseCache.objects.aggregate(total=Sum('size'))['total'] or 0
+    if total <= max_bytes:
+        return 0
+
+    kept, evict = 0, []
+    for entry_id, size in LLMResponseCache.objects.order_by('-last_used_at', '-id').values_list('id', 'size').iterator():
+        if kept + size <= max_bytes and not evict:
+            kept += size
+        else:
+            evict.append(entry_id)
+    deleted, _ = LLMResponseCache.objects.filter(id__in=evict).delete()
+    logger.info(f"Evicted {deleted} cached LLM responses to stay under {max_bytes} bytes")
+    return deleted
+
+
+def invalidate(transcription_text=None, prompt_version=None, stale=False):
+    """Deletes cached responses and returns how many were removed.
+
+    With transcription_text, only that transcript's entries go. With prompt_version, only that
+    version's entries go. With stale=True, every entry made with other prompts than the current
+    ones goes. With no arguments, everything is deleted.
+    """
+    from api.extraction import current_prompt_versions
+
+    entries = LLMResponseCache.objects.all()
+    if transcription_text is not None:
+        entries = entries.filter(transcript_hash=content_hash(transcription_text))
+    if prompt_version is not None:
+        entries = entries.filter(prompt_version=prompt_version)
+    if stale:
+        entries = entries.exclude(prompt_version__in=current_prompt_versions())
+    deleted, _ = entries.delete()
+    return deleted
@@ -0,0 +1,68 @@
+import time
+from types import SimpleNamespace
+import numpy as np
+from django.core.management.base import BaseCommand
+from api.alignment import align_proportionally, align_words
+
+
+class SyntheticDiarization:
+    """Minimal stand-in for a pyannote Annotation built from turn arrays."""
+
+    def __init__(self, starts, ends, speakers):
+        self.starts, self.ends, self.speakers = starts, ends, speakers
+
+    def itertracks(self, yield_label=False):
+        for start, end, speaker in zip(self.starts, self.ends, self.speakers):
+            yield SimpleNamespace(start=start, end=end), None, speaker
+
+    def get_timeline(self):
+        duration = float(self.ends.max() - self.starts.min())
+        return SimpleNamespace(extent=lambda: SimpleNamespace(duration=duration))
+
+
+def synthetic_hearing(hours, speakers=4, words_per_second=2.5, seed=0):
+    """Speaker turns of 1-20 s with short gaps, and Whisper-style words spread over them."""
+    rng = np.random.default_rng(seed)
+    total = hours * 3600
+    turn_count = int(total / 8) + 1
+    durations = rng.uniform(1, 20, turn_count)
+    gaps = rng.uniform(0, 1, turn_count)
+    starts = np.cumsum(np.concatenate(([0], (durations + gaps)[:-1])))
+    keep = starts < total
+    starts, ends = starts[keep], (starts + durations)[keep]
+    labels = np.array([f"SPEAKER_{i:02d}" for i in rng.integers(0, speakers, len(starts))], dtype=object)
+
+    word_count = int(total * words_per_second)
+    word_starts = np.sort(rng.uniform(0, total, word_count))
+    word_ends = word_starts + rng.uniform(0.1, 0.5, word_count)
+    words = [{'word': f" w{i}", 'start': s, 'end': e} for i, (s, e) in enumerate(zip(word_starts.tolist(), word_ends.tolist()))]
+    return SyntheticDiarization(starts, ends, labels), words
+
+
+class Command(BaseCommand):
+    help = "Times diarization/transcript alignment on synthetic multi-hour turn and word sets."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, nargs='+', default=[1, 3, 6])
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'hours':>6}{'turns':>9}{'words':>10}{'timestamps s':>15}{'proportional s':>17}")
+        for hours in options['hours']:
+            diarization, words = synthetic_hearing(hours)
+            text = " ".join(word['word'] for word in words)
+
+            timestamp_time = self._best_of(options['repeat'], lambda: align_words(diarization, words))
+            proportional_time = self._best_of(options['repeat'], lambda: align_proportionally(diarization, text))
+            self.stdout.write(
+                f"{hours:>6g}{len(diarization.starts):>9}{len(words):>10}"
+                f"{timestamp_time:>15.3f}{proportional_time:>17.3f}"
+            )
+
+    def _best_of(self, repeat, func):
+        timings = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start_time)
+        return min(timings)
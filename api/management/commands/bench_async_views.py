@@ -0,0 +1,177 @@
+import json
+import time
+import uuid
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import assemblyai as aai
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from api.async_clients import close_http_client
+from api.llm import SimulatedLLMClient
+from api.management.commands.bench_case_brief_extraction import synthetic_transcript
+from api.management.commands.load_test_progress import ASGIClient, percentile
+from transcription.models import Transcription
+
+
+class StubLemur:
+    """LeMUR stand-in on localhost: answers every task after `latency` seconds with canned case information."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.loop = asyncio.new_event_loop()
+        self.canned = SimulatedLLMClient()
+
+    def start(self):
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            server = self.loop.run_until_complete(asyncio.start_server(self._handle, '127.0.0.1', 0))
+            self.port = server.sockets[0].getsockname()[1]
+            ready.set()
+            self.loop.run_forever()
+            # Drop the kept-alive connections before closing the loop
+            server.close()
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, name='stub-lemur', daemon=True)
+        self.thread.start()
+        ready.wait()
+        return f"http://127.0.0.1:{self.port}"
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    async def _handle(self, reader, writer):
+        # HTTP/1.1 with keep-alive, enough for the SDK's and httpx's requests
+        try:
+            while True:
+                head = await reader.readuntil(b'\r\n\r\n')
+                length = 0
+                for line in head.split(b'\r\n')[1:]:
+                    name, _, value = line.partition(b':')
+                    if name.strip().lower() == b'content-length':
+                        length = int(value)
+                task = json.loads(await reader.readexactly(length) or b'{}')
+                await asyncio.sleep(self.latency)
+                response, _ = self.canned.respond(task.get('input_text', ''), task.get('max_output_size', 4000))
+                body = json.dumps({
+                    'request_id': 'stub', 'usage': {'input_tokens': 0, 'output_tokens': 0}, 'response': response,
+                }).encode()
+                writer.write(b'HTTP/1.1 200 OK\r\ncontent-type: application/json\r\ncontent-length: %d\r\n\r\n' % len(body) + body)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.CancelledError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+class ThreadSampler:
+    """Records the most threads alive at once while it runs."""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self.stopped = threading.Event()
+
+    def __enter__(self):
+        def sample():
+            while not self.stopped.wait(0.02):
+                self.peak = max(self.peak, threading.active_count())
+        threading.Thread(target=sample, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+
+
+class Command(BaseCommand):
+    help = ("Compares case-brief generation through the sync view (WSGI-style worker threads) and the async "
+            "view (one event loop under ASGI) against a local LeMUR stub with a fixed latency.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=64, help="Case briefs to generate with each view.")
+        parser.add_argument('--sync-workers', type=int, default=4,
+                            help="Concurrent requests on the sync side, like gunicorn sync workers.")
+        parser.add_argument('--concurrency', type=int, default=None,
+                            help="Concurrent requests on the async side (default: all of them).")
+        parser.add_argument('--latency', type=float, default=1.0, help="Seconds the stub takes to answer.")
+        parser.add_argument('--chars', type=int, default=5000, help="Transcript size in characters.")
+
+    def handle(self, *args, **options):
+        stub = StubLemur(options['latency'])
+        aai.settings.base_url = stub.start()
+        aai.settings.api_key = 'stub'
+
+        transcriptions = []
+        try:
+            with override_settings(LLM_CLIENT='api.llm.LemurClient', ASYNC_LLM_CLIENT='api.llm.AsyncLemurClient',
+                                   LLM_CLIENT_OPTIONS={}, CASE_BRIEF_EXTRACTION_MODE='single'):
+                self.stdout.write(f"{options['requests']} case briefs, stub latency {options['latency']:.2f}s\n")
+                self.stdout.write(f"{'view':<34}{'seconds':>9}{'req/s':>8}{'p50 ms':>8}{'p95 ms':>8}{'errors':>8}{'threads':>9}")
+                for view in ('sync', 'async'):
+                    ids = self._create_transcriptions(options['requests'], options['chars'], view)
+                    transcriptions += ids
+                    with ThreadSampler() as threads:
+                        start_time = time.perf_counter()
+                        if view == 'sync':
+                            results = self._run_sync(ids, options['sync_workers'])
+                            label = f"sync, {options['sync_workers']} workers"
+                        else:
+                            results = asyncio.run(self._run_async(ids, options['concurrency'] or len(ids)))
+                            label = f"async, {options['concurrency'] or len(ids)} concurrent"
+                        elapsed = time.perf_counter() - start_time
+                    latencies = [latency for status, latency in results]
+                    errors = sum(1 for status, _ in results if status != 201)
+                    self.stdout.write(
+                        f"{label:<34}{elapsed:>9.2f}{len(results) / elapsed:>8.1f}{percentile(latencies, 0.5) * 1000:>8.0f}"
+                        f"{percentile(latencies, 0.95) * 1000:>8.0f}{errors:>8}{threads.peak:>9}"
+                    )
+        finally:
+            stub.stop()
+            Transcription.objects.filter(id__in=transcriptions).delete()
+
+    def _create_transcriptions(self, count, chars, view):
+        # Distinct transcripts, so every request misses the LLM response cache
+        run = uuid.uuid4().hex[:8]
+        return [
+            Transcription.objects.create(
+                case_name=f"Async view benchmark {view} {n}",
+                transcription_text=f"Hearing {run} {n}\n" + synthetic_transcript(chars, seed=n),
+            ).id
+            for n in range(count)
+        ]
+
+    def _run_sync(self, ids, workers):
+        def post(transcription_id):
+            start_time = time.perf_counter()
+            response = Client().post('/api/case_briefs/', {'transcription': transcription_id}, content_type='application/json')
+            return response.status_code, time.perf_counter() - start_time
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(post, ids))
+
+    async def _run_async(self, ids, concurrency):
+        from themis.asgi import application
+
+        client = ASGIClient(application)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def post(transcription_id):
+            async with semaphore:
+                start_time = time.perf_counter()
+                status = await client.request(
+                    'POST', '/api/case_briefs/async/', '', lambda body: None,
+                    body=json.dumps({'transcription': transcription_id}).encode(), content_type='application/json',
+                )
+                return status, time.perf_counter() - start_time
+
+        try:
+            return await asyncio.gather(*(post(transcription_id) for transcription_id in ids))
+        finally:
+            await close_http_client()
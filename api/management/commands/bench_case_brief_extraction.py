@@ -0,0 +1,57 @@
+import time
+import random
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from api.extraction import extract_case_info_from_transcription
+from api.llm import LLM_REQUESTS, SimulatedLLMClient
+
+LINES = [
+    "Prosecutor: Your honour, the accused is charged with robbery with violence contrary to section 296(2) of the Penal Code.",
+    "Defence counsel: My lord, the accused has been in custody for two years and is a first offender.",
+    "Witness: I saw the accused at the scene on the night of the incident.",
+    "Court: The matter is adjourned for mention and the accused is remanded in custody.",
+]
+
+
+def synthetic_transcript(chars, seed=0):
+    rng = random.Random(seed)
+    lines, length = [], 0
+    while length < chars:
+        line = rng.choice(LINES)
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)
+
+
+class Command(BaseCommand):
+    help = "Compares single-request and map-reduce case-brief extraction offline, using a simulated LLM."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chars', type=int, nargs='+', default=[20000, 100000, 300000],
+                            help="Transcript sizes in characters.")
+        parser.add_argument('--section-chars', type=int, default=30000)
+        parser.add_argument('--time-scale', type=float, default=0.1,
+                            help="Multiplies the simulated latencies, to keep the benchmark short.")
+
+    def handle(self, *args, **options):
+        scale = options['time_scale']
+        client = SimulatedLLMClient(
+            base_latency=1.0 * scale,
+            seconds_per_1k_input_chars=0.05 * scale,
+            seconds_per_1k_output_chars=0.5 * scale,
+        )
+
+        self.stdout.write(f"{'chars':>8}{'mode':>12}{'requests':>10}{'seconds':>10}{'transcript chars kept':>23}")
+        for chars in options['chars']:
+            text = synthetic_transcript(chars)
+            for mode in ('single', 'map_reduce'):
+                with override_settings(CASE_BRIEF_SECTION_CHARS=options['section_chars']):
+                    requests_before = LLM_REQUESTS.value(client=client.name, model=client.model)
+                    start_time = time.perf_counter()
+                    case_info = extract_case_info_from_transcription(text, mode=mode, client=client)
+                    elapsed = time.perf_counter() - start_time
+                    requests = LLM_REQUESTS.value(client=client.name, model=client.model) - requests_before
+                self.stdout.write(
+                    f"{chars:>8}{mode:>12}{requests:>10}{elapsed:>10.2f}"
+                    f"{len(case_info.get('filtered_transcript', '')):>23}"
+                )
@@ -0,0 +1,71 @@
+import os
+import time
+import tempfile
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from django.core.management.base import BaseCommand
+from api.s3 import MB, FilesystemS3Client, S3Uploader, get_transfer_config
+
+
+class Command(BaseCommand):
+    help = ("Measures upload throughput (MB/s) of a transcription's worth of artifacts: one file at a time "
+            "with boto3's default transfer settings, as upload_file_to_s3 used to, against the pooled "
+            "parallel uploader. Runs against a local fake S3 that emulates per-connection latency and "
+            "bandwidth, or against --endpoint-url (e.g. MinIO) with real clients.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--files', type=int, default=30, help="Artifacts to upload, like 2-minute chunks of an hour.")
+        parser.add_argument('--size-mb', type=float, default=4.0, help="Size of each artifact.")
+        parser.add_argument('--large-mb', type=float, default=64.0, help="Size of one extra large artifact (0 for none).")
+        parser.add_argument('--latency', type=float, default=0.03, help="Fake S3: seconds per request.")
+        parser.add_argument('--link-mb-per-s', type=float, default=40.0, help="Fake S3: MB/s of one connection.")
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--endpoint-url', help="S3-compatible endpoint to upload to instead of the fake.")
+        parser.add_argument('--bucket', default='themis-bench')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory(prefix="bench-s3-") as directory:
+            paths = self._write_artifacts(directory, options)
+            total_mb = sum(os.path.getsize(path) for path in paths) / MB
+            self.stdout.write(f"{len(paths)} files, {total_mb:.0f} MB")
+            self.stdout.write(f"{'mode':<40}{'seconds':>9}{'MB/s':>9}")
+
+            def make_client(pool_connections):
+                if options['endpoint_url']:
+                    return boto3.session.Session().client(
+                        's3', endpoint_url=options['endpoint_url'], config=Config(max_pool_connections=pool_connections))
+                return FilesystemS3Client(os.path.join(directory, 'fake-s3'), options['latency'], options['link_mb_per_s'])
+
+            # Before: a new client per file and boto3's defaults (8 MB parts, 10 at a time), one file after another
+            start_time = time.perf_counter()
+            for path in paths:
+                with open(path, 'rb') as source:
+                    make_client(10).upload_fileobj(source, options['bucket'], f"sequential/{os.path.basename(path)}",
+                                                   Config=TransferConfig())
+            elapsed = time.perf_counter() - start_time
+            self.stdout.write(f"{'sequential, client per file':<40}{elapsed:>9.2f}{total_mb / elapsed:>9.1f}")
+
+            # After: one shared client, tuned multipart settings, `workers` files at once
+            transfer_config = get_transfer_config()
+            client = make_client(options['workers'] * transfer_config.max_concurrency)
+            with S3Uploader(options['bucket'], options['workers'], client, transfer_config) as uploader:
+                for path in paths:
+                    uploader.submit(path, f"parallel/{os.path.basename(path)}")
+            stats = uploader.stats
+            label = f"pooled, {options['workers']} files at once"
+            self.stdout.write(f"{label:<40}{stats['seconds']:>9.2f}{stats['mb_per_s']:>9.1f}")
+            if stats['failed']:
+                self.stderr.write(f"{len(stats['failed'])} uploads failed")
+
+    def _write_artifacts(self, directory, options):
+        sizes = [options['size_mb']] * options['files']
+        if options['large_mb']:
+            sizes.append(options['large_mb'])
+        paths = []
+        for index, size_mb in enumerate(sizes):
+            path = os.path.join(directory, f"chunk_{index}.wav")
+            with open(path, 'wb') as artifact:
+                artifact.write(os.urandom(int(size_mb * MB)))
+            paths.append(path)
+        return paths
@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import statistics
+import subprocess
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# What a gunicorn worker does before it can answer /api/_ping/: import the application it serves.
+# The Procfile serves themis.wsgi; themis.asgi (uvicorn workers) also wraps it in the progress routes.
+WORKER_BOOTS = {
+    'wsgi': "import themis.wsgi",
+    'asgi': "import themis.asgi",
+}
+
+# The startup cost every process paid when api.utils loaded pyannote at import time
+EAGER_MODEL_LOAD = (
+    "{boot}\n"
+    "from api.model_registry import preload\n"
+    "preload('diarization')"
+)
+
+
+class Command(BaseCommand):
+    help = "Compares manage.py check and worker boot time with lazy vs import-time diarization model loading."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--skip-eager', action='store_true', help="Skip the runs that load the pyannote model.")
+
+    def handle(self, *args, **options):
+        manage_py = os.path.join(settings.BASE_DIR, 'manage.py')
+        cases = [("manage.py check (lazy)", [sys.executable, manage_py, 'check'])]
+        for interface, boot in WORKER_BOOTS.items():
+            cases.append((f"{interface} worker boot (lazy)", [sys.executable, '-c', boot]))
+            if not options['skip_eager']:
+                cases.append((f"{interface} worker boot (import-time load)",
+                              [sys.executable, '-c', EAGER_MODEL_LOAD.format(boot=boot)]))
+
+        self.stdout.write(f"{'case':<40}{'median s':>10}{'min s':>10}{'max s':>10}")
+        for label, command in cases:
+            timings = self._time(command, options['runs'])
+            if timings is None:
+                self.stdout.write(f"{label:<40}{'failed':>10}")
+                continue
+            self.stdout.write(f"{label:<40}{statistics.median(timings):>10.3f}{min(timings):>10.3f}{max(timings):>10.3f}")
+
+    def _time(self, command, runs):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'themis.settings'))
+        timings = []
+        for _ in range(runs):
+            start_time = time.perf_counter()
+            result = subprocess.run(command, cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            timings.append(time.perf_counter() - start_time)
+            if result.returncode != 0:
+                self.stderr.write(result.stderr.decode(errors='replace').strip().splitlines()[-1])
+                return None
+        return timings
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.llm_cache import enforce_storage_cap, invalidate
+from transcription.models import Transcription
+
+
+class Command(BaseCommand):
+    help = "Invalidates cached case-information extractions."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transcription', type=int, nargs='+', help="Only entries for these transcriptions' current text.")
+        parser.add_argument('--prompt-version', help="Only entries made with this prompt version.")
+        parser.add_argument('--stale', action='store_true', help="Only entries made with outdated prompts.")
+        parser.add_argument('--all', action='store_true', help="Every entry.")
+        parser.add_argument('--max-bytes', type=int, help="Instead of invalidating, evict down to this size.")
+
+    def handle(self, *args, **options):
+        if options['max_bytes'] is not None:
+            self.stdout.write(f"Evicted {enforce_storage_cap(options['max_bytes'])} entries")
+            return
+
+        if not (options['transcription'] or options['prompt_version'] or options['stale'] or options['all']):
+            raise CommandError("Pass --transcription, --prompt-version, --stale or --all")
+
+        if options['transcription']:
+            deleted = 0
+            for transcription in Transcription.objects.filter(id__in=options['transcription']).only('transcription_text'):
+                deleted += invalidate(
+                    transcription.transcription_text or "", prompt_version=options['prompt_version'], stale=options['stale'],
+                )
+        else:
+            deleted = invalidate(prompt_version=options['prompt_version'], stale=options['stale'])
+        self.stdout.write(f"Deleted {deleted} cached responses")
@@ -0,0 +1,165 @@
+import json
+import time
+import asyncio
+import threading
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from transcription.models import Transcription, TranscriptionEvent
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else float('nan')
+
+
+class ASGIClient:
+    """Minimal in-process ASGI client: sends a request and feeds the streamed body to `on_body`."""
+
+    def __init__(self, application):
+        self.application = application
+
+    async def get(self, path, query_string, on_body):
+        return await self.request('GET', path, query_string, on_body)
+
+    async def request(self, method, path, query_string, on_body, body=b'', content_type=None):
+        disconnected = asyncio.Event()
+        request_sent = False
+        status = {}
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            elif message['type'] == 'http.response.body':
+                on_body(message.get('body', b''))
+
+        headers = [(b'host', b'localhost')]
+        if body:
+            headers.append((b'content-length', str(len(body)).encode()))
+        if content_type:
+            headers.append((b'content-type', content_type.encode()))
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query_string.encode(),
+            'root_path': '', 'headers': headers, 'client': ('127.0.0.1', 0),
+            'server': ('localhost', 80),
+        }
+        try:
+            await self.application(scope, receive, send)
+        finally:
+            disconnected.set()
+        return status.get('code')
+
+
+class Command(BaseCommand):
+    help = "Opens many concurrent progress watchers on one transcription and measures event delivery."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watchers', type=int, default=300)
+        parser.add_argument('--events', type=int, default=20, help="Events to publish while the watchers are connected.")
+        parser.add_argument('--interval', type=float, default=0.25, help="Seconds between published events.")
+        parser.add_argument('--transport', choices=['sse', 'long_poll'], default='sse')
+        parser.add_argument('--url', help="Base URL of a running ASGI server, e.g. http://localhost:8000. "
+                                          "Without it, requests go to themis.asgi.application in this process.")
+
+    def handle(self, *args, **options):
+        transcription = Transcription.objects.create(case_name="Progress load test")
+        try:
+            asyncio.run(self._run(transcription.id, options))
+        finally:
+            transcription.delete()
+
+    async def _run(self, transcription_id, options):
+        watchers, events = options['watchers'], options['events']
+        start_id = await TranscriptionEvent.objects.filter(transcription_id=transcription_id).values_list('sequence', flat=True).alast()
+        published = {}
+        received = [dict() for _ in range(watchers)]
+        terminal = asyncio.Event()
+
+        path = f"/api/transcription/{transcription_id}/events/"
+        if options['transport'] == 'long_poll':
+            path += 'poll/'
+        get = await self._transport(options['url'])
+
+        tasks = [asyncio.ensure_future(self._watch(get, path, options['transport'], start_id, received[n], events, terminal))
+                 for n in range(watchers)]
+        # Give every watcher time to connect and go idle before publishing
+        await asyncio.sleep(max(1.0, watchers / 200))
+        idle_threads = threading.active_count()
+
+        record = sync_to_async(TranscriptionEvent.record)
+        publish_start = time.perf_counter()
+        for n in range(events):
+            kind = 'joined' if n == events - 1 else 'chunk_transcribed'
+            event = await record(transcription_id, kind, chunk_index=n)
+            published[event.sequence] = time.perf_counter()
+            await asyncio.sleep(options['interval'])
+        terminal.set()
+
+        done, pending = await asyncio.wait(tasks, timeout=30)
+        for task in pending:
+            task.cancel()
+        failures = [task.exception() for task in done if task.exception()]
+
+        latencies = [seen[event_id] - sent for seen in received for event_id, sent in published.items() if event_id in seen]
+        delivered = sum(len([event_id for event_id in seen if event_id in published]) for seen in received)
+        self.stdout.write(
+            f"{watchers} {options['transport']} watchers, {events} events in {time.perf_counter() - publish_start:.1f}s\n"
+            f"delivered {delivered}/{watchers * events}, {len(failures)} watcher errors, {len(pending)} still waiting\n"
+            f"delivery latency ms: p50 {percentile(latencies, 0.5) * 1000:.0f}  p95 {percentile(latencies, 0.95) * 1000:.0f}  "
+            f"max {max(latencies, default=float('nan')) * 1000:.0f}\n"
+            f"threads while watchers were idle: {idle_threads}"
+        )
+        if failures:
+            self.stderr.write(f"First watcher error: {failures[0]!r}")
+
+    async def _transport(self, url):
+        if not url:
+            from themis.asgi import application
+            return ASGIClient(application).get
+
+        try:
+            import httpx
+        except ImportError:
+            raise CommandError("--url needs httpx installed")
+        client = httpx.AsyncClient(base_url=url, timeout=None, limits=httpx.Limits(max_connections=None))
+
+        async def get(path, query_string, on_body):
+            async with client.stream('GET', f"{path}?{query_string}") as response:
+                async for chunk in response.aiter_bytes():
+                    on_body(chunk)
+                return response.status_code
+        return get
+
+    async def _watch(self, get, path, transport, after, seen, events, terminal):
+        if transport == 'sse':
+            buffer = b''
+
+            def on_body(chunk):
+                nonlocal buffer
+                buffer += chunk
+                *messages, buffer = buffer.split(b'\n\n')
+                for message in messages:
+                    for line in message.split(b'\n'):
+                        if line.startswith(b'data: '):
+                            seen[json.loads(line[6:])['id']] = time.perf_counter()
+
+            await get(path, f"after={after or 0}", on_body)
+            return
+
+        # Long-poll: ask again with the newest id seen until the last event arrives
+        cursor = after or 0
+        while len(seen) < events and not (terminal.is_set() and len(seen) >= events):
+            body = bytearray()
+            await get(path, f"after={cursor}&timeout=25", body.extend)
+            result = json.loads(bytes(body))
+            for event in result['events']:
+                seen[event['id']] = time.perf_counter()
+            cursor = result['cursor']
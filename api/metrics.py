@@ -0,0 +1,106 @@
+import time
+import threading
+from contextlib import contextmanager
+
+
+class Metric:
+    """A labelled, thread-safe, process-local metric."""
+
+    type = None
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.lock = threading.Lock()
+        self.values = {}
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted(labels.items()))
+
+    def reset(self):
+        with self.lock:
+            self.values.clear()
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, dict(key), value) for key, value in self.values.items()]
+
+
+class Summary(Metric):
+    """Tracks count, sum and max of observed values, e.g. durations in seconds."""
+
+    type = 'summary'
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            count, total, maximum = self.values.get(key, (0, 0.0, 0.0))
+            self.values[key] = (count + 1, total + value, max(maximum, value))
+
+    @contextmanager
+    def time(self, **labels):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start_time, **labels)
+
+    def value(self, **labels):
+        return self.values.get(self._key(labels), (0, 0.0, 0.0))
+
+    def samples(self):
+        with self.lock:
+            samples = []
+            for key, (count, total, maximum) in self.values.items():
+                samples.append((f"{self.name}_count", dict(key), count))
+                samples.append((f"{self.name}_sum", dict(key), total))
+                samples.append((f"{self.name}_max", dict(key), maximum))
+            return samples
+
+
+REGISTRY = {}
+_registry_lock = threading.Lock()
+
+
+def _get_or_create(metric_class, name, help_text):
+    with _registry_lock:
+        if name not in REGISTRY:
+            REGISTRY[name] = metric_class(name, help_text)
+        return REGISTRY[name]
+
+
+def counter(name, help_text=""):
+    return _get_or_create(Counter, name, help_text)
+
+
+def summary(name, help_text=""):
+    return _get_or_create(Summary, name, help_text)
+
+
+def render_prometheus():
+    """Renders every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in sorted(REGISTRY.values(), key=lambda m: m.name):
+        lines.append(f"# HELP {metric.name} {metric.help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for sample_name, labels, value in metric.samples():
+            label_text = ",".join(f'{key}="{val}"' for key, val in sorted(labels.items()))
+            lines.append(f"{sample_name}{{{label_text}}} {value}" if label_text else f"{sample_name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# Pipeline metrics
+ASR_REQUESTS = counter('themis_asr_requests_total', "Requests sent to a speech-to-text API.")
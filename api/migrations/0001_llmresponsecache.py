@@ -0,0 +1,48 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:48
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="LLMResponseCache",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("transcript_hash", models.CharField(max_length=64)),
+                ("prompt_version", models.CharField(max_length=64)),
+                ("model", models.CharField(max_length=100)),
+                ("response", models.JSONField()),
+                ("size", models.PositiveIntegerField(default=0)),
+                ("hits", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "last_used_at",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="llmresponsecache",
+            constraint=models.UniqueConstraint(
+                fields=("transcript_hash", "prompt_version", "model"),
+                name="api_llm_cache_key",
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def _load_diarization_pipeline():
+    # Imported here so torch and pyannote are only loaded by processes that actually diarize
+    from pyannote.audio import Pipeline
+
+    # Use your Hugging Face access token if needed
+    return Pipeline.from_pretrained("pyannote/speaker-diarization-3.1", use_auth_token=os.getenv('HF_AUTH_TOKEN'))
+
+
+# Loaders for every model the pipeline can use, keyed by name
+LOADERS = {
+    'diarization': _load_diarization_pipeline,
+}
+
+_models = {}
+_lock = threading.Lock()
+
+
+def get_model(name):
+    """Returns the named model, loading it on first use and caching it for the life of the process."""
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    with _lock:
+        # Another thread may have finished loading while we waited for the lock
+        if name not in _models:
+            start_time = time.perf_counter()
+            logger.info(f"Loading model '{name}' in process {os.getpid()}")
+            _models[name] = LOADERS[name]()
+            logger.info(f"Loaded model '{name}' in {time.perf_counter() - start_time:.2f} seconds")
+        return _models[name]
+
+
+def is_loaded(name):
+    return name in _models
+
+
+def preload(*names):
+    """Loads models up front, e.g. in the gunicorn master so forked workers share them copy-on-write."""
+    for name in names or LOADERS:
+        get_model(name)
+
+
+def get_diarization_pipeline():
+    return get_model('diarization')
@@ -1,3 +1,25 @@
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
+
+
+class LLMResponseCache(models.Model):
+    """A stored case-information extraction, keyed on what determines the model's answer."""
+
+    transcript_hash = models.CharField(max_length=64)  # SHA-256 of the transcript text
+    prompt_version = models.CharField(max_length=64)  # changes whenever the prompts or extraction mode change
+    model = models.CharField(max_length=100)
+    response = models.JSONField()
+    size = models.PositiveIntegerField(default=0)  # bytes of the serialized response
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['transcript_hash', 'prompt_version', 'model'], name='api_llm_cache_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.prompt_version} {self.transcript_hash[:12]}"
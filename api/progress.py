@@ -0,0 +1,252 @@
+import re
+import json
+import asyncio
+import logging
+import weakref
+from collections import defaultdict
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Max
+from api.metrics import counter
+from transcription.models import Transcription, TranscriptionEvent
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_WATCHERS = counter('themis_progress_watch_total', "Progress watch requests, by transport.")
+
+
+def _database(func):
+    """Runs an ORM function on the shared database thread.
+
+    Outside Django's request cycle nothing closes a broken connection, so it is closed here after
+    an error and the next query reconnects.
+    """
+    def run(*args):
+        try:
+            return func(*args)
+        except DatabaseError:
+            connection.close()
+            raise
+    return sync_to_async(run, thread_sensitive=True)
+
+
+@_database
+def transcription_exists(pk):
+    return Transcription.objects.filter(pk=pk).exists()
+
+
+@_database
+def _latest_sequences(transcription_ids):
+    return dict(
+        TranscriptionEvent.objects.filter(transcription_id__in=transcription_ids)
+        .values('transcription_id').annotate(last=Max('sequence')).values_list('transcription_id', 'last')
+    )
+
+
+@_database
+def _events_since(transcription_id, after):
+    return [event.as_dict() for event in TranscriptionEvent.objects.filter(transcription_id=transcription_id, sequence__gt=after).order_by('sequence')]
+
+
+class EventHub:
+    """Wakes watchers of a transcription when new progress events are stored.
+
+    One poller per process reads the latest event sequence of every watched transcription, in one
+    query however many clients are watching, and wakes the watchers whose cursor is behind it.
+    Comparing cursors with sequences rather than tracking the newest id seen means an event is
+    never skipped because a later one committed first, nor missed because it committed between a
+    watcher's read and its wait. Woken watchers with the same cursor share one read of the events.
+    The poller stops while nobody is watching.
+    """
+
+    def __init__(self, poll_interval):
+        self.poll_interval = poll_interval
+        self.waiters = defaultdict(dict)
+        self.reads = {}
+        self.poller = None
+
+    async def wait(self, transcription_id, after, timeout):
+        """Returns True when the transcription has events after `after`, False after `timeout` seconds."""
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[transcription_id][future] = after
+        if self.poller is None or self.poller.done():
+            self.poller = asyncio.ensure_future(self._poll())
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            waiters = self.waiters.get(transcription_id)
+            if waiters is not None:
+                waiters.pop(future, None)
+                if not waiters:
+                    del self.waiters[transcription_id]
+
+    async def events_since(self, transcription_id, after):
+        """The transcription's events after the cursor, as dicts shared between callers (do not modify)."""
+        key = (transcription_id, after)
+        read = self.reads.get(key)
+        if read is None:
+            read = self.reads[key] = asyncio.ensure_future(_events_since(transcription_id, after))
+            read.add_done_callback(lambda _: self.reads.pop(key, None))
+        return await asyncio.shield(read)
+
+    async def _poll(self):
+        while self.waiters:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                latest = await _latest_sequences(list(self.waiters))
+            except DatabaseError as e:
+                logger.warning(f"Progress event poll failed: {e}")
+                continue
+            for transcription_id, last in latest.items():
+                for future, after in list(self.waiters.get(transcription_id, {}).items()):
+                    if last > after and not future.done():
+                        future.set_result(True)
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_event_hub():
+    """Returns the hub of the running event loop: one per ASGI worker process."""
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = EventHub(getattr(settings, 'PROGRESS_POLL_INTERVAL', 0.5))
+    return hub
+
+
+def is_finished(events):
+    """Nothing follows a failed transcription or the diarization join, the last step of the pipeline."""
+    return any(event['kind'] == 'joined' or (event['kind'] == 'status' and event['data'].get('status') == 'failed') for event in events)
+
+
+async def long_poll(transcription_id, after, timeout):
+    """Events after the cursor, waiting up to `timeout` seconds for the first one to arrive."""
+    hub = get_event_hub()
+    events = await hub.events_since(transcription_id, after)
+    if not events:
+        # Read again even after a timeout: an event may have arrived after the last poll
+        await hub.wait(transcription_id, after, timeout)
+        events = await hub.events_since(transcription_id, after)
+    return events
+
+
+async def event_stream(transcription_id, after):
+    """Server-sent events: every event after the cursor, then new ones as they are stored.
+
+    Comments keep idle connections open. The stream ends once the pipeline is finished or after
+    PROGRESS_STREAM_MAX_SECONDS, and EventSource clients reconnect with Last-Event-ID to resume
+    where they left off.
+    """
+    hub = get_event_hub()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + getattr(settings, 'PROGRESS_STREAM_MAX_SECONDS', 300)
+    keepalive = getattr(settings, 'PROGRESS_KEEPALIVE_SECONDS', 15)
+
+    yield "retry: 2000\n\n"
+    events = await hub.events_since(transcription_id, after)
+    while True:
+        for event in events:
+            after = event['id']
+            yield f"id: {event['id']}\nevent: {event['kind']}\ndata: {json.dumps(event)}\n\n"
+        if is_finished(events):
+            return
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return
+        await hub.wait(transcription_id, after, min(keepalive, remaining))
+        events = await hub.events_since(transcription_id, after)
+        if not events:
+            yield ": keepalive\n\n"
+
+
+def parse_cursor(value):
+    """The id of the last event the client has seen, or None if the cursor is malformed."""
+    try:
+        return max(int(value or 0), 0)
+    except ValueError:
+        return None
+
+
+def poll_timeout(value):
+    try:
+        timeout = float(value) if value is not None else 25
+    except ValueError:
+        timeout = 25
+    return min(max(timeout, 0), getattr(settings, 'PROGRESS_MAX_POLL_SECONDS', 60))
+
+
+PROGRESS_PATH_RE = re.compile(r'^/api/transcription/(?P<pk>\d+)/events/(?P<poll>poll/)?$')
+
+
+def with_progress_routes(django_application):
+    """Wraps the Django ASGI application so the progress endpoints are served directly.
+
+    Django's ASGI handler gives every request its own thread for sync middleware and keeps it for
+    the life of the response, so hundreds of open streams would hold hundreds of idle threads.
+    Served here, an idle watcher is just a suspended coroutine and all queries share one thread.
+    The same endpoints in api.views serve the test client, and long-polling under WSGI; the WSGI
+    handler would buffer a whole event stream, so there the SSE endpoint refers clients to long-poll.
+    """
+    async def application(scope, receive, send):
+        match = PROGRESS_PATH_RE.match(scope.get('path', '')) if scope['type'] == 'http' else None
+        if match is None or scope['method'] != 'GET':
+            return await django_application(scope, receive, send)
+        await _serve_progress(scope, receive, send, int(match['pk']), bool(match['poll']))
+    return application
+
+
+async def _serve_progress(scope, receive, send, pk, poll):
+    query = {key: values[-1] for key, values in parse_qs(scope.get('query_string', b'').decode('latin1')).items()}
+    headers = {name.decode('latin1').lower(): value.decode('latin1') for name, value in scope.get('headers', [])}
+    cors = [(b'access-control-allow-origin', b'*')] if getattr(settings, 'CORS_ORIGIN_ALLOW_ALL', False) else []
+
+    async def send_json(status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        await send({'type': 'http.response.start', 'status': status, 'headers': [
+            (b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())] + cors})
+        await send({'type': 'http.response.body', 'body': body})
+
+    after = parse_cursor(query.get('after') or headers.get('last-event-id'))
+    if after is None:
+        return await send_json(400, {'error': "The event cursor must be an event id."})
+    if not await transcription_exists(pk):
+        return await send_json(404, {'error': "Transcription not found."})
+
+    async def disconnected():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    if poll:
+        PROGRESS_WATCHERS.inc(transport='long_poll')
+        response = asyncio.ensure_future(long_poll(pk, after, poll_timeout(query.get('timeout'))))
+        disconnect = asyncio.ensure_future(disconnected())
+        await asyncio.wait([response, disconnect], return_when=asyncio.FIRST_COMPLETED)
+        disconnect.cancel()
+        if not response.done():
+            response.cancel()
+            return
+        events = response.result()
+        return await send_json(200, {'events': events, 'cursor': events[-1]['id'] if events else after})
+
+    PROGRESS_WATCHERS.inc(transport='sse')
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'), (b'x-accel-buffering', b'no')] + cors})
+
+    async def stream():
+        async for message in event_stream(pk, after):
+            await send({'type': 'http.response.body', 'body': message.encode('utf-8'), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    # Stop streaming as soon as the client goes away instead of at the next write
+    streaming = asyncio.ensure_future(stream())
+    disconnect = asyncio.ensure_future(disconnected())
+    await asyncio.wait([streaming, disconnect], return_when=asyncio.FIRST_COMPLETED)
+    for task in (streaming, disconnect):
+        task.cancel()
+    if streaming.done() and not streaming.cancelled() and streaming.exception():
+        raise streaming.exception()
@@ -0,0 +1,271 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from django.conf import settings
+from api.metrics import counter, summary
+
+logger = logging.getLogger(__name__)
+
+S3_UPLOADED_BYTES = counter('themis_s3_uploaded_bytes_total', "Bytes uploaded to S3.")
+S3_UPLOADS = counter('themis_s3_uploads_total', "Files uploaded to S3, by outcome.")
+S3_UPLOAD_SECONDS = summary('themis_s3_upload_seconds', "Time to upload one file to S3.")
+
+MB = 1024 * 1024
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """Returns this process's S3 client, created on first use and shared by every thread.
+
+    boto3 clients are thread-safe; its connection pool is sized for S3_UPLOAD_WORKERS files each
+    sending S3_MAX_CONCURRENCY parts at once, so parallel uploads reuse connections instead of
+    queueing for one. With S3_FAKE_ROOT set, objects are written under that directory instead.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            fake_root = getattr(settings, 'S3_FAKE_ROOT', None)
+            if fake_root:
+                _client = FilesystemS3Client(fake_root)
+            else:
+                connections = getattr(settings, 'S3_UPLOAD_WORKERS', 8) * getattr(settings, 'S3_MAX_CONCURRENCY', 8)
+                _client = boto3.session.Session().client(
+                    's3',
+                    aws_access_key_id=getattr(settings, 'AWS_ACCESS_KEY_ID', None),
+                    aws_secret_access_key=getattr(settings, 'AWS_SECRET_ACCESS_KEY', None),
+                    region_name=getattr(settings, 'AWS_S3_REGION_NAME', None),
+                    endpoint_url=getattr(settings, 'S3_ENDPOINT_URL', None),
+                    config=Config(max_pool_connections=connections, retries={'max_attempts': 5, 'mode': 'standard'}),
+                )
+        return _client
+
+
+def reset_s3_client():
+    """Drops the shared client, e.g. after changing the S3 settings in tests."""
+    global _client
+    with _client_lock:
+        _client = None
+
+
+def get_transfer_config():
+    """Multipart settings: parts of S3_MULTIPART_CHUNKSIZE sent S3_MAX_CONCURRENCY at a time above the threshold."""
+    return TransferConfig(
+        multipart_threshold=getattr(settings, 'S3_MULTIPART_THRESHOLD', 16 * MB),
+        multipart_chunksize=getattr(settings, 'S3_MULTIPART_CHUNKSIZE', 16 * MB),
+        max_concurrency=getattr(settings, 'S3_MAX_CONCURRENCY', 8),
+        use_threads=True,
+    )
+
+
+def object_url(key, bucket=None):
+    bucket = bucket or settings.AWS_STORAGE_BUCKET_NAME
+    return f"https://{bucket}.s3.{settings.AWS_S3_REGION_NAME}.amazonaws.com/{key}"
+
+
+def _size(source):
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    try:
+        return os.fstat(source.fileno()).st_size - source.tell()
+    except (AttributeError, OSError, ValueError):
+        position = source.tell()
+        size = source.seek(0, os.SEEK_END) - position
+        source.seek(position)
+        return size
+
+
+def upload(source, key, bucket=None, content_type=None, client=None, transfer_config=None):
+    """Uploads a file path or a readable file object to S3 and returns its size in bytes.
+
+    Paths and objects are streamed part by part; nothing is copied to a temporary file first.
+    """
+    client = client or get_s3_client()
+    bucket = bucket or settings.AWS_STORAGE_BUCKET_NAME
+    extra_args = {'ContentType': content_type} if content_type else None
+    size = _size(source)
+    start_time = time.perf_counter()
+    try:
+        if isinstance(source, (str, os.PathLike)):
+            client.upload_file(os.fspath(source), bucket, key, ExtraArgs=extra_args, Config=transfer_config or get_transfer_config())
+        else:
+            client.upload_fileobj(source, bucket, key, ExtraArgs=extra_args, Config=transfer_config or get_transfer_config())
+    except Exception:
+        S3_UPLOADS.inc(outcome='failed')
+        raise
+    S3_UPLOADS.inc(outcome='succeeded')
+    S3_UPLOADED_BYTES.inc(size)
+    S3_UPLOAD_SECONDS.observe(time.perf_counter() - start_time)
+    return size
+
+
+class S3Uploader:
+    """Uploads many files in parallel over the shared client.
+
+    Submit paths or file objects as they become available, e.g. chunks as the chunker writes
+    them; at most `workers` files upload at once and submit() blocks while `max_pending` are
+    waiting, so a fast producer cannot queue unbounded buffers. Leaving the `with` block waits
+    for every upload; `stats` then holds the totals.
+    """
+
+    def __init__(self, bucket=None, workers=None, client=None, transfer_config=None, max_pending=None):
+        self.bucket = bucket or settings.AWS_STORAGE_BUCKET_NAME
+        self.workers = workers or getattr(settings, 'S3_UPLOAD_WORKERS', 8)
+        self.client = client
+        self.transfer_config = transfer_config
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="s3-upload")
+        self.pending = threading.BoundedSemaphore(max_pending or self.workers * 2)
+        self.futures = []
+        self.start_time = time.perf_counter()
+        self.stats = None
+
+    def submit(self, source, key, content_type=None):
+        """Starts uploading `source` to `key`; returns a Future of the number of bytes sent."""
+        self.pending.acquire()
+        try:
+            future = self.executor.submit(upload, source, key, self.bucket, content_type, self.client, self.transfer_config)
+        except BaseException:
+            self.pending.release()
+            raise
+        future.add_done_callback(lambda _: self.pending.release())
+        self.futures.append((key, future))
+        return future
+
+    def close(self):
+        """Waits for every upload and returns {'files', 'bytes', 'seconds', 'mb_per_s', 'failed'}."""
+        self.executor.shutdown(wait=True)
+        seconds = time.perf_counter() - self.start_time
+        failed = {key: future.exception() for key, future in self.futures if future.exception() is not None}
+        for key, error in failed.items():
+            logger.error(f"Upload of {key} failed: {error}")
+        sent = sum(future.result() for key, future in self.futures if key not in failed)
+        self.stats = {
+            'files': len(self.futures) - len(failed),
+            'bytes': sent,
+            'seconds': seconds,
+            'mb_per_s': sent / MB / seconds if seconds else 0.0,
+            'failed': failed,
+        }
+        return self.stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def upload_many(items, **uploader_options):
+    """Uploads (source, key) pairs in parallel; returns the uploader stats."""
+    with S3Uploader(**uploader_options) as uploader:
+        for source, key in items:
+            uploader.submit(source, key)
+    return uploader.stats
+
+
+def transcription_key(transcription_id, name):
+    prefix = getattr(settings, 'S3_ARTIFACT_PREFIX', 'transcriptions')
+    return f"{prefix}/{transcription_id}/{name}"
+
+
+def chunk_key(transcription_id, chunk_file_path):
+    return transcription_key(transcription_id, f"chunks/{os.path.basename(chunk_file_path)}")
+
+
+def upload_chunks_as_exported(chunk_files, uploader, transcription_id):
+    """Passes (index, path) pairs from the chunker through, submitting each file as soon as it is written."""
+    for index, chunk_file_path in chunk_files:
+        uploader.submit(chunk_file_path, chunk_key(transcription_id, chunk_file_path))
+        yield index, chunk_file_path
+
+
+def upload_transcription_artifacts(transcription_id, **uploader_options):
+    """Uploads every audio chunk and the case-brief PDF of a transcription in parallel."""
+    from case_brief.models import CaseBrief
+    from transcription_chunks.models import AudioChunk
+
+    items = []
+    for chunk in AudioChunk.objects.filter(transcription_id=transcription_id).only('chunk_file').order_by('chunk_index'):
+        if chunk.chunk_file and os.path.exists(chunk.chunk_file.path):
+            items.append((chunk.chunk_file.path, chunk_key(transcription_id, chunk.chunk_file.path)))
+    pdf_path = CaseBrief.objects.filter(transcription_id=transcription_id).values_list('pdf_file_path', flat=True).first()
+    if pdf_path and os.path.exists(pdf_path):
+        items.append((pdf_path, transcription_key(transcription_id, "case_brief.pdf")))
+
+    stats = upload_many(items, **uploader_options)
+    logger.info(f"Uploaded {stats['files']} artifacts of transcription {transcription_id}: "
+                f"{stats['bytes'] / MB:.1f} MB at {stats['mb_per_s']:.1f} MB/s")
+    return stats
+
+
+class FilesystemS3Client:
+    """Local stand-in for the S3 client calls used here: objects are files under root/bucket/key.
+
+    With `latency` and `link_mb_per_s` set, every request and part is delayed like a network
+    connection of that speed, and files above the multipart threshold send their parts
+    max_concurrency at a time, so parallel and multipart uploads can be measured offline.
+    """
+
+    def __init__(self, root, latency=0.0, link_mb_per_s=None):
+        self.root = root
+        self.latency = latency
+        self.link_mb_per_s = link_mb_per_s
+
+    def path(self, bucket, key):
+        return os.path.join(self.root, bucket, *key.split('/'))
+
+    def _send(self, size):
+        delay = self.latency + (size / MB / self.link_mb_per_s if self.link_mb_per_s else 0)
+        if delay:
+            time.sleep(delay)
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        with open(Filename, 'rb') as source:
+            self.upload_fileobj(source, Bucket, Key, ExtraArgs, Callback, Config)
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        config = Config or TransferConfig()
+        path = self.path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f"{path}.{threading.get_ident()}.part"
+        with open(temporary_path, 'wb') as target:
+            first = Fileobj.read(config.multipart_threshold)
+            if len(first) < config.multipart_threshold:
+                self._send(len(first))
+                target.write(first)
+            else:
+                self._upload_parts(first, Fileobj, target, config)
+        os.replace(temporary_path, path)
+
+    def _upload_parts(self, first, source, target, config):
+        # Parts are read in order like s3transfer does, and "sent" on up to max_concurrency threads
+        with ThreadPoolExecutor(max_workers=config.max_concurrency) as executor:
+            futures = []
+            self._send(0)  # CreateMultipartUpload
+            buffered = first
+            while True:
+                while len(buffered) < config.multipart_chunksize:
+                    more = source.read(config.multipart_chunksize - len(buffered))
+                    if not more:
+                        break
+                    buffered += more
+                if not buffered:
+                    break
+                part, buffered = buffered[:config.multipart_chunksize], buffered[config.multipart_chunksize:]
+                futures.append(executor.submit(self._send, len(part)))
+                target.write(part)
+                # Bound read-ahead like s3transfer does, to max_concurrency parts in memory
+                if len(futures) >= config.max_concurrency:
+                    futures.pop(0).result()
+            for future in futures:
+                future.result()
+            self._send(0)  # CompleteMultipartUpload
+
+    def head_object(self, Bucket, Key):
+        return {'ContentLength': os.path.getsize(self.path(Bucket, Key))}
@@ -7,14 +7,32 @@ from case_matching.models import Case_matching
 from case_brief.models import CaseBrief
 
 
-class AudioChunkSerializer(serializers.ModelSerializer):
+class ProjectedFieldsMixin:
+    """Pass fields=[...] to render only those fields."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class AudioChunkSerializer(ProjectedFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = AudioChunk
-        fields = ['id', 'transcription', 'chunk_file', 'chunk_index', 'transcription_text', 'diarization_data', 'status', 'created_at']
-        read_only_fields = ['id', 'transcription_text', 'diarization_data', 'status', 'created_at']
+        fields = ['id', 'transcription', 'chunk_file', 'chunk_index', 'transcription_text', 'diarization_data', 'status', 'asr_calls', 'created_at']
+        read_only_fields = ['id', 'transcription_text', 'diarization_data', 'status', 'asr_calls', 'created_at']
 
 
-class TranscriptionSerializer(serializers.ModelSerializer):
+class AudioChunkSummarySerializer(serializers.ModelSerializer):
+    """Chunk list rows without the transcription text and diarization data."""
+
+    class Meta:
+        model = AudioChunk
+        fields = ['id', 'transcription', 'chunk_index', 'status', 'asr_calls', 'created_at']
+
+
+class TranscriptionSerializer(ProjectedFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Transcription
         fields = ['id', 'audio_file', 'transcription_text', 'case_name', 'case_number', 'status', 'date_created', 'date_updated']
@@ -23,6 +41,14 @@ class TranscriptionSerializer(serializers.ModelSerializer):
         return Transcription.objects.create(**validated_data)
 
 
+class TranscriptionSummarySerializer(serializers.ModelSerializer):
+    """Transcription list rows without the transcription text."""
+
+    class Meta:
+        model = Transcription
+        fields = ['id', 'audio_file', 'case_name', 'case_number', 'status', 'date_created', 'date_updated']
+
+
 class DiarizedSegmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = DiarizedSegment
@@ -40,7 +66,15 @@ class CaseMatchingSerializers(serializers.ModelSerializer):
         return super().create(validated_data)
         
 
-class CaseBriefSerializer(serializers.ModelSerializer):
+class CaseBriefSerializer(ProjectedFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = CaseBrief
+        fields = ['id', 'transcription', 'generated_caseBrief', 'formatted_Casebrief', 'created_at']
+
+
+class CaseBriefSummarySerializer(serializers.ModelSerializer):
+    """Case brief list rows without the brief text."""
+
     class Meta:
         model = CaseBrief
-        fields = ['id', 'transcription', 'generated_caseBrief', 'formatted_Casebrief', 'created_at']
\ No newline at end of file
+        fields = ['id', 'transcription', 'created_at']
@@ -1,3 +1,791 @@
-from django.test import TestCase
+import os
+import re
+import json
+import time
+import asyncio
+import shutil
+import struct
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import numpy as np
+import assemblyai as aai
+from botocore.exceptions import NoCredentialsError
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from fpdf import FPDF
+from api.alignment import align_proportionally, align_words, assign_words_to_turns
+from api.extraction import (PLACEHOLDER, aextract_case_info_from_transcription, extract_case_info_from_transcription,
+                            merge_case_info, parse_json_response, split_transcript)
+from api.async_clients import close_http_client
+from api.llm import LLM_REQUESTS, AsyncLemurClient, LemurClient, SimulatedLLMClient
+from api.llm_cache import enforce_storage_cap, invalidate
+from api.models import LLMResponseCache
+from api.pdf import _images as pdf_images, _parse_alpha_png, add_text_with_bold, create_pool, init_worker, load_image, load_images, submit_pdf
+from api.s3 import FilesystemS3Client, S3Uploader, get_s3_client, reset_s3_client, upload_transcription_artifacts
+from api.utils import upload_file_to_s3
+from case_brief.models import CaseBrief
+from case_matching.models import Case_matching
+from case_matching.signals import extract_case_details
+from diarization.models import DiarizedSegment
+from diarization.signals import join_diarized_chunks
+from transcription_chunks.models import AudioChunk
+from transcription_chunks.signals import build_transcript, refresh_transcription_status, transcribe_transcription_chunks
+from asgiref.sync import sync_to_async
+from transcription.models import Transcription, TranscriptionEvent
+from api.management.commands.bench_alignment import SyntheticDiarization
+from api.management.commands.bench_async_views import StubLemur
+from api.management.commands.load_test_progress import ASGIClient
+from api.progress import EventHub, long_poll, with_progress_routes
 
 # Create your tests here.
+
+
+@override_settings(LLM_CACHE_ENABLED=True, CASE_BRIEF_SECTION_CHARS=30000)
+class LLMResponseCacheTests(TestCase):
+    """Extracting an unchanged transcript again must not call the model."""
+
+    def setUp(self):
+        self.client_ = SimulatedLLMClient(base_latency=0, seconds_per_1k_input_chars=0, seconds_per_1k_output_chars=0)
+        LLM_REQUESTS.reset()
+
+    def extract(self, text):
+        return extract_case_info_from_transcription(text, mode='auto', client=self.client_)
+
+    def requests(self):
+        return LLM_REQUESTS.value(client='simulated', model='simulated')
+
+    def test_repeat_extraction_is_served_from_cache(self):
+        first = self.extract("Court: The accused is charged with robbery.")
+        second = self.extract("Court: The accused is charged with robbery.")
+        self.assertEqual(first, second)
+        self.assertEqual(self.requests(), 1)
+        self.assertEqual(LLMResponseCache.objects.get().hits, 1)
+
+    def test_changed_transcript_or_invalidation_misses(self):
+        self.extract("Court: The accused is charged with robbery.")
+        self.extract("Court: The accused is charged with theft.")
+        self.assertEqual(self.requests(), 2)
+
+        self.assertEqual(invalidate("Court: The accused is charged with theft."), 1)
+        self.extract("Court: The accused is charged with theft.")
+        self.assertEqual(self.requests(), 3)
+
+    def test_storage_cap_evicts_least_recently_used(self):
+        for text in ("first hearing", "second hearing", "third hearing"):
+            self.extract(text)
+        self.extract("first hearing")  # now the most recently used
+
+        size = LLMResponseCache.objects.first().size
+        enforce_storage_cap(max_bytes=size * 2 + 10)
+        self.assertEqual(LLMResponseCache.objects.count(), 2)
+        self.extract("first hearing")
+        self.assertEqual(self.requests(), 3)
+
+
+def _png_chunk(chunk_type, body):
+    return struct.pack('>I', len(body)) + chunk_type + body + struct.pack('>I', zlib.crc32(chunk_type + body))
+
+
+def _write_png(color_type, channels, width=7, height=5):
+    rows = bytearray()
+    for y in range(height):
+        rows.append(y % 5)  # every PNG filter type
+        rows.extend((x * 31 + y * 17) % 256 for x in range(width * channels))
+    header = struct.pack('>IIBBBBB', width, height, 8, color_type, 0, 0, 0)
+    data = zlib.compress(bytes(rows))
+    fd, path = tempfile.mkstemp(suffix='.png')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n' + _png_chunk(b'IHDR', header))
+        f.write(_png_chunk(b'IDAT', data[:10]) + _png_chunk(b'IDAT', data[10:]) + _png_chunk(b'IEND', b''))
+    return path
+
+
+class AlignmentTests(SimpleTestCase):
+    """Words go to the speaker turn covering their midpoint, or to the nearest turn when they fall in silence."""
+
+    def assign(self, midpoints, turns):
+        starts, ends = zip(*turns)
+        return assign_words_to_turns(midpoints, midpoints, starts, ends).tolist()
+
+    def test_turn_boundaries(self):
+        # A word whose midpoint is exactly on a boundary belongs to the turn starting there
+        self.assertEqual(self.assign([0.5, 0.999, 1.0, 1.999], [(0, 1), (1, 2)]), [0, 0, 1, 1])
+
+    def test_overlapping_turns(self):
+        # The long turn still covers 3.0 after the short interjection inside it has ended
+        self.assertEqual(self.assign([0.5, 1.5, 3.0], [(0, 5), (1, 2)]), [0, 1, 0])
+
+    def test_words_in_silence_go_to_the_nearest_turn(self):
+        self.assertEqual(self.assign([-1.0, 1.5, 2.6, 9.0], [(0, 1), (3, 4)]), [0, 0, 1, 1])
+
+    def test_no_turns(self):
+        with self.assertRaises(ValueError):
+            assign_words_to_turns([0.5], [0.5], [], [])
+        self.assertEqual(self.assign([], [(0, 1)]), [])
+
+    def test_align_words_merges_consecutive_speakers(self):
+        diarization = SyntheticDiarization(np.array([1.0, 0.0, 2.0]), np.array([2.0, 1.0, 3.0]),
+                                           np.array(['SPEAKER_01', 'SPEAKER_00', 'SPEAKER_00'], dtype=object))
+        words = [{'word': f" {text}", 'start': start, 'end': start + 0.2}
+                 for text, start in [("good", 0.1), ("morning", 0.5), ("my", 1.1), ("lord", 1.5), ("proceed", 2.2), ("please", 2.6)]]
+        self.assertEqual(align_words(diarization, words), [
+            {'speaker': 'SPEAKER_00', 'text': "good morning"},
+            {'speaker': 'SPEAKER_01', 'text': "my lord"},
+            {'speaker': 'SPEAKER_00', 'text': "proceed please"},
+        ])
+
+    def test_proportional_fallback(self):
+        diarization = SyntheticDiarization(np.array([0.0, 3.0]), np.array([3.0, 4.0]), np.array(['A', 'B'], dtype=object))
+        self.assertEqual(align_proportionally(diarization, "one two three four five six seven eight"), [
+            {'speaker': 'A', 'text': "one two three four five six"},
+            {'speaker': 'B', 'text': "seven eight"},
+        ])
+
+
+class ScriptedLLMClient:
+    """Answers each transcript section with the case information scripted for the section's first line."""
+
+    name = 'scripted'
+    model = 'scripted'
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.inputs = []
+
+    def respond(self, input_text):
+        self.inputs.append(input_text)
+        answer = self.answers[input_text.split("\n")[0]]
+        if isinstance(answer, Exception):
+            raise answer
+        return f"Here is the JSON: {json.dumps(answer)}"
+
+    def complete(self, prompt, input_text, max_output_size=4000):
+        return self.respond(input_text)
+
+
+class AsyncScriptedLLMClient(ScriptedLLMClient):
+    async def complete(self, prompt, input_text, max_output_size=4000):
+        return self.respond(input_text)
+
+
+@override_settings(CASE_BRIEF_SECTION_CHARS=60)
+class MapReduceExtractionTests(SimpleTestCase):
+    """Long transcripts are extracted section by section and the partial results merged."""
+
+    # Each line is a section of its own at 60 characters per section
+    lines = [
+        "Court: Republic versus Kamande, criminal case E12.",
+        "Prosecutor: The accused is charged with murder.",
+        "Defence: The accused is a first offender.",
+        "Court: The accused is convicted of murder.",
+    ]
+    transcript = "\n".join(lines)
+
+    def answers(self):
+        return dict(zip(self.lines, [
+            {'case_title': "Republic v Kamande", 'case_number': PLACEHOLDER, 'plea': "Not guilty",
+             'charges': "1. Murder contrary to section 203", 'filtered_transcript': "Kamande is charged."},
+            {'case_title': "R v Kamande", 'case_number': "E12 of 2024", 'plea': "Not guilty",
+             'charges': ["1. murder  contrary to section 203", "2. Possession of a firearm"]},
+            {'mitigating_factors': "1. First offender", 'filtered_transcript': "He is a first offender."},
+            {'verdict': "Guilty of murder"},
+        ]))
+
+    def test_split_transcript_breaks_between_lines(self):
+        self.assertEqual(split_transcript(self.transcript, 60), self.lines)
+        self.assertEqual(split_transcript(self.transcript, 100), ["\n".join(self.lines[:2]), "\n".join(self.lines[2:])])
+
+    def test_split_transcript_breaks_long_lines_between_words(self):
+        line = " ".join(f"word{i}" for i in range(40))
+        sections = split_transcript(f"{line}\n\nlast line", 50)
+        self.assertTrue(all(len(section) <= 50 for section in sections))
+        self.assertEqual(" ".join(sections).split(), line.split() + ["last", "line"])
+
+    def test_parse_json_response(self):
+        self.assertEqual(parse_json_response('Sure! {"plea": "Guilty"} Hope this helps.'), {'plea': "Guilty"})
+        self.assertEqual(parse_json_response("no json here"), {})
+        self.assertEqual(parse_json_response(None), {})
+
+    def test_merge_case_info(self):
+        merged = merge_case_info(self.answers().values())
+        self.assertEqual(merged['case_title'], "Republic v Kamande")
+        self.assertEqual(merged['case_number'], "E12 of 2024")
+        self.assertEqual(merged['plea'], "Not guilty")
+        self.assertEqual(merged['charges'], "1. Murder contrary to section 203\n2. Possession of a firearm")
+        self.assertEqual(merged['mitigating_factors'], "1. First offender")
+        self.assertEqual(merged['verdict'], "Guilty of murder")
+        self.assertEqual(merged['filtered_transcript'], "Kamande is charged.\nHe is a first offender.")
+        self.assertEqual(merged['precedents_cited'], PLACEHOLDER)
+
+    def test_map_reduce_extracts_every_section(self):
+        client = ScriptedLLMClient(self.answers())
+        case_info = extract_case_info_from_transcription(self.transcript, mode='auto', client=client, use_cache=False)
+        self.assertEqual(sorted(client.inputs), sorted(self.lines))
+        self.assertEqual(case_info, merge_case_info(self.answers().values()))
+
+    def test_failed_section_is_left_out(self):
+        answers = self.answers()
+        answers[self.lines[2]] = RuntimeError("LeMUR unavailable")
+        case_info = extract_case_info_from_transcription(self.transcript, mode='map_reduce',
+                                                         client=ScriptedLLMClient(answers), use_cache=False)
+        self.assertEqual((case_info['case_title'], case_info['verdict']), ("Republic v Kamande", "Guilty of murder"))
+        self.assertEqual(case_info['mitigating_factors'], PLACEHOLDER)
+        self.assertEqual(case_info['filtered_transcript'], "Kamande is charged.")
+
+    def test_every_section_failing_returns_nothing(self):
+        client = ScriptedLLMClient({line: RuntimeError("LeMUR unavailable") for line in self.lines})
+        self.assertEqual(extract_case_info_from_transcription(self.transcript, mode='map_reduce', client=client, use_cache=False), {})
+
+    def test_async_map_reduce_matches_sync(self):
+        answers = self.answers()
+        answers[self.lines[2]] = RuntimeError("LeMUR unavailable")
+        expected = extract_case_info_from_transcription(self.transcript, mode='map_reduce',
+                                                        client=ScriptedLLMClient(answers), use_cache=False)
+        case_info = asyncio.run(aextract_case_info_from_transcription(self.transcript, mode='map_reduce',
+                                                                      client=AsyncScriptedLLMClient(answers), use_cache=False))
+        self.assertEqual(case_info, expected)
+
+    def test_short_transcript_uses_one_request(self):
+        client = ScriptedLLMClient({self.lines[0]: {'case_title': "Republic v Kamande"}})
+        case_info = extract_case_info_from_transcription(self.lines[0], mode='auto', client=client, use_cache=False)
+        self.assertEqual(case_info, {'case_title': "Republic v Kamande"})
+        self.assertEqual(client.inputs, [self.lines[0]])
+
+
+class AlphaPNGParseTests(SimpleTestCase):
+    """The numpy alpha split must produce exactly what fpdf's own PNG parser does."""
+
+    def write_png(self, color_type, channels, width=7, height=5):
+        path = _write_png(color_type, channels, width, height)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def assertMatchesFpdf(self, path):
+        pdf = FPDF()
+        pdf.add_page()
+        pdf.image(path, x=0, y=0, w=1, h=1)
+        expected = dict(pdf.images[path])
+        expected.pop('i')
+        self.assertEqual(_parse_alpha_png(path), expected)
+
+    def test_rgba(self):
+        self.assertMatchesFpdf(self.write_png(color_type=6, channels=4))
+
+    def test_gray_alpha(self):
+        self.assertMatchesFpdf(self.write_png(color_type=4, channels=2))
+
+    def test_other_images_are_left_to_fpdf(self):
+        self.assertIsNone(_parse_alpha_png(self.write_png(color_type=2, channels=3)))
+
+
+class BoldTextTests(SimpleTestCase):
+    """Bold spans flow inline in their paragraph instead of each becoming a paragraph of its own."""
+
+    def render(self, text):
+        pdf = FPDF()
+        pdf.add_page()
+        start = pdf.y
+        with mock.patch.object(FPDF, 'multi_cell', side_effect=AssertionError("multi_cell per fragment")):
+            add_text_with_bold(pdf, text)
+        return round((pdf.y - start) / 10)
+
+    def test_bold_spans_stay_on_their_line(self):
+        self.assertEqual(self.render("The accused [b]Ruth Kamande[/b] was found [b]guilty[/b]."), 1)
+
+    def test_lines_break_at_newlines(self):
+        self.assertEqual(self.render("First paragraph, [b]in part bold[/b].\nSecond paragraph."), 2)
+
+
+class PDFPoolTests(SimpleTestCase):
+    """Pool workers get the logo as parsed by the parent process and never parse it themselves."""
+
+    def setUp(self):
+        self.logo = _write_png(color_type=6, channels=4)
+        self.addCleanup(os.remove, self.logo)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        images = mock.patch.dict('api.pdf._images', clear=True)
+        images.start()
+        self.addCleanup(images.stop)
+
+    def test_workers_install_the_parents_images(self):
+        images = load_images([self.logo, os.path.join(self.directory, 'missing.png')])
+        self.assertEqual(list(images), [self.logo])
+
+        pdf_images.clear()
+        init_worker(images)
+        with mock.patch('api.pdf._parse_image', side_effect=AssertionError("parsed again")):
+            self.assertIs(load_image(self.logo), images[self.logo])
+
+    def test_pool_renders_with_the_logo(self):
+        pool = create_pool(1, [self.logo])
+        self.addCleanup(pool.shutdown)
+        path = os.path.join(self.directory, 'briefs', 'brief.pdf')
+        timings = submit_pdf("REPUBLIC V KAMANDE\nRULING ON SENTENCE\nThe accused is [b]convicted[/b].", path, self.logo,
+                             pool=pool).result(timeout=60)
+        self.assertIn('total', timings)
+        with open(path, 'rb') as f:
+            content = f.read()
+        self.assertTrue(content.startswith(b'%PDF-'))
+        self.assertIn(b'/SMask', content)
+
+
+class MetricsEndpointTests(SimpleTestCase):
+    """The Prometheus endpoint is off unless METRICS_TOKEN is set, and then needs the token."""
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_disabled_without_a_token(self):
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 404)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_requires_the_bearer_token(self):
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 401)
+        self.assertEqual(self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+
+class CaseBriefDownloadTests(TestCase):
+    """PDF downloads revalidate with ETag/Last-Modified, serve byte ranges and can be offloaded."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, 'brief.pdf')
+        with open(self.path, 'wb') as f:
+            f.write(b'%PDF-' + bytes(range(256)) * 4)
+        with self.settings(JOBS_RUN_INLINE=False):
+            self.transcription = Transcription.objects.create()
+        CaseBrief.objects.create(transcription=self.transcription, pdf_file_path=self.path)
+        self.url = f'/api/download_case_brief/transcription/{self.transcription.id}/'
+
+    def test_full_download_then_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), open(self.path, 'rb').read())
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        cached = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_rewritten_file_gets_new_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        with open(self.path, 'ab') as f:
+            f.write(b'more')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_byte_ranges(self):
+        content = open(self.path, 'rb').read()
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5-14')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 5-14/{len(content)}')
+        self.assertEqual(b''.join(response.streaming_content), content[5:15])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-4')
+        self.assertEqual(b''.join(response.streaming_content), content[-4:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(content)}-')
+        self.assertEqual(response.status_code, 416)
+
+        # A range ending before it starts is invalid, so the header is ignored
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5-3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), content)
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(content) + 5}-{len(content) + 1}')
+        self.assertEqual(response.status_code, 416)
+
+        # A stale If-Range gets the whole current file instead of a piece of it
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5-14', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_offload_to_front_end_server(self):
+        with self.settings(FILE_DOWNLOAD_OFFLOAD='x-accel-redirect', FILE_DOWNLOAD_ROOT=self.directory):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/brief.pdf')
+        self.assertEqual(response.content, b'')
+
+    def test_missing_pdf_is_404(self):
+        os.remove(self.path)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.client.get('/api/download_case_brief/transcription/0/').status_code, 404)
+
+
+@override_settings(JOBS_RUN_INLINE=False)
+class ListEndpointTests(TestCase):
+    """List endpoints return cursor pages of summary rows unless ?fields= asks for more."""
+
+    def setUp(self):
+        Transcription.objects.bulk_create(
+            Transcription(case_name=f"Case {n}", transcription_text="long text " * 1000, status='completed')
+            for n in range(7)
+        )
+
+    def test_summary_rows_are_paginated_by_cursor(self):
+        seen = []
+        url = '/api/transcriptions/?page_size=3'
+        while url:
+            page = self.client.get(url).json()
+            self.assertNotIn('transcription_text', page['results'][0])
+            seen.extend(row['id'] for row in page['results'])
+            url = page['next']
+        self.assertEqual(seen, sorted(Transcription.objects.values_list('id', flat=True), reverse=True))
+
+    def test_summary_query_skips_large_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/transcriptions/')
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('transcription_text', queries[0]['sql'])
+
+    def test_fields_projection(self):
+        rows = self.client.get('/api/transcriptions/?fields=id,transcription_text').json()['results']
+        self.assertEqual(set(rows[0]), {'id', 'transcription_text'})
+
+        response = self.client.get('/api/transcriptions/?fields=id,secret')
+        self.assertEqual(response.status_code, 400)
+
+    def test_case_brief_list(self):
+        CaseBrief.objects.create(transcription=Transcription.objects.first(), generated_caseBrief="brief " * 1000)
+        rows = self.client.get('/api/case_briefs/').json()['results']
+        self.assertEqual(set(rows[0]), {'id', 'transcription', 'created_at'})
+        rows = self.client.get('/api/case_briefs/?fields=id,generated_caseBrief').json()['results']
+        self.assertTrue(rows[0]['generated_caseBrief'].startswith("brief"))
+
+
+# Plan lines that read a whole table: SQLite's EXPLAIN QUERY PLAN and PostgreSQL's EXPLAIN
+FULL_SCAN_RE = re.compile(r'^(.*\bSCAN \w+|.*Seq Scan on \w+)$', re.MULTILINE)
+
+
+def explain(sql):
+    """The query plan for captured SQL. PostgreSQL is told to avoid sequential scans, which it
+    would otherwise prefer on tables this small, so the plan shows whether an index is usable."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}")
+        return "\n".join(str(row[-1]) for row in cursor.fetchall())
+
+
+@override_settings(JOBS_RUN_INLINE=False)
+class QueryBudgetTests(TestCase):
+    """The pipeline's hot queries stay within their query counts and are answered from indexes."""
+
+    def setUp(self):
+        self.transcription = Transcription.objects.create(is_chunked=True, status='completed')
+        AudioChunk.objects.bulk_create(
+            AudioChunk(transcription=self.transcription, chunk_index=index, status='diarized',
+                       transcription_text=f"chunk {index}", diarization_data=f"speaker {index}")
+            for index in range(3)
+        )
+        CaseBrief.objects.create(transcription=self.transcription, generated_caseBrief="brief")
+        Case_matching.objects.create(transcription=self.transcription, case={})
+        DiarizedSegment.objects.create(transcription=self.transcription, diarization_data="speakers")
+
+    def plans(self, run):
+        """Runs `run` and returns the plan of every filtered SELECT it made."""
+        with CaptureQueriesContext(connection) as queries:
+            run()
+        return {query['sql']: explain(query['sql']) for query in queries
+                if query['sql'].startswith('SELECT') and ' WHERE ' in query['sql']}
+
+    def assertIndexed(self, plans):
+        for sql, plan in plans.items():
+            self.assertIsNone(FULL_SCAN_RE.search(plan), f"Full table scan for {sql}:\n{plan}")
+
+    def test_signal_handlers_use_indexes(self):
+        plans = self.plans(lambda: (
+            build_transcript(self.transcription),
+            transcribe_transcription_chunks(self.transcription),
+            refresh_transcription_status(self.transcription),
+            join_diarized_chunks(self.transcription),
+        ))
+        self.assertIndexed(plans)
+        all_plans = "\n".join(plans.values())
+        self.assertIn('audiochunk_transcribed_idx', all_plans)
+        self.assertIn('audiochunk_txn_status_idx', all_plans)
+
+    def test_endpoints_query_budget(self):
+        transcription_id = self.transcription.id
+        budgets = {
+            f'/api/transcription/{transcription_id}/partial/': 3,
+            f'/api/case_briefs/{transcription_id}/': 1,
+            f'/api/case_laws/{transcription_id}/': 1,
+            f'/api/diarization/{transcription_id}/': 1,
+            '/api/transcriptions/': 1,
+            '/api/audio-chunks/': 1,
+            '/api/case_briefs/': 1,
+            '/api/transcriptions/transcription_status_counts/': 1,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(budget):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+                self.assertIndexed(self.plans(lambda: self.client.get(url)))
+
+    def test_status_counts_read_counters(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/transcriptions/transcription_status_counts/')
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('transcription_transcription"', queries[0]['sql'])
+
+
+@override_settings(JOBS_RUN_INLINE=False, PROGRESS_POLL_INTERVAL=0.05)
+class ProgressEventTests(TestCase):
+    """Pipeline steps are recorded as events and reach watchers by long-poll and server-sent events."""
+
+    def setUp(self):
+        self.transcription = Transcription.objects.create(is_chunked=True)
+        self.chunk = AudioChunk.objects.create(transcription=self.transcription, chunk_index=0)
+
+    def kinds(self):
+        return list(TranscriptionEvent.objects.filter(transcription=self.transcription).order_by('id').values_list('kind', flat=True))
+
+    def test_pipeline_steps_are_recorded(self):
+        self.chunk.status = 'completed'
+        self.chunk.save(update_fields=['status'])
+        refresh_transcription_status(self.transcription)
+        refresh_transcription_status(self.transcription)  # no second event for an unchanged status
+        self.chunk.status = 'diarized'
+        self.chunk.diarization_data = "SPEAKER A: text"
+        self.chunk.save(update_fields=['status', 'diarization_data'])
+        join_diarized_chunks(self.transcription)
+        self.assertEqual(self.kinds(), ['status', 'chunk_transcribed', 'status', 'chunk_diarized', 'joined'])
+
+    def test_long_poll_returns_events_after_cursor(self):
+        url = f'/api/transcription/{self.transcription.id}/events/poll/'
+        body = self.client.get(url).json()
+        self.assertEqual([event['data'] for event in body['events']], [{'status': 'pending'}])
+
+        body = self.client.get(url, {'after': body['cursor'], 'timeout': 0}).json()
+        self.assertEqual(body['events'], [])
+        self.assertEqual(self.client.get(url, {'after': 'x'}).status_code, 400)
+
+    async def test_waiting_long_poll_is_woken_by_new_event(self):
+        after = await TranscriptionEvent.objects.filter(transcription=self.transcription).values_list('sequence', flat=True).alast()
+        watcher = asyncio.ensure_future(long_poll(self.transcription.id, after, timeout=10))
+        await asyncio.sleep(0.1)
+        start = time.monotonic()
+        await sync_to_async(TranscriptionEvent.record)(self.transcription.id, 'chunked', chunks=1)
+        events = await watcher
+        self.assertEqual([event['kind'] for event in events], ['chunked'])
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_events_are_numbered_per_transcription(self):
+        other = Transcription.objects.create()
+        TranscriptionEvent.record(self.transcription.id, 'chunked', chunks=1)
+        TranscriptionEvent.record(other.id, 'chunked', chunks=1)
+        TranscriptionEvent.record(self.transcription.id, 'joined', chunks=1)
+        sequences = TranscriptionEvent.objects.filter(transcription=self.transcription).order_by('id').values_list('sequence', flat=True)
+        self.assertEqual(list(sequences), [1, 2, 3])
+
+        body = self.client.get(f'/api/transcription/{self.transcription.id}/events/poll/', {'after': 1}).json()
+        self.assertEqual([event['id'] for event in body['events']], [2, 3])
+        self.assertEqual(body['cursor'], 3)
+
+    async def test_watcher_behind_the_latest_event_is_woken(self):
+        # An event that committed after the watcher's read but before it waited is not missed
+        hub = EventHub(poll_interval=0.01)
+        await sync_to_async(TranscriptionEvent.record)(self.transcription.id, 'chunked', chunks=1)
+        self.assertTrue(await hub.wait(self.transcription.id, 1, timeout=5))
+        self.assertFalse(await hub.wait(self.transcription.id, 2, timeout=0.1))
+
+    async def test_long_poll_reads_again_after_a_timeout(self):
+        async def record_and_time_out(hub, transcription_id, after, timeout):
+            await sync_to_async(TranscriptionEvent.record)(transcription_id, 'chunked', chunks=1)
+            return False
+
+        with mock.patch.object(EventHub, 'wait', record_and_time_out):
+            events = await long_poll(self.transcription.id, 1, timeout=0)
+        self.assertEqual([event['kind'] for event in events], ['chunked'])
+
+    async def test_event_stream_ends_after_join(self):
+        await sync_to_async(TranscriptionEvent.record)(self.transcription.id, 'joined', chunks=1)
+        response = await self.async_client.get(f'/api/transcription/{self.transcription.id}/events/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join([part async for part in response.streaming_content]).decode()
+        messages = [json.loads(line[len('data: '):]) for line in body.splitlines() if line.startswith('data: ')]
+        self.assertEqual([message['kind'] for message in messages], ['status', 'joined'])
+        self.assertIn(f"id: {messages[-1]['id']}", body)
+
+    def test_wsgi_event_stream_refers_to_long_poll(self):
+        # The WSGI handler would run the stream to its end before sending the first byte
+        response = self.client.get(f'/api/transcription/{self.transcription.id}/events/')
+        self.assertEqual(response.status_code, 400)
+        poll_url = response.json()['poll']
+        self.assertEqual(poll_url, f'/api/transcription/{self.transcription.id}/events/poll/')
+        self.assertEqual(self.client.get(poll_url, {'timeout': 0}).status_code, 200)
+
+    async def test_asgi_route_serves_stream_without_django(self):
+        async def django_application(scope, receive, send):
+            raise AssertionError("progress requests must not reach Django")
+
+        client = ASGIClient(with_progress_routes(django_application))
+        await sync_to_async(TranscriptionEvent.record)(self.transcription.id, 'joined', chunks=1)
+        body = bytearray()
+        status = await client.get(f'/api/transcription/{self.transcription.id}/events/', '', body.extend)
+        self.assertEqual(status, 200)
+        self.assertIn(b'event: joined', body)
+        self.assertEqual(await client.get('/api/transcription/0/events/poll/', '', bytearray().extend), 404)
+
+
+@override_settings(LEMUR_TIMEOUT_SECONDS=240)
+class LemurTimeoutTests(SimpleTestCase):
+    """Both LeMUR clients wait LEMUR_TIMEOUT_SECONDS for a generation, not the SDK's HTTP default."""
+
+    def test_sync_client_passes_the_timeout(self):
+        with mock.patch('api.llm.aai.Lemur') as lemur:
+            lemur.return_value.task.return_value.response = "brief"
+            self.assertEqual(LemurClient().complete("prompt", "text"), "brief")
+        self.assertEqual(lemur.return_value.task.call_args.kwargs['timeout'], 240)
+
+    def test_async_client_passes_the_timeout(self):
+        http_client = mock.Mock()
+        http_client.post = mock.AsyncMock(return_value=mock.Mock(status_code=200, json=lambda: {'response': "brief"}))
+        with mock.patch('api.llm.get_http_client', return_value=http_client):
+            self.assertEqual(asyncio.run(AsyncLemurClient().complete("prompt", "text")), "brief")
+        self.assertEqual(http_client.post.call_args.kwargs['timeout'], 240)
+
+
+@override_settings(JOBS_RUN_INLINE=False, LLM_CACHE_ENABLED=False, CASE_BRIEF_EXTRACTION_MODE='single')
+class AsyncViewTests(TestCase):
+    """The async views and clients send the same requests and store the same results as the sync ones."""
+
+    def setUp(self):
+        self.transcription = Transcription.objects.create(transcription_text="Court: The accused Ruth Wanjiku Kamande is charged with murder.")
+
+    def test_async_lemur_client_matches_sdk(self):
+        stub = StubLemur(latency=0)
+        base_url, api_key = aai.settings.base_url, aai.settings.api_key
+        aai.settings.base_url, aai.settings.api_key = stub.start(), 'stub'
+        try:
+            text = self.transcription.transcription_text
+            expected = LemurClient().complete("prompt", text, max_output_size=1000)
+
+            async def complete_concurrently():
+                try:
+                    return await asyncio.gather(*(AsyncLemurClient().complete("prompt", text, max_output_size=1000) for _ in range(5)))
+                finally:
+                    await close_http_client()
+
+            self.assertEqual(asyncio.run(complete_concurrently()), [expected] * 5)
+        finally:
+            aai.settings.base_url, aai.settings.api_key = base_url, api_key
+            stub.stop()
+
+    @override_settings(ASYNC_LLM_CLIENT='api.llm.AsyncSimulatedLLMClient', LLM_CLIENT_OPTIONS={'base_latency': 0})
+    async def test_async_case_brief_view(self):
+        with mock.patch('case_brief.models.asave_as_pdf', new_callable=mock.AsyncMock) as save_pdf:
+            response = await self.async_client.post('/api/case_briefs/async/', {'transcription': self.transcription.id},
+                                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        case_brief = await CaseBrief.objects.aget(transcription_id=self.transcription.id)
+        self.assertEqual(response.json()['id'], case_brief.id)
+        self.assertIn("REPUBLIC V ACCUSED", case_brief.generated_caseBrief.upper())
+        self.assertEqual(save_pdf.await_args.args[0], case_brief.generated_caseBrief)
+
+        response = await self.async_client.post('/api/case_briefs/async/', {'transcription': 999999}, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.post('/api/case_briefs/async/', "[", content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((await self.async_client.get('/api/case_briefs/async/')).status_code, 405)
+
+    @override_settings(CASE_LAW_SCRAPE_FALLBACK=False)
+    async def test_async_case_matching_view(self):
+        response = await self.async_client.post('/api/case_laws/async/', {'transcription': self.transcription.id})
+        self.assertEqual(response.status_code, 201)
+        case_matching = await Case_matching.objects.aget(transcription_id=self.transcription.id)
+        self.assertEqual(case_matching.case['details'], ['Ruth Wanjiku Kamande', 'murder'])
+        self.assertEqual(response.json()['case'], case_matching.case)
+
+    @override_settings(CASE_LAW_SCRAPE_FALLBACK=False)
+    async def test_async_case_matching_extracts_off_the_event_loop(self):
+        loops = []
+
+        def extract(text):
+            try:
+                loops.append(asyncio.get_running_loop())
+            except RuntimeError:
+                loops.append(None)
+            return extract_case_details(text)
+
+        with mock.patch('api.views.extract_case_details', side_effect=extract):
+            response = await self.async_client.post('/api/case_laws/async/', {'transcription': self.transcription.id})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(loops, [None])
+
+
+class S3UploadTests(TestCase):
+    """Artifacts upload over one shared client, in multipart parts and many files at once."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        fake_root = os.path.join(self.directory, 's3')
+        overrides = self.settings(S3_FAKE_ROOT=fake_root, AWS_STORAGE_BUCKET_NAME='artifacts', AWS_S3_REGION_NAME='eu-west-1',
+                                  S3_MULTIPART_THRESHOLD=64 * 1024, S3_MULTIPART_CHUNKSIZE=16 * 1024, MEDIA_ROOT=self.directory)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        reset_s3_client()
+        self.addCleanup(reset_s3_client)
+        self.bucket = os.path.join(fake_root, 'artifacts')
+
+    def test_one_client_shared_by_threads(self):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            clients = set(map(id, executor.map(lambda _: get_s3_client(), range(8))))
+        self.assertEqual(len(clients), 1)
+        self.assertIsInstance(get_s3_client(), FilesystemS3Client)
+
+    def test_upload_file_to_s3_streams_in_parts(self):
+        content = os.urandom(100 * 1024 + 7)
+        path = os.path.join(self.directory, 'large.wav')
+        with open(path, 'wb') as f:
+            f.write(content)
+        with open(path, 'rb') as f, mock.patch.object(FilesystemS3Client, '_send') as send:
+            url = upload_file_to_s3(f, 'uploads/large.wav')
+        self.assertEqual(url, 'https://artifacts.s3.eu-west-1.amazonaws.com/uploads/large.wav')
+        with open(os.path.join(self.bucket, 'uploads', 'large.wav'), 'rb') as f:
+            self.assertEqual(f.read(), content)
+        # Seven 16 KiB parts between the create and complete requests
+        part_sizes = [call.args[0] for call in send.call_args_list]
+        self.assertEqual(part_sizes, [0] + [16 * 1024] * 6 + [len(content) - 6 * 16 * 1024] + [0])
+
+    def test_missing_credentials(self):
+        client = mock.Mock()
+        client.upload_fileobj.side_effect = NoCredentialsError()
+        with mock.patch('api.s3.get_s3_client', return_value=client), self.assertRaises(ValueError):
+            upload_file_to_s3(tempfile.TemporaryFile(), 'uploads/brief.pdf')
+
+    def test_upload_transcription_artifacts(self):
+        with self.settings(JOBS_RUN_INLINE=False):
+            transcription = Transcription.objects.create()
+        for index in range(5):
+            path = os.path.join(self.directory, f"chunk_{index}.wav")
+            with open(path, 'wb') as f:
+                f.write(b'RIFF' * (index + 1))
+            AudioChunk.objects.create(transcription=transcription, chunk_file=path, chunk_index=index)
+        pdf_path = os.path.join(self.directory, 'brief.pdf')
+        with open(pdf_path, 'wb') as f:
+            f.write(b'%PDF-')
+        CaseBrief.objects.create(transcription=transcription, pdf_file_path=pdf_path)
+
+        stats = upload_transcription_artifacts(transcription.id, workers=3)
+        self.assertEqual(stats['files'], 6)
+        self.assertEqual(stats['bytes'], 4 * 15 + 5)
+        self.assertEqual(stats['failed'], {})
+        uploaded = os.path.join(self.bucket, 'transcriptions', str(transcription.id))
+        self.assertEqual(sorted(os.listdir(os.path.join(uploaded, 'chunks'))), [f"chunk_{index}.wav" for index in range(5)])
+        self.assertEqual(get_s3_client().head_object(Bucket='artifacts', Key=f"transcriptions/{transcription.id}/case_brief.pdf"),
+                         {'ContentLength': 5})
+
+    def test_failed_upload_is_reported(self):
+        with S3Uploader() as uploader:
+            uploader.submit(os.path.join(self.directory, 'missing.wav'), 'missing.wav')
+        self.assertEqual(uploader.stats['files'], 0)
+        self.assertEqual(list(uploader.stats['failed']), ['missing.wav'])
@@ -10,6 +10,12 @@ from .views import (
     CaseBriefSegmentListCreateView,
     CaseBriefDetailView,
     download_case_brief_pdf,
+    case_matching_create_async,
+    case_brief_create_async,
+    transcription_events,
+    transcription_events_poll,
+    SearchView,
+    metrics,
 )
 
 urlpatterns = [
@@ -17,6 +23,9 @@ urlpatterns = [
     path('transcriptions/transcription_status_counts/', TranscriptionViewSet.as_view({'get': 'transcription_status_counts'}), name='transcription-status-counts'),
     path('transcriptions/', TranscriptionViewSet.as_view({'get': 'list', 'post': 'create'}), name='transcription-list'),
     path('transcription/<int:pk>/', TranscriptionViewSet.as_view({'get': 'retrieve'}), name='transcription-detail'),
+    path('transcription/<int:pk>/partial/', TranscriptionViewSet.as_view({'get': 'partial_transcription'}), name='transcription-partial'),
+    path('transcription/<int:pk>/events/', transcription_events, name='transcription-events'),
+    path('transcription/<int:pk>/events/poll/', transcription_events_poll, name='transcription-events-poll'),
 
     # Diarization API paths
     path('diarizations/', DiarizedSegmentListCreateView.as_view(), name='diarized-segment-list-create'),
@@ -27,9 +36,15 @@ urlpatterns = [
 
     path('case_laws/', CaseMatchingListView.as_view(), name='case_laws'),
     path('case_laws/<int:id>/', CaseMatchingDetailView.as_view(), name='case_law'),
+    path('case_laws/async/', case_matching_create_async, name='case_laws_async'),
 
     path('download_case_brief/transcription/<int:transcription_id>/', download_case_brief_pdf, name='download_case_brief_pdf'),
     path('case_briefs/',  CaseBriefSegmentListCreateView.as_view(), name='case_brief_list'),
     path('case_briefs/<int:id>/', CaseBriefDetailView.as_view(), name='case_brief_detail'),
+    path('case_briefs/async/', case_brief_create_async, name='case_brief_async'),
+
+    path('search/', SearchView.as_view(), name='search'),
+
+    path('metrics/', metrics, name='metrics'),
 
 ]
@@ -1,20 +1,36 @@
 from rest_framework import generics, viewsets, status, mixins
 from .serializers import TranscriptionSerializer, DiarizedSegmentSerializer, AudioChunkSerializer, CaseMatchingSerializers,CaseBriefSerializer
-from transcription.models import Transcription
+from .serializers import TranscriptionSummarySerializer, AudioChunkSummarySerializer, CaseBriefSummarySerializer
+from api.listing import ProjectedListMixin
+from search.backends import search, search_terms
+from search.models import SearchDocument
+from transcription.models import Transcription, TranscriptionStatusCount
 from diarization.models import DiarizedSegment
 from transcription_chunks.models import AudioChunk
 from case_matching.models import Case_matching
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.exceptions import NotFound
-from case_matching.signals import scrape_case_laws, extract_case_details
-from django.db.models import Count
-from django.http import FileResponse, Http404
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from case_matching.signals import find_case_laws, extract_case_details
+from django.db.models import Count, Q
+from transcription_chunks.signals import build_transcript
+from django.http import Http404, HttpResponse
+from api.metrics import render_prometheus
+from api.downloads import serve_file
+from api.progress import PROGRESS_WATCHERS, event_stream, long_poll, parse_cursor, poll_timeout, transcription_exists
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.core.handlers.asgi import ASGIRequest
 from django.conf import settings
 from case_brief.models import *
 import os
+import hmac
+import json
+from asgiref.sync import sync_to_async
 from django.core.files.storage import default_storage
 import logging
 
@@ -28,27 +44,29 @@ formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 console_handler.setFormatter(formatter)
 logger.addHandler(console_handler)
 
-class TranscriptionViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+class TranscriptionViewSet(ProjectedListMixin, mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
     """
     This viewset provides `list`, `create`, and `retrieve` actions for Transcriptions.
+    Lists are cursor-paginated and take `?fields=` (see api.listing.ProjectedListMixin).
     """
     queryset = Transcription.objects.all()
     serializer_class = TranscriptionSerializer
+    summary_serializer_class = TranscriptionSummarySerializer
     parser_classes = [MultiPartParser, FormParser]
 
     def create(self, request, *args, **kwargs):
         """
-        Handle audio file upload and trigger transcription.
+        Handle audio file upload and queue the transcription pipeline.
         """
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             transcription = serializer.save()
             return Response({
                 'id': transcription.id,
-                'message': 'Transcription processed successfully.',
+                'message': 'Transcription queued for processing.',
                 'status': transcription.status,
                 'transcription_text': transcription.transcription_text,
-            }, status=status.HTTP_201_CREATED)
+            }, status=status.HTTP_202_ACCEPTED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['get'])
@@ -60,7 +78,25 @@ class TranscriptionViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixin
         return Response({
             'id': transcription.id,
             'status': transcription.status,
-            'transcription_text': transcription.transcription_text,
+            'transcription_text': transcription.transcription_text if transcription.status == 'completed' else build_transcript(transcription),
+        })
+
+    @action(detail=True, methods=['get'])
+    def partial_transcription(self, request, pk=None):
+        """
+        Return the transcript so far, assembled on read from the chunks transcribed up to now.
+        """
+        transcription = get_object_or_404(Transcription.objects.only('id', 'status'), pk=pk)
+        chunk_counts = AudioChunk.objects.filter(transcription=transcription).aggregate(
+            total=Count('id'),
+            transcribed=Count('id', filter=Q(transcription_text__isnull=False) & ~Q(transcription_text='')),
+        )
+        return Response({
+            'id': transcription.id,
+            'status': transcription.status,
+            'chunks_total': chunk_counts['total'],
+            'chunks_transcribed': chunk_counts['transcribed'],
+            'transcription_text': build_transcript(transcription),
         })
         
         
@@ -68,16 +104,9 @@ class TranscriptionViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixin
     @action(detail=False, methods=['get'])
     def transcription_status_counts(self, request):
         """
-        Return the count of transcriptions with statuses 'completed' and 'pending'.
+        Return the number of transcriptions in every status, read from the maintained status counters.
         """
-        counts = Transcription.objects.values('status').annotate(total=Count('status'))
-        completed_count = next((item['total'] for item in counts if item['status'] == 'completed'), 0)
-        pending_count = next((item['total'] for item in counts if item['status'] == 'pending'), 0)
-        
-        return Response({
-            'completed': completed_count,
-            'pending': pending_count,
-        }, status=status.HTTP_200_OK)
+        return Response(TranscriptionStatusCount.counts(), status=status.HTTP_200_OK)
         
         
 
@@ -150,7 +179,7 @@ class CaseMatchingListView(generics.ListCreateAPIView):
 
             logger.info(f"search_term {search_term} @@@")
 
-            case_laws = scrape_case_laws(search_term)
+            case_laws = find_case_laws(search_term)
 
             logger.info(f"case laws {case_laws} ***")
 
@@ -186,12 +215,14 @@ class CaseMatchingDetailView(generics.RetrieveAPIView):
             return Response({"error": "Diarization not found for this transcription"}, status=status.HTTP_404_NOT_FOUND)
 
 
-class AudioChunkViewSet(viewsets.ModelViewSet):
+class AudioChunkViewSet(ProjectedListMixin, viewsets.ModelViewSet):
     """
     A viewset to handle creating, retrieving, and listing audio chunks.
+    Lists are cursor-paginated and take `?fields=` (see api.listing.ProjectedListMixin).
     """
     queryset = AudioChunk.objects.all()
     serializer_class = AudioChunkSerializer
+    summary_serializer_class = AudioChunkSummarySerializer
 
     def create(self, request, *args, **kwargs):
         """
@@ -222,62 +253,45 @@ class AudioChunkViewSet(viewsets.ModelViewSet):
             'diarization_data': chunk.diarization_data,
         })
 
-    def list(self, request, *args, **kwargs):
-        """
-        Return a list of audio chunks.
-        """
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
-
 
 
 
+@require_safe
 def download_case_brief_pdf(request, transcription_id):
-    try:
-        # Retrieve the CaseBrief object using transcription_id
-        case_brief = CaseBrief.objects.get(transcription__id=transcription_id)
-        
-        # Ensure there's a path to the saved PDF
-        if case_brief.pdf_file_path and os.path.exists(case_brief.pdf_file_path):
-            # Serve the PDF file for download
-            return FileResponse(
-                open(case_brief.pdf_file_path, 'rb'), 
-                as_attachment=True, 
-                filename=f'case_brief_{transcription_id}.pdf'
-            )
-        else:
-            raise Http404("PDF file not found.")
-    
-    except CaseBrief.DoesNotExist:
+    """Downloads a case brief's PDF; supports conditional GETs and byte ranges (see api.downloads.serve_file)."""
+    paths = list(CaseBrief.objects.filter(transcription__id=transcription_id).values_list('pdf_file_path', flat=True)[:1])
+    if not paths:
         raise Http404("Case brief not found for this transcription.")
+    pdf_file_path = paths[0]
+
+    # One stat both checks the PDF exists and gives the validators, so a 304 never opens the file
+    try:
+        stat = os.stat(pdf_file_path) if pdf_file_path else None
+    except OSError:
+        stat = None
+    if stat is None:
+        raise Http404("PDF file not found.")
+
+    return serve_file(
+        request,
+        pdf_file_path,
+        filename=f'case_brief_{transcription_id}.pdf',
+        content_type='application/pdf',
+        stat=stat,
+    )
 
 
 
-class CaseBriefSegmentListCreateView(generics.CreateAPIView):
+class CaseBriefSegmentListCreateView(ProjectedListMixin, generics.CreateAPIView):
     queryset = CaseBrief.objects.all()
     serializer_class = CaseBriefSerializer
+    summary_serializer_class = CaseBriefSummarySerializer
 
     def get(self, request):
         """
-        Retrieve a list of all CaseBrief objects.
+        Retrieve a page of CaseBrief objects, newest first. Pass `?fields=` to include the brief text.
         """
-        try:
-            # Fetch all CaseBrief objects
-            case_briefs = CaseBrief.objects.all()
-
-            # Serialize the queryset
-            serializer = CaseBriefSerializer(case_briefs, many=True)
-
-            # Return serialized data
-            return Response(serializer.data, status=status.HTTP_200_OK)
-
-        except Exception as e:
-            # Log and handle unexpected errors
-            import traceback
-            print(f"Unexpected error: {e}")
-            print(traceback.format_exc())
-            return Response({"error": "Internal server error occurred."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return self.list(request)
 
   
 
@@ -341,6 +355,44 @@ class CaseBriefSegmentListCreateView(generics.CreateAPIView):
         
 
 
+class SearchView(generics.GenericAPIView):
+    """
+    Full-text search over transcripts, diarized transcripts and case briefs, best matches first.
+    `?q=` words must all appear (stemmed). Narrow with `?source=transcription,diarization,case_brief`
+    and page with `?page=` and `?page_size=`. Each hit has a snippet with the matches in [b][/b].
+    """
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        if not search_terms(query):
+            raise ValidationError({'q': "Give at least one word to search for."})
+
+        sources = [name.strip() for name in request.query_params.get('source', '').split(',') if name.strip()]
+        available = [source for source, _ in SearchDocument.SOURCE_CHOICES]
+        unknown = [name for name in sources if name not in available]
+        if unknown:
+            raise ValidationError({'source': f"Unknown sources: {', '.join(unknown)}. Available: {', '.join(available)}"})
+
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = min(max(int(request.query_params.get('page_size', getattr(settings, 'SEARCH_PAGE_SIZE', 20))), 1),
+                            getattr(settings, 'API_MAX_PAGE_SIZE', 500))
+        except ValueError:
+            raise ValidationError({'page': "page and page_size must be whole numbers."})
+
+        # One extra hit tells whether there is a next page, without counting every match
+        hits = search(query, sources, offset=(page - 1) * page_size, limit=page_size + 1)
+        url = request.build_absolute_uri()
+        previous = None
+        if page > 1:
+            previous = replace_query_param(url, 'page', page - 1) if page > 2 else remove_query_param(url, 'page')
+        return Response({
+            'next': replace_query_param(url, 'page', page + 1) if len(hits) > page_size else None,
+            'previous': previous,
+            'results': hits[:page_size],
+        })
+
+
 class CaseBriefDetailView(generics.ListAPIView):
     queryset = CaseBrief.objects.all()
     serializer_class = CaseBriefSerializer
@@ -353,3 +405,131 @@ class CaseBriefDetailView(generics.ListAPIView):
         except CaseBrief.DoesNotExist:
             return Response({"error": "CaseBrief not found for this transcription"}, status=status.HTTP_404_NOT_FOUND)
 
+
+def _request_data(request):
+    """The JSON or form body of a plain Django view's request, or None if the JSON is malformed."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST
+
+
+async def case_matching_create_async(request):
+    """
+    Async variant of POST case_laws/ for ASGI deployments. Detail extraction (CPU-bound regex scans
+    over the whole transcript) and the case-law search (local index, then the Selenium scraper) run
+    in worker threads while the event loop serves other requests.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    data = _request_data(request)
+    if data is None:
+        return JsonResponse({"error": "The request body is not valid JSON."}, status=status.HTTP_400_BAD_REQUEST)
+
+    transcription_id = data.get("transcription")
+    if not transcription_id:
+        return JsonResponse({"error": "Transcription ID is required"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        transcription = await Transcription.objects.aget(id=transcription_id)
+    except (Transcription.DoesNotExist, ValueError):
+        return JsonResponse({"error": "Transcription not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    # Touches no database connection, so it need not queue behind the thread-sensitive executor
+    extracted_details = await sync_to_async(extract_case_details, thread_sensitive=False)(transcription.transcription_text)
+    case_laws = await sync_to_async(find_case_laws)(' '.join(extracted_details))
+    case_matching = await Case_matching.objects.acreate(
+        transcription=transcription,
+        case={"details": extracted_details, "related_cases": case_laws}
+    )
+    return JsonResponse(CaseMatchingSerializers(case_matching).data, status=status.HTTP_201_CREATED)
+
+
+async def case_brief_create_async(request):
+    """
+    Async variant of POST case_briefs/ for ASGI deployments. Waiting on LeMUR and on the PDF
+    rendering pool holds no thread, so one process can generate many briefs at once.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    data = _request_data(request)
+    if data is None:
+        return JsonResponse({"error": "The request body is not valid JSON."}, status=status.HTTP_400_BAD_REQUEST)
+
+    transcription_id = data.get("transcription")
+    if not transcription_id:
+        return JsonResponse({"error": "Transcription ID is required"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        transcription = await Transcription.objects.aget(id=transcription_id)
+    except (Transcription.DoesNotExist, ValueError):
+        return JsonResponse({"error": "Transcription not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        case_brief = CaseBrief(transcription=transcription)
+        await case_brief.agenerate_case_brief()
+    except Exception:
+        logger.exception(f"Case brief generation failed for transcription {transcription_id}")
+        return JsonResponse({"error": "Internal server error occurred."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return JsonResponse(CaseBriefSerializer(case_brief).data, status=status.HTTP_201_CREATED)
+
+
+# csrf_exempt() wraps views in a sync function before Django 5.0, which would hide that these are
+# coroutines. Like the DRF views they replace, they are exempt from CSRF checks.
+case_matching_create_async.csrf_exempt = True
+case_brief_create_async.csrf_exempt = True
+
+
+async def transcription_events(request, pk):
+    """
+    Stream a transcription's progress events (chunked, chunk transcribed/diarized/failed, joined,
+    status changes) as server-sent events. Resume with `?after=<event id>` or Last-Event-ID.
+    Under ASGI, themis.asgi serves this path without Django (see api.progress.with_progress_routes).
+    Under WSGI the stream would be buffered until it ends, so clients are sent to the long-poll
+    endpoint instead.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({
+            'error': "Server-sent events need the ASGI server. Long-poll the poll URL instead.",
+            'poll': reverse('transcription-events-poll', args=[pk]),
+        }, status=400)
+    after = parse_cursor(request.GET.get('after') or request.headers.get('Last-Event-ID'))
+    if after is None:
+        return JsonResponse({'error': "The event cursor must be an event id."}, status=400)
+    if not await transcription_exists(pk):
+        raise Http404("Transcription not found.")
+    PROGRESS_WATCHERS.inc(transport='sse')
+    response = StreamingHttpResponse(event_stream(pk, after), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # let nginx pass events through as they are written
+    return response
+
+
+async def transcription_events_poll(request, pk):
+    """
+    Long-poll for progress events after `?after=<event id>`, waiting up to `?timeout=` seconds
+    (default 25). Returns the events and the cursor to send next time.
+    """
+    after = parse_cursor(request.GET.get('after') or request.headers.get('Last-Event-ID'))
+    if after is None:
+        return JsonResponse({'error': "The event cursor must be an event id."}, status=400)
+    if not await transcription_exists(pk):
+        raise Http404("Transcription not found.")
+    PROGRESS_WATCHERS.inc(transport='long_poll')
+    events = await long_poll(pk, after, poll_timeout(request.GET.get('timeout')))
+    return JsonResponse({'events': events, 'cursor': events[-1]['id'] if events else after})
+
+
+@require_safe
+def metrics(request):
+    """Expose this process's pipeline metrics in the Prometheus text format.
+
+    Only served when METRICS_TOKEN is set, to scrapers sending it as a bearer token.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token:
+        raise Http404("Metrics are not enabled.")
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4')
@@ -0,0 +1,49 @@
+import time
+from concurrent.futures import as_completed
+from django.core.management.base import BaseCommand
+from api.pdf import DEFAULT_LOGO_PATH, create_pool, submit_pdf
+from case_brief.models import CaseBrief
+
+
+class Command(BaseCommand):
+    help = "Re-renders the PDF of every generated case brief in parallel worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Rendering processes.")
+        parser.add_argument('--ids', type=int, nargs='+', help="Only these case briefs.")
+
+    def handle(self, *args, **options):
+        briefs = CaseBrief.objects.exclude(generated_caseBrief__isnull=True).exclude(generated_caseBrief='')
+        if options['ids']:
+            briefs = briefs.filter(id__in=options['ids'])
+        briefs = list(briefs.only('id', 'transcription_id', 'generated_caseBrief', 'pdf_file_path'))
+
+        pool = create_pool(max(options['workers'], 1))
+        start_time = time.perf_counter()
+        try:
+            futures = {}
+            for brief in briefs:
+                # Every brief gets its own file, including those recorded with a path another brief shares
+                pdf_path = brief.pdf_path()
+                futures[submit_pdf(brief.generated_caseBrief, pdf_path, DEFAULT_LOGO_PATH, pool=pool)] = (brief, pdf_path)
+
+            rendered, failed = 0, 0
+            for future in as_completed(futures):
+                brief, pdf_path = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"Case brief {brief.id} failed: {e}")
+                    continue
+                rendered += 1
+                if brief.pdf_file_path != pdf_path:
+                    CaseBrief.objects.filter(id=brief.id).update(pdf_file_path=pdf_path)
+        finally:
+            pool.shutdown()
+
+        elapsed = time.perf_counter() - start_time
+        self.stdout.write(
+            f"Rendered {rendered} case briefs ({failed} failed) with {options['workers']} workers "
+            f"in {elapsed:.1f}s ({rendered / elapsed if elapsed else 0:.1f} briefs/s)"
+        )
@@ -4,6 +4,8 @@ from django.db import models
 
 from transcription.models import Transcription
 from api.utils import extract_case_info_from_transcription, format_case_brief,save_as_pdf
+from api.utils import aextract_case_info_from_transcription, asave_as_pdf
+from asgiref.sync import sync_to_async
 from django.urls import reverse
 import os
 
@@ -19,6 +21,14 @@ class CaseBrief(models.Model):
     def __str__(self):
         return f"Case Brief for {self.transcription.case_name or 'Unknown Case'}"
 
+    def pdf_path(self):
+        """Where the brief's PDF is rendered.
+
+        Named after the transcription, which has at most one brief, so the path is unique and known
+        before a new brief is saved.
+        """
+        return f'media/casebrief_pdf_files/transcription_{self.transcription_id}.pdf'
+
 
     def generate_case_brief(self):
         # Ensure the transcription is available and has the necessary text
@@ -31,18 +41,36 @@ class CaseBrief(models.Model):
 
             
             # Define the path to save the PDF file
-            pdf_path = f'media/casebrief_pdf_files/case_brief_{self.id}.pdf'
+            pdf_path = self.pdf_path()
             
             # Generate and save the PDF
             save_as_pdf(self.generated_caseBrief, pdf_path, image_path='images/themis_logo.png')
 
+            self._save_generated(pdf_path)
+
+    async def agenerate_case_brief(self):
+        """generate_case_brief for the async views: waits on the LLM and the PDF pool without holding a thread.
+
+        The transcription must already be loaded, e.g. CaseBrief(transcription=transcription).
+        """
+        transcription = self.transcription
+        if transcription and transcription.transcription_text:
+            case_info = await aextract_case_info_from_transcription(transcription.transcription_text)
+            self.generated_caseBrief = format_case_brief(case_info)
+
+            pdf_path = self.pdf_path()
+            await asave_as_pdf(self.generated_caseBrief, pdf_path, image_path='images/themis_logo.png')
+
+            await sync_to_async(self._save_generated)(pdf_path)
 
-            existing_case_brief = CaseBrief.objects.filter(transcription=self.transcription).first()
-            if existing_case_brief:
-                existing_case_brief.pdf_file_path = pdf_path
-                existing_case_brief.generated_caseBrief = self.generated_caseBrief
-                existing_case_brief.save()
-            else:
-                self.save()
+    def _save_generated(self, pdf_path):
+        existing_case_brief = CaseBrief.objects.filter(transcription=self.transcription).first()
+        if existing_case_brief:
+            existing_case_brief.pdf_file_path = pdf_path
+            existing_case_brief.generated_caseBrief = self.generated_caseBrief
+            existing_case_brief.save()
+        else:
+            self.pdf_file_path = pdf_path
+            self.save()
             
           
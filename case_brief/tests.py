@@ -1,3 +1,63 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from io import StringIO
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from case_brief.models import CaseBrief
+from transcription.models import Transcription
 
-# Create your tests here.
+
+@override_settings(PDF_RENDER_WORKERS=0, LLM_CLIENT='api.llm.SimulatedLLMClient', LLM_CLIENT_OPTIONS={'base_latency': 0},
+                   LLM_CACHE_ENABLED=False)
+class CaseBriefPDFPathTests(TestCase):
+    """Every case brief renders to its own PDF, whether or not it has been saved yet."""
+
+    def setUp(self):
+        # PDFs and the logo are addressed relative to the working directory
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        os.symlink(os.path.join(settings.BASE_DIR, 'images'), os.path.join(directory, 'images'))
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(directory)
+
+    def make_transcription(self, text):
+        return Transcription.objects.create(transcription_text=text)
+
+    def test_new_briefs_render_to_separate_files(self):
+        briefs = []
+        for text in ["Court: The accused Ruth Kamande is charged with murder.", "Court: John Kamau is charged with fraud."]:
+            case_brief = CaseBrief(transcription=self.make_transcription(text))
+            case_brief.generate_case_brief()
+            briefs.append(CaseBrief.objects.get(transcription=case_brief.transcription))
+
+        paths = [case_brief.pdf_file_path for case_brief in briefs]
+        self.assertEqual(paths, [case_brief.pdf_path() for case_brief in briefs])
+        self.assertEqual(len(set(paths)), 2)
+        for path in paths:
+            with open(path, 'rb') as f:
+                self.assertTrue(f.read().startswith(b'%PDF-'))
+        self.assertEqual([name for name in os.listdir('media/casebrief_pdf_files') if name.endswith('.tmp')], [])
+
+    def test_regenerating_a_brief_reuses_its_file(self):
+        transcription = self.make_transcription("Court: The accused Ruth Kamande is charged with murder.")
+        CaseBrief(transcription=transcription).generate_case_brief()
+        CaseBrief(transcription=transcription).generate_case_brief()
+        self.assertEqual(CaseBrief.objects.filter(transcription=transcription).count(), 1)
+        self.assertEqual(os.listdir('media/casebrief_pdf_files'), [f"transcription_{transcription.id}.pdf"])
+
+    def test_rerender_gives_briefs_sharing_a_path_their_own_file(self):
+        shared_path = 'media/casebrief_pdf_files/case_brief_None.pdf'
+        briefs = [
+            CaseBrief.objects.create(transcription=self.make_transcription(""), generated_caseBrief=f"Brief {number}",
+                                     pdf_file_path=shared_path)
+            for number in range(2)
+        ]
+        call_command('rerender_case_briefs', workers=1, stdout=StringIO(), stderr=StringIO())
+
+        for case_brief in briefs:
+            case_brief.refresh_from_db()
+            self.assertEqual(case_brief.pdf_file_path, case_brief.pdf_path())
+            self.assertTrue(os.path.exists(case_brief.pdf_file_path))
+        self.assertNotEqual(briefs[0].pdf_file_path, briefs[1].pdf_file_path)
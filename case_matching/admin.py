@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import Case_matching
+from .models import Case_matching, CaseLawDocument
 
 
 @admin.register(Case_matching)
@@ -9,3 +9,10 @@ class Case_matchingAdmin(admin.ModelAdmin):
     list_display = ['transcription', 'date_created']
     readonly_fields = ['case']
 
+
+
+@admin.register(CaseLawDocument)
+class CaseLawDocumentAdmin(admin.ModelAdmin):
+    list_display = ['title', 'court', 'source', 'date_added']
+    list_filter = ['source', 'court']
+    search_fields = ['title', 'link']
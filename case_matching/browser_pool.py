@@ -0,0 +1,150 @@
+import time
+import queue
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def chromedriver_path():
+    """Resolves the ChromeDriver binary once per process instead of on every scrape."""
+    return getattr(settings, 'CHROMEDRIVER_PATH', None) or ChromeDriverManager().install()
+
+
+def chrome_options():
+    options = Options()
+    options.add_argument("--headless")  # Run Chrome in headless mode
+    options.add_argument("--no-sandbox")  # Disable sandboxing for non-root users
+    options.add_argument("--disable-dev-shm-usage")  # Overcome limited resource problems
+    options.add_argument("--disable-gpu")  # Disable GPU hardware acceleration
+    options.add_argument("--window-size=1920,1080")  # Set window size
+    options.add_argument("--disable-blink-features=AutomationControlled")  # Disable automation-controlled flag
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+    return options
+
+
+def create_chrome_driver():
+    driver = webdriver.Chrome(service=Service(chromedriver_path()), options=chrome_options())
+    logger.info("Chrome WebDriver started successfully.")
+    return driver
+
+
+class PooledBrowser:
+    def __init__(self, driver):
+        self.driver = driver
+        self.created_at = time.monotonic()
+        self.uses = 0
+
+
+class BrowserPool:
+    """A size-bounded pool of long-lived WebDriver sessions.
+
+    Browsers are health-checked when borrowed and recycled after `max_uses` page loads,
+    after `max_age` seconds, or as soon as a caller reports them broken.
+    """
+
+    def __init__(self, size=2, max_uses=50, max_age=30 * 60, acquire_timeout=60, driver_factory=create_chrome_driver):
+        self.size = size
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.acquire_timeout = acquire_timeout
+        self.driver_factory = driver_factory
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        self.browsers = set()
+        self.closed = False
+
+    def _is_healthy(self, browser):
+        if self.max_age and time.monotonic() - browser.created_at > self.max_age:
+            return False
+        try:
+            # Cheap round-trip to the browser; raises if the session or process has died
+            browser.driver.execute_script("return 1")
+            return True
+        except Exception as e:
+            logger.warning(f"Discarding unhealthy browser: {e}")
+            return False
+
+    def _discard(self, browser):
+        with self.lock:
+            self.browsers.discard(browser)
+        try:
+            browser.driver.quit()
+        except Exception as e:
+            logger.debug(f"Error quitting browser: {e}")
+
+    def _checkout(self):
+        while True:
+            try:
+                browser = self.idle.get_nowait()
+            except queue.Empty:
+                browser = PooledBrowser(self.driver_factory())
+                with self.lock:
+                    self.browsers.add(browser)
+                return browser
+
+            if self._is_healthy(browser):
+                return browser
+            self._discard(browser)
+
+    @contextmanager
+    def browser(self):
+        """Borrows a driver for the duration of the block. Raise inside the block to have it recycled."""
+        if self.closed:
+            raise RuntimeError("Browser pool is closed")
+        if not self.slots.acquire(timeout=self.acquire_timeout):
+            raise TimeoutError(f"No browser became available within {self.acquire_timeout} seconds")
+
+        browser = None
+        try:
+            browser = self._checkout()
+            browser.uses += 1
+            yield browser.driver
+        except Exception:
+            if browser is not None:
+                self._discard(browser)
+                browser = None
+            raise
+        finally:
+            if browser is not None:
+                if self.closed or (self.max_uses and browser.uses >= self.max_uses):
+                    self._discard(browser)
+                else:
+                    self.idle.put(browser)
+            self.slots.release()
+
+    def close(self):
+        self.closed = True
+        with self.lock:
+            browsers = list(self.browsers)
+        for browser in browsers:
+            self._discard(browser)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool():
+    """Returns this process's shared browser pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(
+                size=getattr(settings, 'BROWSER_POOL_SIZE', 2),
+                max_uses=getattr(settings, 'BROWSER_POOL_MAX_USES', 50),
+                max_age=getattr(settings, 'BROWSER_POOL_MAX_AGE', 30 * 60),
+            )
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from api.metrics import counter
+
+CACHE_REQUESTS = counter('themis_case_law_cache_requests_total', "Case-law search cache lookups, by backend and result.")
+
+MISSING = object()
+
+
+def normalize_search_term(search_term):
+    """Lowercased, deduplicated and sorted words, so equivalent searches share one cache entry."""
+    return " ".join(sorted(set(search_term.lower().split())))
+
+
+class LocalBackend:
+    """In-process LRU cache with per-entry expiry. Entries are not shared between processes."""
+
+    name = 'local'
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return MISSING
+            expires, value = entry
+            if expires < time.time():
+                del self.entries[key]
+                return MISSING
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.time() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class FileBackend:
+    """One JSON file per entry, shared by every process on the host.
+
+    A file's mtime records its last use; the least recently used files are removed once there are
+    more than `max_entries`.
+    """
+
+    name = 'file'
+
+    def __init__(self, ttl, max_entries, directory):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return MISSING
+
+        if entry['expires'] < time.time():
+            self._remove(path)
+            return MISSING
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return entry['value']
+
+    def set(self, key, value):
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'key': key, 'expires': time.time() + self.ttl, 'value': value}, f)
+        os.replace(temp_path, path)
+        self._evict()
+
+    def _entries(self):
+        return [entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')]
+
+    def _evict(self):
+        entries = self._entries()
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_entries]:
+            self._remove(entry.path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+class DjangoCacheBackend:
+    """Stores entries in one of the CACHES aliases; eviction follows that cache's own policy."""
+
+    name = 'django'
+
+    def __init__(self, ttl, alias='default'):
+        self.ttl = ttl
+        self.cache = caches[alias]
+
+    def _key(self, key):
+        return 'case_laws:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        return self.cache.get(self._key(key), MISSING)
+
+    def set(self, key, value):
+        self.cache.set(self._key(key), value, timeout=self.ttl)
+
+
+class SearchResultCache:
+    """Caches case-law search results keyed on the normalized search term and result limit."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def _key(self, search_term, limit):
+        return f"{limit}:{normalize_search_term(search_term)}"
+
+    def get(self, search_term, limit):
+        value = self.backend.get(self._key(search_term, limit))
+        CACHE_REQUESTS.inc(backend=self.backend.name, result='miss' if value is MISSING else 'hit')
+        return value
+
+    def set(self, search_term, limit, value):
+        self.backend.set(self._key(search_term, limit), value)
+
+
+def create_backend(name):
+    ttl = getattr(settings, 'CASE_LAW_CACHE_TTL', 24 * 60 * 60)
+    max_entries = getattr(settings, 'CASE_LAW_CACHE_MAX_ENTRIES', 1024)
+    if name == 'local':
+        return LocalBackend(ttl, max_entries)
+    if name == 'file':
+        directory = getattr(settings, 'CASE_LAW_CACHE_DIR', os.path.join(settings.BASE_DIR, 'case_law_cache'))
+        return FileBackend(ttl, max_entries, str(directory))
+    if name == 'django':
+        return DjangoCacheBackend(ttl, getattr(settings, 'CASE_LAW_CACHE_ALIAS', 'default'))
+    raise ValueError(f"Unknown case-law cache backend '{name}'")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache():
+    """Returns this process's search result cache, using the CASE_LAW_CACHE_BACKEND backend."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SearchResultCache(create_backend(getattr(settings, 'CASE_LAW_CACHE_BACKEND', 'local')))
+        return _cache
@@ -0,0 +1,45 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'kenyalaw_search.html')
+
+
+class SearchFixtureServer:
+    """Serves the Kenya Law search-results fixture on localhost, standing in for the live site.
+
+    Every path returns the same page; `results` and `render_delay_ms` set how many hits the page
+    renders and how long its script waits before rendering them.
+    """
+
+    def __init__(self, results=10, render_delay_ms=300, host='127.0.0.1', port=0):
+        with open(FIXTURE_PATH, encoding='utf-8') as f:
+            page = f.read().replace('{{RESULTS}}', str(results)).replace('{{DELAY_MS}}', str(render_delay_ms))
+        body = page.encode('utf-8')
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def search_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/search/"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
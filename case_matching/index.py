@@ -0,0 +1,166 @@
+import os
+import re
+import logging
+import threading
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class CaseLawIndex:
+    """An inverted index over case-law documents, ranked with Okapi BM25.
+
+    Postings are stored term-major in flat NumPy arrays (CSR layout): the postings of term t are
+    doc_index[indptr[t]:indptr[t + 1]] with matching term_freq entries. `keys` maps positions in
+    the index back to CaseLawDocument primary keys.
+    """
+
+    def __init__(self, vocabulary, indptr, doc_index, term_freq, doc_lengths, keys, k1=1.2, b=0.75):
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.doc_index = doc_index
+        self.term_freq = term_freq
+        self.doc_lengths = doc_lengths
+        self.keys = keys
+        self.k1 = k1
+        self.b = b
+
+        document_count = len(keys)
+        average_length = doc_lengths.mean() if document_count else 0.0
+        document_freq = np.diff(indptr)
+        self.idf = np.log1p((document_count - document_freq + 0.5) / (document_freq + 0.5))
+        # Per-document part of the BM25 denominator, computed once instead of per query
+        if average_length:
+            self.length_norm = k1 * (1 - b + b * doc_lengths / average_length)
+        else:
+            self.length_norm = np.full(document_count, k1, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def build(cls, documents, **params):
+        """Builds an index from (key, text) pairs."""
+        vocabulary = {}
+        token_ids, doc_positions, keys, lengths = [], [], [], []
+        for position, (key, text) in enumerate(documents):
+            ids = [vocabulary.setdefault(token, len(vocabulary)) for token in tokenize(text)]
+            token_ids.append(np.asarray(ids, dtype=np.int64))
+            doc_positions.append(np.full(len(ids), position, dtype=np.int64))
+            keys.append(key)
+            lengths.append(len(ids))
+
+        document_count = len(keys)
+        token_ids = np.concatenate(token_ids) if token_ids else np.empty(0, dtype=np.int64)
+        doc_positions = np.concatenate(doc_positions) if doc_positions else np.empty(0, dtype=np.int64)
+
+        # One sort groups every (term, document) occurrence; the run lengths are the term frequencies
+        pairs, term_freq = np.unique(token_ids * max(document_count, 1) + doc_positions, return_counts=True)
+        terms = pairs // max(document_count, 1)
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(vocabulary)), out=indptr[1:])
+
+        return cls(
+            vocabulary,
+            indptr,
+            (pairs % max(document_count, 1)).astype(np.int32),
+            term_freq.astype(np.float32),
+            np.asarray(lengths, dtype=np.float32),
+            np.asarray(keys, dtype=np.int64),
+            **params,
+        )
+
+    def search(self, query, limit=10):
+        """Returns [(key, score)] for the best `limit` documents matching any query term."""
+        term_ids = sorted({self.vocabulary[token] for token in tokenize(query) if token in self.vocabulary})
+        if not term_ids or not len(self):
+            return []
+
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term_id in term_ids:
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            docs = self.doc_index[start:end]
+            freq = self.term_freq[start:end]
+            # Each document appears at most once per term, so plain fancy-index addition is safe
+            scores[docs] += self.idf[term_id] * freq * (self.k1 + 1) / (freq + self.length_norm[docs])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > limit:
+            matched = matched[np.argpartition(-scores[matched], limit - 1)[:limit]]
+        ranked = matched[np.argsort(-scores[matched], kind='stable')]
+        return [(int(self.keys[i]), float(scores[i])) for i in ranked]
+
+    def save(self, path):
+        """Writes the index to `path` atomically, so readers never see a partial file."""
+        terms = np.empty(len(self.vocabulary), dtype=object)
+        for term, term_id in self.vocabulary.items():
+            terms[term_id] = term
+        # Each writer gets its own temporary name, so concurrent rebuilds never interleave in one file
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    terms=terms.astype(str) if len(terms) else np.empty(0, dtype=str),
+                    indptr=self.indptr,
+                    doc_index=self.doc_index,
+                    term_freq=self.term_freq,
+                    doc_lengths=self.doc_lengths,
+                    keys=self.keys,
+                    params=np.array([self.k1, self.b]),
+                )
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            vocabulary = {term: term_id for term_id, term in enumerate(data['terms'].tolist())}
+            k1, b = data['params'].tolist()
+            return cls(
+                vocabulary, data['indptr'], data['doc_index'], data['term_freq'],
+                data['doc_lengths'], data['keys'], k1=k1, b=b,
+            )
+
+
+def index_path():
+    return str(getattr(settings, 'CASE_LAW_INDEX_PATH', os.path.join(settings.BASE_DIR, 'case_law_index.npz')))
+
+
+def rebuild_case_law_index():
+    """Rebuilds the on-disk index from every CaseLawDocument."""
+    from case_matching.models import CaseLawDocument
+
+    documents = CaseLawDocument.objects.values_list('id', 'title', 'text').order_by('id').iterator(chunk_size=2000)
+    index = CaseLawIndex.build((pk, f"{title} {text}") for pk, title, text in documents)
+    index.save(index_path())
+    logger.info(f"Case-law index rebuilt with {len(index)} documents")
+    return index
+
+
+_loaded = {'index': None, 'mtime': None}
+_load_lock = threading.Lock()
+
+
+def get_case_law_index():
+    """Returns this process's copy of the on-disk index, reloading it whenever the file changes."""
+    path = index_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    with _load_lock:
+        if _loaded['mtime'] != mtime:
+            _loaded['index'] = CaseLawIndex.load(path)
+            _loaded['mtime'] = mtime
+        return _loaded['index']
@@ -0,0 +1,66 @@
+import os
+import time
+import tempfile
+import numpy as np
+from django.core.management.base import BaseCommand
+from case_matching.index import CaseLawIndex
+
+CASE_TERMS = ["murder", "assault", "theft", "robbery", "fraud", "forgery", "custody", "divorce", "narcotics", "traffic"]
+
+
+def synthetic_corpus(documents, words_per_document=150, vocabulary_size=50000, seed=0):
+    """Yields (key, text) pairs with Zipf-distributed words, a few case types and judge names."""
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"term{i}" for i in range(vocabulary_size)])
+    for key in range(documents):
+        lengths = rng.integers(words_per_document // 2, words_per_document * 2)
+        words = vocabulary[np.minimum(rng.zipf(1.3, lengths), vocabulary_size) - 1].tolist()
+        words += rng.choice(CASE_TERMS, 2).tolist() + [f"judge{rng.integers(200)}", f"accused{rng.integers(20000)}"]
+        yield key, " ".join(words)
+
+
+class Command(BaseCommand):
+    help = "Measures build time, file size and BM25 query latency of the case-law index on a synthetic corpus."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=10)
+
+    def handle(self, *args, **options):
+        start_time = time.perf_counter()
+        index = CaseLawIndex.build(synthetic_corpus(options['documents']))
+        build_time = time.perf_counter() - start_time
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index.npz')
+            start_time = time.perf_counter()
+            index.save(path)
+            save_time = time.perf_counter() - start_time
+            start_time = time.perf_counter()
+            index = CaseLawIndex.load(path)
+            load_time = time.perf_counter() - start_time
+            size_mb = os.path.getsize(path) / 1e6
+
+        self.stdout.write(
+            f"{len(index)} documents, {len(index.vocabulary)} terms, {len(index.doc_index)} postings, {size_mb:.1f} MB on disk"
+        )
+        self.stdout.write(f"build {build_time:.2f}s, save {save_time:.2f}s, load {load_time:.2f}s")
+
+        # Queries shaped like extract_case_details output: a name, a judge and one or two case types
+        rng = np.random.default_rng(1)
+        queries = [
+            f"accused{rng.integers(20000)} judge{rng.integers(200)} " + " ".join(rng.choice(CASE_TERMS, rng.integers(1, 3)))
+            for _ in range(options['queries'])
+        ]
+        latencies = []
+        for query in queries:
+            start_time = time.perf_counter()
+            index.search(query, limit=options['limit'])
+            latencies.append(time.perf_counter() - start_time)
+
+        latencies = np.array(latencies) * 1000
+        self.stdout.write(
+            f"query latency over {len(queries)} queries: p50 {np.percentile(latencies, 50):.2f} ms, "
+            f"p95 {np.percentile(latencies, 95):.2f} ms, max {latencies.max():.2f} ms"
+        )
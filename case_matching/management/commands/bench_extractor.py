@@ -0,0 +1,100 @@
+import re
+import time
+import random
+from django.core.management.base import BaseCommand
+from case_matching.signals import extract_case_details
+
+FILLER = (
+    "the witness told the court that she was at home in Nairobi when the incident happened and that "
+    "Counsel for the State asked her about the events of that evening in Kenya"
+).split()
+DETAIL_SENTENCES = [
+    "The accused, Ruth Wanjiku Kamande was charged with murder.",
+    "Honorable Judge Jessie Lessit presided.",
+    "Hon. Mary Kasango adjourned the matter.",
+    "Presiding judge Luka Kimaru ruled on the possession charge.",
+    "Peter Otieno Ouma is charged with robbery with violence.",
+    "The defendant, John Kamau pleaded guilty to fraud.",
+]
+
+
+def synthetic_transcript(size, density, seed=0):
+    """Court-style filler text of about `size` characters; `density` of its sentences carry details."""
+    rng = random.Random(seed)
+    sentences, length = [], 0
+    while length < size:
+        if rng.random() < density:
+            sentence = rng.choice(DETAIL_SENTENCES)
+        else:
+            sentence = " ".join(rng.sample(FILLER, 15)).capitalize() + "."
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(sentences)
+
+
+def legacy_extract_case_details(text):
+    """The previous extractor: one scan per pattern and list-based dedup, kept for comparison."""
+    extracted_details = []
+    name_patterns = [
+        r'defendant[,\s]+([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)+)',
+        r'accused[,\s]+([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)+)',
+        r'([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)+)\s+is\s+charged',
+        r'([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)+)\s+was\s+charged',
+        r'[Jj]udge\s+([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)*)',
+        r'[Hh]onorable\s+([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)*)',
+        r'[Hh]on\.\s+([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)*)',
+        r'[Pp]residing\s+[Jj]udge\s+([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)*)',
+    ]
+    for pattern in name_patterns:
+        for match in re.finditer(pattern, text):
+            if match.group(1) not in extracted_details:
+                extracted_details.append(match.group(1))
+
+    case_types = {
+        'murder': r'\b(?:first|second|third|-)?(?:degree\s+)?(?:murder|homicide|killing)\b',
+        'assault': r'\b(?:aggravated\s+)?(?:assault|battery)\b',
+        'theft': r'\b(?:grand\s+)?(?:theft|robbery|burglary)\b',
+        'family': r'\b(?:divorce|custody|child\s+support|domestic\s+violence)\b',
+        'drug': r'\b(?:drug|narcotics|controlled\s+substance|possession)\b',
+        'fraud': r'\b(?:wire\s+)?(?:fraud|deception|forgery)\b',
+        'sexual': r'\b(?:sexual\s+assault|rape|molestation)\b',
+        'traffic': r'\b(?:dui|dwi|driving|traffic)\b',
+    }
+    text_lower = text.lower()
+    for case_type, pattern in case_types.items():
+        if re.search(pattern, text_lower) and case_type not in extracted_details:
+            extracted_details.append(case_type)
+    return extracted_details
+
+
+class Command(BaseCommand):
+    help = "Times extract_case_details against the previous per-pattern extractor on synthetic transcripts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=1_000_000, help="Transcript size in characters.")
+        parser.add_argument('--density', type=float, nargs='+', default=[0.0, 0.02, 0.2],
+                            help="Share of sentences that mention a name or case type.")
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'density':>8}{'details':>9}{'previous ms':>13}{'current ms':>12}{'speedup':>9}")
+        for density in options['density']:
+            text = synthetic_transcript(options['size'], density)
+            current = extract_case_details(text)
+            if current != legacy_extract_case_details(text):
+                self.stderr.write(f"Extractors disagree at density {density}")
+
+            previous_time = self._best_of(options['repeat'], lambda: legacy_extract_case_details(text))
+            current_time = self._best_of(options['repeat'], lambda: extract_case_details(text))
+            self.stdout.write(
+                f"{density:>8g}{len(current):>9}{previous_time * 1000:>13.1f}{current_time * 1000:>12.1f}"
+                f"{previous_time / current_time:>8.1f}x"
+            )
+
+    def _best_of(self, repeat, func):
+        timings = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start_time)
+        return min(timings)
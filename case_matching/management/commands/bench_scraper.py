@@ -0,0 +1,49 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from django.core.management.base import BaseCommand
+from case_matching.browser_pool import BrowserPool
+from case_matching.fixture_server import SearchFixtureServer
+from case_matching.signals import scrape_case_laws
+
+
+class Command(BaseCommand):
+    help = "Measures case-law scraping latency and throughput against a local search-results fixture."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--searches', type=int, default=20)
+        parser.add_argument('--concurrency', type=int, default=2, help="Concurrent searches, and browser pool size.")
+        parser.add_argument('--results', type=int, default=10, help="Hits rendered by the fixture page.")
+        parser.add_argument('--render-delay-ms', type=int, default=300, help="Delay before the fixture renders its hits.")
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        with SearchFixtureServer(options['results'], options['render_delay_ms']) as server:
+            self.stdout.write(f"Fixture at {server.search_url}, {options['searches']} searches, concurrency {concurrency}")
+            self.stdout.write(f"{'mode':>8}{'searches/s':>12}{'p50 s':>9}{'p95 s':>9}{'max s':>9}")
+
+            # 'cold' launches a browser per search, as scraping did before the pool existed
+            for mode, max_uses in (('cold', 1), ('pooled', 0)):
+                pool = BrowserPool(size=concurrency, max_uses=max_uses)
+                try:
+                    self._run(mode, pool, server.search_url, options)
+                finally:
+                    pool.close()
+
+    def _run(self, mode, pool, search_url, options):
+        def search(index):
+            start_time = time.perf_counter()
+            results = scrape_case_laws(f"murder {index}", limit=options['results'], search_url=search_url, pool=pool)
+            if len(results) != options['results']:
+                self.stderr.write(f"Search {index} returned {len(results)} results")
+            return time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            latencies = np.array(list(executor.map(search, range(options['searches']))))
+        elapsed = time.perf_counter() - start_time
+
+        self.stdout.write(
+            f"{mode:>8}{options['searches'] / elapsed:>12.2f}{np.percentile(latencies, 50):>9.3f}"
+            f"{np.percentile(latencies, 95):>9.3f}{latencies.max():>9.3f}"
+        )
@@ -0,0 +1,59 @@
+import csv
+import json
+import time
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from case_matching.index import rebuild_case_law_index
+from case_matching.models import CaseLawDocument
+
+
+def read_records(path):
+    """Yields dicts with title, link and optionally court and text from a .jsonl or .csv file."""
+    with open(path, encoding='utf-8', newline='') as f:
+        if path.endswith('.csv'):
+            yield from csv.DictReader(f)
+        elif path.endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise CommandError(f"Unsupported file type: {path} (expected .jsonl or .csv)")
+
+
+class Command(BaseCommand):
+    help = "Loads judgments into the local case-law corpus and rebuilds its search index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help=".jsonl or .csv files with title, link, court and text fields.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--no-rebuild', action='store_true', help="Only load documents; skip the index rebuild.")
+
+    def handle(self, *args, **options):
+        total = 0
+        for path in options['paths']:
+            records = read_records(path)
+            while True:
+                batch = [
+                    CaseLawDocument(
+                        title=record['title'][:500],
+                        link=record['link'],
+                        court=record.get('court') or '',
+                        text=record.get('text') or '',
+                        source='ingested',
+                    )
+                    for record in islice(records, options['batch_size'])
+                ]
+                if not batch:
+                    break
+                # Re-ingesting a judgment refreshes it instead of failing on the unique link
+                CaseLawDocument.objects.bulk_create(
+                    batch, update_conflicts=True, unique_fields=['link'], update_fields=['title', 'court', 'text', 'source'],
+                )
+                total += len(batch)
+            self.stdout.write(f"Loaded {path}")
+
+        self.stdout.write(f"Ingested {total} documents")
+        if not options['no_rebuild']:
+            start_time = time.perf_counter()
+            index = rebuild_case_law_index()
+            self.stdout.write(f"Indexed {len(index)} documents in {time.perf_counter() - start_time:.1f}s")
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("case_matching", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CaseLawDocument",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("title", models.CharField(max_length=500)),
+                ("link", models.URLField(max_length=500, unique=True)),
+                ("court", models.CharField(blank=True, max_length=255)),
+                ("text", models.TextField(blank=True)),
+                (
+                    "source",
+                    models.CharField(
+                        choices=[("ingested", "Ingested"), ("scraped", "Scraped")],
+                        default="ingested",
+                        max_length=20,
+                    ),
+                ),
+                ("date_added", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
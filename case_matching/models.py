@@ -10,3 +10,22 @@ class Case_matching(models.Model):
 
     def __str__(self):
         return str(f"Case Brief_{self.id}")
+
+
+class CaseLawDocument(models.Model):
+    """A judgment in the local case-law corpus, searched through case_matching.index."""
+
+    SOURCE_CHOICES = [
+        ('ingested', 'Ingested'),
+        ('scraped', 'Scraped'),
+    ]
+
+    title = models.CharField(max_length=500)
+    link = models.URLField(max_length=500, unique=True)
+    court = models.CharField(max_length=255, blank=True)
+    text = models.TextField(blank=True)
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, default='ingested')
+    date_added = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.title
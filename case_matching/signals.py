@@ -2,13 +2,16 @@ import re
 import urllib.parse
 import logging
 from typing import List
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from django.conf import settings
+from case_matching.browser_pool import get_browser_pool
+from case_matching.cache import MISSING, get_search_cache
+from case_matching.index import get_case_law_index
+from case_matching.models import CaseLawDocument
+from jobs.queue import enqueue
 import os
-import time
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -23,139 +26,195 @@ logger.addHandler(console_handler)
 # Set Chrome binary path (already installed in your environment)
 os.environ['CHROME_BIN'] = '/usr/bin/google-chrome-stable'
 
+# One capitalised word of a name, e.g. "Kamande"
+NAME_WORD = r"[A-Z][a-zA-Z\-]+"
+
+# Case types and the keywords that identify them. Qualifiers such as "first degree" or "grand" in
+# front of a keyword don't change the case type, so only the keywords themselves are matched.
+CASE_TYPE_KEYWORDS = {
+    'murder': ['murder', 'homicide', 'killing'],
+    'assault': ['assault', 'battery'],
+    'theft': ['theft', 'robbery', 'burglary'],
+    'family': ['divorce', 'custody', 'child support', 'domestic violence'],
+    'drug': ['drug', 'narcotics', 'controlled substance', 'possession'],
+    'fraud': ['fraud', 'deception', 'forgery'],
+    'sexual': ['sexual assault', 'rape', 'molestation'],
+    'traffic': ['dui', 'dwi', 'driving', 'traffic'],
+}
+KEYWORD_CASE_TYPES = {}
+for case_type, keywords in CASE_TYPE_KEYWORDS.items():
+    for keyword in keywords:
+        KEYWORD_CASE_TYPES.setdefault(keyword, []).append(case_type)
+# "sexual assault" is an assault as well
+KEYWORD_CASE_TYPES['sexual assault'].append('assault')
+
+
+# Name patterns in the order their matches are reported, each with a literal that every match
+# contains. A pattern whose literal is absent from the transcript cannot match and is not run.
+# The patterns are scanned one by one rather than as one alternation: their matches overlap (a
+# judge inside "Honorable Judge ..."), which a single scan only finds by trying every pattern at
+# every position, and that measured 3-10x slower than these separate literal-anchored scans.
+NAME_PATTERNS = [
+    ('defendant', re.compile(rf"defendant[,\s]+({NAME_WORD}(?:\s+{NAME_WORD})+)")),
+    ('accused', re.compile(rf"accused[,\s]+({NAME_WORD}(?:\s+{NAME_WORD})+)")),
+    ('charged', re.compile(rf"({NAME_WORD}(?:\s+{NAME_WORD})+)\s+is\s+charged")),
+    ('charged', re.compile(rf"({NAME_WORD}(?:\s+{NAME_WORD})+)\s+was\s+charged")),
+    ('udge', re.compile(rf"[Jj]udge\s+({NAME_WORD}(?:\s+{NAME_WORD})*)")),
+    ('onorable', re.compile(rf"[Hh]onorable\s+({NAME_WORD}(?:\s+{NAME_WORD})*)")),
+    ('on.', re.compile(rf"[Hh]on\.\s+({NAME_WORD}(?:\s+{NAME_WORD})*)")),
+    ('residing', re.compile(rf"[Pp]residing\s+[Jj]udge\s+({NAME_WORD}(?:\s+{NAME_WORD})*)")),
+]
+
+# Every case-type keyword as one alternation, matched against the lowercased transcript in one scan
+CASE_TYPES_RE = re.compile(r"\b(?:{})\b".format(
+    "|".join(r"\s+".join(map(re.escape, keyword.split())) for keyword in KEYWORD_CASE_TYPES)
+))
+
+
 # Function to extract case details
 def extract_case_details(text: str) -> List[str]:
+    """Returns defendants, then judges, then case types found in the text, each listed once.
+
+    Names are listed pattern by pattern in NAME_PATTERNS order, and in order of appearance within a
+    pattern; case types follow the order of CASE_TYPE_KEYWORDS.
+    """
     if not text:
         logger.warning("No text provided for case extraction.")
         return []
 
-    extracted_details = []
+    extracted_details = {}
+    for literal, pattern in NAME_PATTERNS:
+        if literal in text:
+            # Names already listed keep their earlier position
+            extracted_details.update(dict.fromkeys(pattern.findall(text)))
 
-    # Defendant patterns
-    defendant_patterns = [
-        r'defendant[,\s]+([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)+)',
-        r'accused[,\s]+([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)+)',
-        r'([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)+)\s+is\s+charged',
-        r'([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)+)\s+was\s+charged'
-    ]
+    case_types = set()
+    for keyword in set(CASE_TYPES_RE.findall(text.lower())):
+        case_types.update(KEYWORD_CASE_TYPES[" ".join(keyword.split())])
 
-    logger.info("Extracting defendants...")
-    for pattern in defendant_patterns:
-        matches = re.finditer(pattern, text)
-        for match in matches:
-            name = match.group(1)
-            if name not in extracted_details:
-                extracted_details.append(name)
-                logger.debug(f"Found defendant: {name}")
-
-    # Judge patterns
-    judge_patterns = [
-        r'[Jj]udge\s+([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)*)',
-        r'[Hh]onorable\s+([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)*)',
-        r'[Hh]on\.\s+([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)*)',
-        r'[Pp]residing\s+[Jj]udge\s+([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)*)'
-    ]
+    extracted_details.update((case_type, None) for case_type in CASE_TYPE_KEYWORDS if case_type in case_types)
+
+    logger.debug(f"Extracted case details: {list(extracted_details)}")
+    return list(extracted_details)
 
-    logger.info("Extracting judges...")
-    for pattern in judge_patterns:
-        matches = re.finditer(pattern, text)
-        for match in matches:
-            name = match.group(1)
-            if name not in extracted_details:
-                extracted_details.append(name)
-                logger.debug(f"Found judge: {name}")
-
-    # Case types
-    case_types = {
-        'murder': r'\b(?:first|second|third|-)?(?:degree\s+)?(?:murder|homicide|killing)\b',
-        'assault': r'\b(?:aggravated\s+)?(?:assault|battery)\b',
-        'theft': r'\b(?:grand\s+)?(?:theft|robbery|burglary)\b',
-        'family': r'\b(?:divorce|custody|child\s+support|domestic\s+violence)\b',
-        'drug': r'\b(?:drug|narcotics|controlled\s+substance|possession)\b',
-        'fraud': r'\b(?:wire\s+)?(?:fraud|deception|forgery)\b',
-        'sexual': r'\b(?:sexual\s+assault|rape|molestation)\b',
-        'traffic': r'\b(?:dui|dwi|driving|traffic)\b'
-    }
 
-    logger.info("Extracting case types...")
-    text_lower = text.lower()
-    for case_type, pattern in case_types.items():
-        if re.search(pattern, text_lower):
-            if case_type not in extracted_details:
-                extracted_details.append(case_type)
-                logger.debug(f"Found case type: {case_type}")
+# Selectors tried in order; the first one yielding results wins
+SELECTORS_TO_TRY = [
+    (By.CSS_SELECTOR, "li.mb-4.hit", "Result items"),
+    (By.CSS_SELECTOR, "a.h5.text-primary", "Primary links"),
+    (By.CSS_SELECTOR, ".card-title a", "Card title links"),
+    (By.XPATH, "//li[contains(@class, 'mb-4 hit')]//a[contains(@class, 'h5 text-primary')]", "Complex path")
+]
+
+
+def results_rendered(driver):
+    """Wait condition: true once any of the result selectors matches an element on the page."""
+    return any(driver.find_elements(by, selector) for by, selector, _ in SELECTORS_TO_TRY)
 
-    return extracted_details
 
 # Function to scrape case laws
-def scrape_case_laws(search_term, limit=10):
+def scrape_case_laws(search_term, limit=10, search_url=None, pool=None):
     encoded_search_term = urllib.parse.quote(search_term)
-    url = f"https://new.kenyalaw.org/search/?q={encoded_search_term}&court=High+Court&doc_type=Judgment"
+    search_url = search_url or getattr(settings, 'KENYALAW_SEARCH_URL', "https://new.kenyalaw.org/search/")
+    url = f"{search_url}?q={encoded_search_term}&court=High+Court&doc_type=Judgment"
     logger.info(f"Opening URL: {url}")
 
-    chrome_options = Options()
-    chrome_options.add_argument("--headless")  # Run Chrome in headless mode
-    chrome_options.add_argument("--no-sandbox")  # Disable sandboxing for non-root users
-    chrome_options.add_argument("--disable-dev-shm-usage")  # Overcome limited resource problems
-    chrome_options.add_argument("--disable-gpu")  # Disable GPU hardware acceleration
-    chrome_options.add_argument("--window-size=1920,1080")  # Set window size
-    chrome_options.add_argument("--disable-blink-features=AutomationControlled")  # Disable automation-controlled flag
-    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    chrome_options.add_experimental_option('useAutomationExtension', False)
-
-    # Use a specific ChromeDriver path
-    driver_path = ChromeDriverManager().install()
-    service = Service(driver_path)
+    pool = pool or get_browser_pool()
+    page_timeout = getattr(settings, 'SCRAPER_PAGE_TIMEOUT', 10)
 
     try:
-        # Initialize WebDriver
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-        logger.info("Chrome WebDriver started successfully.")
-
-        # Navigate to the URL
-        driver.get(url)
-        time.sleep(5)  # Allow some time for the page to load
-
-        # Extract case details (adjust according to the website's structure)
-        case_laws = []
-        selectors_to_try = [
-            ("CSS", "li.mb-4.hit", "Result items"),
-            ("CSS", "a.h5.text-primary", "Primary links"),
-            ("CSS", ".card-title a", "Card title links"),
-            ("XPATH", "//li[contains(@class, 'mb-4 hit')]//a[contains(@class, 'h5 text-primary')]", "Complex path")
-        ]
-
-        for selector_type, selector, desc in selectors_to_try:
-            logger.info(f"Trying to find elements with {desc} ({selector})")
+        with pool.browser() as driver:
             try:
-                if selector_type == "CSS":
-                    elements = driver.find_elements(By.CSS_SELECTOR, selector)
-                else:
-                    elements = driver.find_elements(By.XPATH, selector)
-
-                for element in elements[:limit]:
-                    title = element.text.strip()
-                    link = element.get_attribute('href')
-                    if title and link:
-                        case_laws.append({"title": title, "link": link})
-                        logger.info(f"Case Found: {title[:50]} - {link}")
-
-                if case_laws:
-                    break
-            except Exception as e:
-                logger.error(f"Error with selector {desc}: {str(e)}")
-
-        if not case_laws:
-            logger.warning("No results found. Saving page source...")
-            with open("page_source.html", "w", encoding="utf-8") as f:
-                f.write(driver.page_source)
-
-        return case_laws
+                # Navigate to the URL and wait for the results list instead of sleeping a fixed time
+                driver.get(url)
+                try:
+                    WebDriverWait(driver, page_timeout, poll_frequency=0.1).until(results_rendered)
+                except TimeoutException:
+                    logger.info(f"No results rendered within {page_timeout}s")
+
+                # Extract case details (adjust according to the website's structure)
+                case_laws = []
+                for by, selector, desc in SELECTORS_TO_TRY:
+                    logger.info(f"Trying to find elements with {desc} ({selector})")
+                    try:
+                        elements = driver.find_elements(by, selector)
+
+                        for element in elements[:limit]:
+                            title = element.text.strip()
+                            link = element.get_attribute('href')
+                            if title and link:
+                                case_laws.append({"title": title, "link": link})
+                                logger.info(f"Case Found: {title[:50]} - {link}")
+
+                        if case_laws:
+                            break
+                    except WebDriverException as e:
+                        logger.error(f"Error with selector {desc}: {str(e)}")
+
+                if not case_laws:
+                    logger.warning("No results found. Saving page source...")
+                    with open("page_source.html", "w", encoding="utf-8") as f:
+                        f.write(driver.page_source)
+
+                return case_laws
+            except Exception:
+                driver.save_screenshot("error_screenshot.png")
+                raise
 
     except Exception as e:
+        # The pool discards the browser that raised, so the next search gets a fresh one
         logger.error(f"Failed to scrape case laws: {str(e)}")
-        driver.save_screenshot("error_screenshot.png")
         return []
 
-    finally:
-        driver.quit()
+
+def search_local_case_laws(search_term, limit=10):
+    """Answers a search from the local case-law index; returns [] if there is no index yet."""
+    index = get_case_law_index()
+    if index is None:
+        return []
+
+    ranked = index.search(search_term, limit=limit)
+    documents = CaseLawDocument.objects.in_bulk([key for key, _ in ranked])
+    # Documents deleted since the last rebuild are skipped
+    return [
+        {"title": documents[key].title, "link": documents[key].link}
+        for key, _ in ranked if key in documents
+    ]
+
+
+def backfill_case_laws(case_laws):
+    """Stores scraped results in the corpus and queues an index rebuild if any were new."""
+    if not case_laws:
+        return
+
+    existing = set(CaseLawDocument.objects.filter(link__in=[case["link"] for case in case_laws]).values_list('link', flat=True))
+    new_documents = {
+        case["link"]: CaseLawDocument(title=case["title"][:500], link=case["link"], source='scraped')
+        for case in case_laws if case["link"] not in existing
+    }
+    if new_documents:
+        CaseLawDocument.objects.bulk_create(new_documents.values(), ignore_conflicts=True)
+        enqueue('case_matching.rebuild_case_law_index', dedupe_key='rebuild_case_law_index')
+
+
+def find_case_laws(search_term, limit=10):
+    """Searches the local index first and only scrapes kenyalaw.org when it has no matches.
+
+    Scraped results are cached by normalized search term, so repeating a search doesn't relaunch a browser.
+    """
+    case_laws = search_local_case_laws(search_term, limit=limit)
+    if case_laws or not getattr(settings, 'CASE_LAW_SCRAPE_FALLBACK', True):
+        return case_laws
+
+    cache = get_search_cache()
+    case_laws = cache.get(search_term, limit)
+    if case_laws is not MISSING:
+        return case_laws
+
+    logger.info(f"No local case laws for '{search_term}', scraping")
+    case_laws = scrape_case_laws(search_term, limit=limit)
+    # Empty results aren't cached: scrape_case_laws also returns [] when the scrape itself failed
+    if case_laws:
+        cache.set(search_term, limit, case_laws)
+    backfill_case_laws(case_laws)
+    return case_laws
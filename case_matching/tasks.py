@@ -0,0 +1,8 @@
+from jobs.queue import task
+from case_matching.index import rebuild_case_law_index
+
+
+@task('case_matching.rebuild_case_law_index', visibility_timeout=3600)
+def rebuild_case_law_index_task():
+    """Rebuilds the on-disk case-law index after documents were added."""
+    rebuild_case_law_index()
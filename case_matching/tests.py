@@ -1,3 +1,408 @@
-from django.test import TestCase
+import math
+import os
+import re
+import shutil
+import tempfile
+import threading
+from unittest import mock
+from django.test import SimpleTestCase, TestCase, override_settings
+from case_matching.browser_pool import BrowserPool
+from case_matching.cache import MISSING, FileBackend, LocalBackend, SearchResultCache, create_backend
+from case_matching.index import CaseLawIndex, get_case_law_index, rebuild_case_law_index, tokenize
+from case_matching.management.commands.bench_extractor import DETAIL_SENTENCES, synthetic_transcript
+from case_matching.models import CaseLawDocument
+from case_matching.signals import extract_case_details, find_case_laws
 
-# Create your tests here.
+
+class FakeDriver:
+    def __init__(self, name):
+        self.name = name
+        self.healthy = True
+        self.quit_calls = 0
+
+    def execute_script(self, script):
+        if not self.healthy:
+            raise RuntimeError("invalid session id")
+        return 1
+
+    def quit(self):
+        self.quit_calls += 1
+
+
+class BrowserPoolTests(SimpleTestCase):
+    """Borrowing, health checks and recycling of pooled WebDriver sessions."""
+
+    def setUp(self):
+        self.drivers = []
+
+    def make_driver(self):
+        driver = FakeDriver(f"driver-{len(self.drivers)}")
+        self.drivers.append(driver)
+        return driver
+
+    def make_pool(self, **kwargs):
+        pool = BrowserPool(driver_factory=self.make_driver, **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_idle_browser_is_reused(self):
+        pool = self.make_pool(size=1)
+        with pool.browser() as first:
+            pass
+        with pool.browser() as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(len(self.drivers), 1)
+        self.assertEqual(first.quit_calls, 0)
+
+    def test_browser_is_discarded_when_the_block_raises(self):
+        pool = self.make_pool(size=1)
+        with self.assertRaises(ValueError):
+            with pool.browser() as driver:
+                raise ValueError("page did not load")
+        self.assertEqual(driver.quit_calls, 1)
+
+        with pool.browser() as replacement:
+            self.assertIsNot(replacement, driver)
+
+    def test_browser_is_recycled_after_max_uses(self):
+        pool = self.make_pool(size=1, max_uses=2)
+        for _ in range(2):
+            with pool.browser() as driver:
+                pass
+        self.assertEqual(driver.quit_calls, 1)
+
+        with pool.browser() as replacement:
+            self.assertIsNot(replacement, driver)
+        self.assertEqual(len(self.drivers), 2)
+
+    def test_unhealthy_idle_browser_is_replaced(self):
+        pool = self.make_pool(size=1)
+        with pool.browser() as driver:
+            pass
+        driver.healthy = False
+
+        with pool.browser() as replacement:
+            self.assertIsNot(replacement, driver)
+        self.assertEqual(driver.quit_calls, 1)
+
+    def test_browser_older_than_max_age_is_replaced(self):
+        pool = self.make_pool(size=1, max_age=60)
+        with pool.browser() as driver:
+            pass
+        pool.idle.queue[0].created_at -= 61
+
+        with pool.browser() as replacement:
+            self.assertIsNot(replacement, driver)
+        self.assertEqual(driver.quit_calls, 1)
+
+    def test_exhausted_pool_times_out(self):
+        pool = self.make_pool(size=1, acquire_timeout=0.05)
+        with pool.browser():
+            with self.assertRaises(TimeoutError):
+                with pool.browser():
+                    pass
+
+        # The slot is free again once the first caller is done
+        with pool.browser():
+            pass
+
+    def test_close_quits_every_browser(self):
+        pool = self.make_pool(size=2)
+        with pool.browser(), pool.browser():
+            pass
+        pool.close()
+        self.assertEqual([driver.quit_calls for driver in self.drivers], [1, 1])
+
+        with self.assertRaises(RuntimeError):
+            with pool.browser():
+                pass
+
+
+DOCUMENTS = [
+    (11, "Republic v Kasango: land dispute over a title deed in Machakos"),
+    (12, "Kasango v Mwangi: breach of contract, contract terms and damages"),
+    (13, "Mwangi v Otieno: a land dispute, a land title and a boundary dispute"),
+    (14, "In re the estate of Otieno: succession and probate"),
+]
+
+
+def reference_bm25(documents, query, k1=1.2, b=0.75):
+    """BM25 scores computed directly from the token lists, for checking the vectorised index."""
+    tokens = {key: tokenize(text) for key, text in documents}
+    average_length = sum(len(words) for words in tokens.values()) / len(tokens)
+    scores = {}
+    for term in set(tokenize(query)):
+        document_freq = sum(1 for words in tokens.values() if term in words)
+        idf = math.log(1 + (len(tokens) - document_freq + 0.5) / (document_freq + 0.5))
+        for key, words in tokens.items():
+            freq = words.count(term)
+            if freq:
+                norm = k1 * (1 - b + b * len(words) / average_length)
+                scores[key] = scores.get(key, 0.0) + idf * freq * (k1 + 1) / (freq + norm)
+    return scores
+
+
+class CaseLawIndexTests(SimpleTestCase):
+    """BM25 ranking of the case-law index and its on-disk round trip."""
+
+    def setUp(self):
+        self.index = CaseLawIndex.build(DOCUMENTS)
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+
+    def test_scores_match_bm25(self):
+        for query in ["land dispute", "contract", "Otieno succession", "kasango title"]:
+            expected = reference_bm25(DOCUMENTS, query)
+            results = dict(self.index.search(query))
+            self.assertEqual(results.keys(), expected.keys(), query)
+            for key, score in expected.items():
+                self.assertAlmostEqual(results[key], score, places=4)
+
+    def test_results_are_ranked_by_score(self):
+        results = self.index.search("land dispute")
+        self.assertEqual([key for key, _ in results], [13, 11])
+        self.assertGreater(results[0][1], results[1][1])
+
+        # The repeated term outweighs a single mention in a similar-length document
+        self.assertEqual(self.index.search("contract")[0][0], 12)
+
+    def test_limit_keeps_the_best_documents(self):
+        full = self.index.search("land dispute kasango otieno mwangi")
+        self.assertEqual(len(full), 4)
+        self.assertEqual(self.index.search("land dispute kasango otieno mwangi", limit=2), full[:2])
+
+    def test_unknown_terms_and_empty_index(self):
+        self.assertEqual(self.index.search("extradition"), [])
+        self.assertEqual(self.index.search(""), [])
+        empty = CaseLawIndex.build([])
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(empty.search("land"), [])
+
+    def test_save_and_load_round_trip(self):
+        path = os.path.join(self.tmpdir, "index.npz")
+        index = CaseLawIndex.build(DOCUMENTS, k1=1.5, b=0.5)
+        index.save(path)
+        self.assertEqual(os.listdir(self.tmpdir), ["index.npz"])
+
+        loaded = CaseLawIndex.load(path)
+        self.assertEqual(loaded.vocabulary, index.vocabulary)
+        self.assertEqual((loaded.k1, loaded.b), (1.5, 0.5))
+        for name in ['indptr', 'doc_index', 'term_freq', 'doc_lengths', 'keys']:
+            self.assertEqual(getattr(loaded, name).tolist(), getattr(index, name).tolist(), name)
+        for query in ["land dispute", "contract damages", "probate"]:
+            self.assertEqual(loaded.search(query), index.search(query))
+
+    def test_concurrent_saves_leave_a_complete_index(self):
+        path = os.path.join(self.tmpdir, "index.npz")
+        indexes = [CaseLawIndex.build(DOCUMENTS[:i + 1]) for i in range(len(DOCUMENTS))] * 4
+        barrier = threading.Barrier(len(indexes))
+        errors = []
+
+        def save(index):
+            try:
+                barrier.wait()
+                index.save(path)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=save, args=(index,)) for index in indexes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(os.listdir(self.tmpdir), ["index.npz"])
+        # Whichever writer finished last, the installed file is one whole index
+        loaded = CaseLawIndex.load(path)
+        self.assertIn(loaded.keys.tolist(), [index.keys.tolist() for index in indexes])
+
+    def test_empty_index_round_trip(self):
+        path = os.path.join(self.tmpdir, "empty.npz")
+        CaseLawIndex.build([]).save(path)
+        self.assertEqual(len(CaseLawIndex.load(path)), 0)
+
+
+class CaseLawIndexRebuildTests(TestCase):
+    """Rebuilding the index from CaseLawDocument rows and reloading it in running processes."""
+
+    def setUp(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir, ignore_errors=True)
+        self.path = os.path.join(tmpdir, "case_law_index.npz")
+        settings_override = override_settings(CASE_LAW_INDEX_PATH=self.path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_rebuild_is_picked_up_by_get_case_law_index(self):
+        self.assertIsNone(get_case_law_index())
+
+        first = CaseLawDocument.objects.create(title="Republic v Kasango", link="https://example.com/1", text="land dispute")
+        rebuild_case_law_index()
+        self.assertEqual([key for key, _ in get_case_law_index().search("land")], [first.id])
+
+        second = CaseLawDocument.objects.create(title="Mwangi v Otieno", link="https://example.com/2", text="land land title")
+        rebuild_case_law_index()
+        # Force a distinct mtime in case both writes land within the filesystem's timestamp resolution
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        self.assertEqual([key for key, _ in get_case_law_index().search("land")], [second.id, first.id])
+
+
+def reference_extract_case_details(text):
+    """The original extractor: one scan per pattern and list-based dedup."""
+    extracted_details = []
+    name_patterns = [
+        r'defendant[,\s]+([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)+)',
+        r'accused[,\s]+([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)+)',
+        r'([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)+)\s+is\s+charged',
+        r'([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)+)\s+was\s+charged',
+        r'[Jj]udge\s+([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)*)',
+        r'[Hh]onorable\s+([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)*)',
+        r'[Hh]on\.\s+([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)*)',
+        r'[Pp]residing\s+[Jj]udge\s+([A-Z][a-zA-Z\-]+(?:\s+[A-Z][a-zA-Z\-]+)*)',
+    ]
+    for pattern in name_patterns:
+        for match in re.finditer(pattern, text):
+            if match.group(1) not in extracted_details:
+                extracted_details.append(match.group(1))
+
+    case_types = {
+        'murder': r'\b(?:first|second|third|-)?(?:degree\s+)?(?:murder|homicide|killing)\b',
+        'assault': r'\b(?:aggravated\s+)?(?:assault|battery)\b',
+        'theft': r'\b(?:grand\s+)?(?:theft|robbery|burglary)\b',
+        'family': r'\b(?:divorce|custody|child\s+support|domestic\s+violence)\b',
+        'drug': r'\b(?:drug|narcotics|controlled\s+substance|possession)\b',
+        'fraud': r'\b(?:wire\s+)?(?:fraud|deception|forgery)\b',
+        'sexual': r'\b(?:sexual\s+assault|rape|molestation)\b',
+        'traffic': r'\b(?:dui|dwi|driving|traffic)\b',
+    }
+    text_lower = text.lower()
+    for case_type, pattern in case_types.items():
+        if re.search(pattern, text_lower) and case_type not in extracted_details:
+            extracted_details.append(case_type)
+    return extracted_details
+
+
+class ExtractCaseDetailsTests(SimpleTestCase):
+    """extract_case_details returns what the original per-pattern extractor did, in the same order."""
+
+    def test_nested_judge_titles_keep_pattern_order(self):
+        self.assertEqual(
+            extract_case_details("Honorable Judge Mary Kasango presided over the murder trial."),
+            ["Mary Kasango", "Judge Mary Kasango", "murder"],
+        )
+
+    def test_names_are_grouped_by_pattern(self):
+        text = ("Judge Luka Kimaru heard the case. Peter Otieno was charged with theft. "
+                "The defendant, John Kamau Mwangi was charged with fraud and forgery.")
+        self.assertEqual(
+            extract_case_details(text),
+            ["John Kamau Mwangi", "Peter Otieno", "Luka Kimaru", "theft", "fraud"],
+        )
+
+    def test_matches_the_original_extractor(self):
+        texts = DETAIL_SENTENCES + [
+            " ".join(DETAIL_SENTENCES),
+            " ".join(reversed(DETAIL_SENTENCES)),
+            "The accused Ruth Wanjiku was charged with first degree murder and sexual assault. "
+            "Hon. Jessie Lessit, Presiding Judge Jessie Lessit and judge Mary Kasango sat. Child support, DUI.",
+            "no names, only a grand theft and drug possession",
+            synthetic_transcript(20_000, 0.2, seed=3),
+        ]
+        for text in texts:
+            self.assertEqual(extract_case_details(text), reference_extract_case_details(text), text[:80])
+
+    def test_empty_text(self):
+        self.assertEqual(extract_case_details(""), [])
+
+
+class SearchCacheTests(SimpleTestCase):
+    """Expiry and least-recently-used eviction of the case-law search result cache backends."""
+
+    def setUp(self):
+        self.now = 1_000_000.0
+        clock = mock.patch('case_matching.cache.time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+
+    def test_local_entries_expire(self):
+        backend = LocalBackend(ttl=60, max_entries=10)
+        backend.set('murder', [1])
+        self.now += 59
+        self.assertEqual(backend.get('murder'), [1])
+        self.now += 2
+        self.assertIs(backend.get('murder'), MISSING)
+        self.assertNotIn('murder', backend.entries)
+
+    def test_local_evicts_least_recently_used(self):
+        backend = LocalBackend(ttl=60, max_entries=2)
+        backend.set('murder', [1])
+        backend.set('theft', [2])
+        backend.get('murder')
+        backend.set('fraud', [3])
+        self.assertIs(backend.get('theft'), MISSING)
+        self.assertEqual((backend.get('murder'), backend.get('fraud')), ([1], [3]))
+
+    def test_file_entries_expire(self):
+        backend = FileBackend(ttl=60, max_entries=10, directory=self.tmpdir)
+        backend.set('murder', [{'title': 'R v Kasango'}])
+        self.assertEqual(FileBackend(60, 10, self.tmpdir).get('murder'), [{'title': 'R v Kasango'}])
+
+        self.now += 61
+        self.assertIs(backend.get('murder'), MISSING)
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+    def test_file_evicts_least_recently_used(self):
+        backend = FileBackend(ttl=60, max_entries=2, directory=self.tmpdir)
+        for age, key in [(30, 'murder'), (20, 'theft')]:
+            backend.set(key, [key])
+            os.utime(backend._path(key), (self.now - age, self.now - age))
+        # Reading an entry marks it recently used
+        backend.get('murder')
+
+        backend.set('fraud', ['fraud'])
+        self.assertEqual(len(os.listdir(self.tmpdir)), 2)
+        self.assertIs(backend.get('theft'), MISSING)
+        self.assertEqual((backend.get('murder'), backend.get('fraud')), (['murder'], ['fraud']))
+
+    def test_keys_are_normalized_search_terms_per_limit(self):
+        cache = SearchResultCache(LocalBackend(ttl=60, max_entries=10))
+        cache.set("Murder  robbery", 10, [1])
+        self.assertEqual(cache.get("robbery murder MURDER", 10), [1])
+        self.assertIs(cache.get("murder robbery", 5), MISSING)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            create_backend('redis')
+
+
+@override_settings(CASE_LAW_SCRAPE_FALLBACK=True)
+class FindCaseLawsCacheTests(SimpleTestCase):
+    """Scrape results are reused for equivalent searches; failed or empty scrapes are not cached."""
+
+    def setUp(self):
+        patches = [
+            mock.patch('case_matching.signals.get_search_cache', return_value=SearchResultCache(LocalBackend(60, 10))),
+            mock.patch('case_matching.signals.search_local_case_laws', return_value=[]),
+            mock.patch('case_matching.signals.backfill_case_laws'),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_repeated_search_is_not_scraped_again(self):
+        case_laws = [{'title': 'R v Kasango', 'link': 'https://kenyalaw.org/caselaw/1'}]
+        with mock.patch('case_matching.signals.scrape_case_laws', return_value=case_laws) as scrape:
+            self.assertEqual(find_case_laws("murder Kasango"), case_laws)
+            self.assertEqual(find_case_laws("kasango MURDER"), case_laws)
+        scrape.assert_called_once()
+
+    def test_empty_scrape_is_not_cached(self):
+        with mock.patch('case_matching.signals.scrape_case_laws', return_value=[]) as scrape:
+            find_case_laws("murder")
+            find_case_laws("murder")
+        self.assertEqual(scrape.call_count, 2)
@@ -1,15 +1,36 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from transcription.models import Transcription
+from transcription.models import Transcription, TranscriptionEvent
 from diarization.models import DiarizedSegment
 from transcription_chunks.models import AudioChunk
 from django.db import transaction
+from jobs.queue import enqueue
 
 @receiver(post_save, sender=Transcription)
-@receiver(post_save, sender=Transcription)
-def join_diarized_chunks(sender, instance, **kwargs):
-    """Signal to join diarized chunks into one segment after all chunks are diarized."""
+def auto_join_diarized_chunks(sender, instance, **kwargs):
+    """Signal to queue joining of diarized chunks once the transcription is completed."""
     if instance.status == 'completed':
+        enqueue('diarization.join_diarized_chunks', dedupe_key=f"join_diarized_chunks:{instance.id}", transcription_id=instance.id)
+
+
+@receiver(post_save, sender=AudioChunk)
+def auto_join_after_last_chunk(sender, instance, created, **kwargs):
+    """Signal to queue joining when a chunk of an already completed transcription finishes diarization."""
+    if created or instance.status not in ('diarized', 'failed'):
+        return
+    # Re-read the parent status: the cached instance.transcription may predate its completion
+    if Transcription.objects.filter(id=instance.transcription_id, status='completed').exists():
+        enqueue('diarization.join_diarized_chunks', dedupe_key=f"join_diarized_chunks:{instance.transcription_id}", transcription_id=instance.transcription_id)
+
+
+def join_diarized_chunks(instance):
+    """Joins diarized chunks into one segment after all chunks are diarized."""
+    if instance.status == 'completed':
+        # Chunks still waiting for diarization will queue another join when they finish
+        if AudioChunk.objects.filter(transcription=instance, status__in=['pending', 'processing', 'completed']).exists():
+            print(f"Transcription {instance.id} still has chunks awaiting diarization")
+            return
+
         try:
             with transaction.atomic():
                 # Fetch all completed and diarized chunks
@@ -30,9 +51,10 @@ def join_diarized_chunks(sender, instance, **kwargs):
                         diarized_segment.diarization_data = diarized_text
                         diarized_segment.save(update_fields=['diarization_data'])
 
+                    TranscriptionEvent.record(instance.id, 'joined', chunks=len(chunks))
                     print(f"Joined diarization completed for transcription {instance.id}")
                 else:
                     print(f"No diarized chunks found for transcription {instance.id}")
 
         except Exception as e:
-            print(f"Error during joining diarized chunks for transcription {instance.id}: {e}")
\ No newline at end of file
+            print(f"Error during joining diarized chunks for transcription {instance.id}: {e}")
@@ -0,0 +1,9 @@
+from jobs.queue import task
+from transcription.models import Transcription
+from diarization.signals import join_diarized_chunks
+
+
+@task('diarization.join_diarized_chunks')
+def join_diarized_chunks_task(transcription_id):
+    """Joins the diarized chunks of a transcription into one DiarizedSegment."""
+    join_diarized_chunks(Transcription.objects.get(id=transcription_id))
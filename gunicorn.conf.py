@@ -0,0 +1,27 @@
+"""
+Gunicorn settings for themis, picked up automatically from the project root.
+
+Set DIARIZATION_PRELOAD=true to load the pyannote pipeline once in the master
+process before workers are forked, so every worker shares the model's memory
+copy-on-write instead of loading its own copy on first diarization.
+"""
+
+import os
+
+preload_app = os.getenv("GUNICORN_PRELOAD_APP", "false").lower() == "true"
+
+
+def when_ready(server):
+    """Runs in the master after it starts listening and before any worker is forked."""
+    if os.getenv("DIARIZATION_PRELOAD", "false").lower() != "true":
+        return
+
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "themis.settings")
+    django.setup()
+
+    from api.model_registry import preload
+
+    server.log.info("Preloading diarization pipeline in the gunicorn master")
+    preload('diarization')
@@ -0,0 +1,11 @@
+from django.contrib import admin
+from jobs.models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'max_attempts', 'run_after', 'locked_by', 'locked_until', 'created_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'dedupe_key')
+    ordering = ('-created_at',)
+    readonly_fields = ('created_at', 'updated_at', 'last_error')
@@ -0,0 +1,52 @@
+import time
+import signal
+import logging
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from jobs.queue import TASKS, default_worker_id, run_next
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Processes background jobs from the database queue. Run one per worker process."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--worker-id', default=None, help="Name recorded on leased jobs (defaults to host:pid).")
+        parser.add_argument('--poll-interval', type=float, default=None, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--burst', action='store_true', help="Exit once the queue is empty instead of polling.")
+        parser.add_argument('--max-jobs', type=int, default=None, help="Exit after processing this many jobs.")
+
+    def handle(self, *args, **options):
+        worker_id = options['worker_id'] or default_worker_id()
+        poll_interval = options['poll_interval']
+        if poll_interval is None:
+            poll_interval = getattr(settings, 'JOBS_POLL_INTERVAL', 2)
+        self.stopping = False
+
+        # Finish the current job before exiting on SIGTERM/SIGINT (e.g. a dyno restart)
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+
+        self.stdout.write(f"Worker {worker_id} started with tasks: {', '.join(sorted(TASKS))}")
+        processed = 0
+        while not self.stopping:
+            close_old_connections()
+            job = run_next(worker_id)
+            if job is None:
+                if options['burst']:
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            processed += 1
+            if options['max_jobs'] and processed >= options['max_jobs']:
+                break
+
+        close_old_connections()
+        self.stdout.write(f"Worker {worker_id} stopped after {processed} jobs")
+
+    def _request_stop(self, signum, frame):
+        logger.info(f"Received signal {signum}, stopping after the current job")
+        self.stopping = True
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:43
+
+from django.db import migrations, models
+
+
+def drop_duplicate_queued_jobs(apps, schema_editor):
+    """Keeps the oldest queued job of each dedupe key; the others would only have repeated its work."""
+    Job = apps.get_model("jobs", "Job")
+    db_alias = schema_editor.connection.alias
+    queued = Job.objects.using(db_alias).filter(status="queued", dedupe_key__isnull=False)
+    seen, duplicates = set(), []
+    for job_id, dedupe_key in queued.order_by("id").values_list("id", "dedupe_key"):
+        if dedupe_key in seen:
+            duplicates.append(job_id)
+        seen.add(dedupe_key)
+    Job.objects.using(db_alias).filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("jobs", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_queued_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="job",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "queued")),
+                fields=("dedupe_key",),
+                name="jobs_job_queued_dedupe_uniq",
+            ),
+        ),
+    ]
@@ -0,0 +1,190 @@
+import os
+import socket
+import logging
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+# Handlers registered with @task, keyed by job name
+TASKS = {}
+
+
+class Retry(Exception):
+    """Raised by a task to be re-queued after `countdown` seconds without counting as an error."""
+
+    def __init__(self, message="", countdown=None):
+        super().__init__(message)
+        self.countdown = countdown
+
+
+class Task:
+    def __init__(self, name, func, max_attempts=None, visibility_timeout=None):
+        self.name = name
+        self.func = func
+        self.max_attempts = max_attempts or getattr(settings, 'JOBS_MAX_ATTEMPTS', 5)
+        self.visibility_timeout = visibility_timeout or getattr(settings, 'JOBS_VISIBILITY_TIMEOUT', 900)
+
+    def __call__(self, **payload):
+        return self.func(**payload)
+
+
+def task(name, max_attempts=None, visibility_timeout=None):
+    """Registers a function as a job handler under `name`."""
+    def decorator(func):
+        TASKS[name] = Task(name, func, max_attempts, visibility_timeout)
+        return func
+    return decorator
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue(name, dedupe_key=None, delay=0, **payload):
+    """Adds a job to the queue and returns it.
+
+    If a job with the same dedupe_key is still queued, that job is returned instead of a new one.
+    With JOBS_RUN_INLINE the handler runs immediately in the calling process.
+    """
+    if name not in TASKS:
+        raise ValueError(f"No task registered under '{name}'")
+
+    if getattr(settings, 'JOBS_RUN_INLINE', False):
+        logger.debug(f"Running job {name} inline with {payload}")
+        TASKS[name](**payload)
+        return None
+
+    if dedupe_key:
+        existing = Job.objects.filter(dedupe_key=dedupe_key, status='queued').first()
+        if existing:
+            logger.debug(f"Job {name} with key {dedupe_key} is already queued as #{existing.id}")
+            return existing
+
+    try:
+        with transaction.atomic():
+            job = Job.objects.create(
+                name=name,
+                payload=payload,
+                dedupe_key=dedupe_key,
+                max_attempts=TASKS[name].max_attempts,
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+    except IntegrityError:
+        # Another process queued the same key between the check and the insert (jobs_job_queued_dedupe_uniq)
+        if not dedupe_key:
+            raise
+        logger.debug(f"Job {name} with key {dedupe_key} was queued concurrently")
+        return enqueue(name, dedupe_key, delay, **payload)
+    logger.info(f"Enqueued job {job}")
+    return job
+
+
+def _claimable(now):
+    """Queued jobs that are due, plus running jobs whose lease has expired."""
+    return Q(status='queued', run_after__lte=now) | Q(status='running', locked_until__lt=now)
+
+
+def claim_next(worker_id, batch_size=10):
+    """Leases the next available job to `worker_id`, or returns None when the queue is empty.
+
+    Claiming is a conditional UPDATE, so concurrent workers never run the same job at once
+    on any database backend.
+    """
+    now = timezone.now()
+    candidates = Job.objects.filter(_claimable(now)).order_by('run_after', 'id').values_list('id', 'name')[:batch_size]
+
+    for job_id, name in candidates:
+        handler = TASKS.get(name)
+        timeout = handler.visibility_timeout if handler else getattr(settings, 'JOBS_VISIBILITY_TIMEOUT', 900)
+        claimed = Job.objects.filter(_claimable(now), id=job_id).update(
+            status='running',
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=timeout),
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def extend_lease(job, seconds=None):
+    """Pushes back the visibility timeout of a job the caller still holds. Returns False if the lease was lost."""
+    handler = TASKS.get(job.name)
+    seconds = seconds or (handler.visibility_timeout if handler else getattr(settings, 'JOBS_VISIBILITY_TIMEOUT', 900))
+    job.locked_until = timezone.now() + timedelta(seconds=seconds)
+    return bool(Job.objects.filter(id=job.id, status='running', locked_by=job.locked_by).update(locked_until=job.locked_until))
+
+
+def _finish(job, **fields):
+    """Writes the outcome of a job, but only if this worker still holds its lease."""
+    fields.setdefault('locked_by', None)
+    fields.setdefault('locked_until', None)
+    fields['updated_at'] = timezone.now()
+    leased = Job.objects.filter(id=job.id, status='running', locked_by=job.locked_by)
+    try:
+        with transaction.atomic():
+            updated = leased.update(**fields)
+    except IntegrityError:
+        # Re-queueing, but a job with the same dedupe key was queued meanwhile and will redo this work
+        updated = leased.update(status='failed', locked_by=None, locked_until=None, updated_at=fields['updated_at'],
+                                last_error="Superseded by a newer queued job with the same dedupe key")
+        logger.info(f"Job {job} was superseded by a newer queued job with key {job.dedupe_key}")
+    if not updated:
+        logger.warning(f"Lost the lease on job {job} before it finished; another worker may have picked it up.")
+
+
+def retry_delay(attempts):
+    """Exponential backoff between attempts."""
+    return getattr(settings, 'JOBS_RETRY_DELAY', 10) * (2 ** max(attempts - 1, 0))
+
+
+def run_job(job):
+    """Runs a claimed job and records success, a retry, or a permanent failure."""
+    handler = TASKS.get(job.name)
+    if handler is None:
+        _finish(job, status='failed', last_error=f"No task registered under '{job.name}'")
+        logger.error(f"No task registered under '{job.name}' for job #{job.id}")
+        return
+
+    if job.attempts > job.max_attempts:
+        # A worker died holding this job more times than it is allowed to run
+        _finish(job, status='failed', last_error=job.last_error or "Lease expired too many times")
+        logger.error(f"Job {job} exceeded {job.max_attempts} attempts")
+        return
+
+    logger.info(f"Running job {job} (attempt {job.attempts}/{job.max_attempts})")
+    try:
+        handler(**job.payload)
+    except Retry as e:
+        delay = e.countdown if e.countdown is not None else retry_delay(job.attempts)
+        # Voluntary retries do not use up an attempt
+        _finish(job, status='queued', attempts=F('attempts') - 1, last_error=str(e) or None,
+                run_after=timezone.now() + timedelta(seconds=delay))
+        logger.info(f"Job {job} asked to be retried in {delay} seconds")
+    except Exception as e:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts)
+            _finish(job, status='queued', last_error=error, run_after=timezone.now() + timedelta(seconds=delay))
+            logger.error(f"Job {job} failed: {e}. Retrying in {delay} seconds.")
+        else:
+            _finish(job, status='failed', last_error=error)
+            logger.error(f"Job {job} failed permanently after {job.attempts} attempts: {e}")
+    else:
+        _finish(job, status='succeeded', last_error=None)
+        logger.info(f"Job {job} succeeded")
+
+
+def run_next(worker_id=None):
+    """Claims and runs a single job. Returns the job, or None if nothing was due."""
+    job = claim_next(worker_id or default_worker_id())
+    if job is not None:
+        run_job(job)
+    return job
@@ -0,0 +1,150 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.db import IntegrityError, transaction
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from jobs.models import Job
+from jobs.queue import Retry, claim_next, enqueue, run_job, run_next, task
+
+CALLS = []
+
+
+@task('jobs.tests.record')
+def record(**payload):
+    CALLS.append(payload)
+
+
+@task('jobs.tests.fail', max_attempts=2)
+def fail(**payload):
+    raise RuntimeError("provider unavailable")
+
+
+@task('jobs.tests.not_yet')
+def not_yet(**payload):
+    raise Retry("waiting for chunks", countdown=30)
+
+
+@override_settings(JOBS_RUN_INLINE=False, JOBS_RETRY_DELAY=10, JOBS_VISIBILITY_TIMEOUT=60)
+class JobQueueTests(TestCase):
+    """Claiming, leases, re-delivery, retries and dedupe of the database job queue."""
+
+    def setUp(self):
+        CALLS.clear()
+
+    def make_due(self, job):
+        Job.objects.filter(id=job.id).update(run_after=timezone.now() - timedelta(seconds=1))
+
+    def test_claim_leases_a_job_to_one_worker(self):
+        job = enqueue('jobs.tests.record', value=1)
+        claimed = claim_next('worker-a')
+        self.assertEqual(claimed.id, job.id)
+        self.assertEqual((claimed.status, claimed.locked_by, claimed.attempts), ('running', 'worker-a', 1))
+        self.assertGreater(claimed.locked_until, timezone.now() + timedelta(seconds=50))
+        self.assertIsNone(claim_next('worker-b'))
+
+        run_job(claimed)
+        self.assertEqual(CALLS, [{'value': 1}])
+        self.assertEqual(Job.objects.get(id=job.id).status, 'succeeded')
+
+    def test_delayed_job_is_not_claimed_early(self):
+        job = enqueue('jobs.tests.record', delay=30)
+        self.assertIsNone(claim_next('worker-a'))
+        self.make_due(job)
+        self.assertEqual(claim_next('worker-a').id, job.id)
+
+    def test_expired_lease_is_redelivered(self):
+        job = enqueue('jobs.tests.record')
+        lost = claim_next('worker-a')
+        Job.objects.filter(id=job.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        redelivered = claim_next('worker-b')
+        self.assertEqual((redelivered.id, redelivered.locked_by, redelivered.attempts), (job.id, 'worker-b', 2))
+
+        # The worker that lost its lease cannot overwrite the new holder's outcome
+        run_job(lost)
+        self.assertEqual(Job.objects.get(id=job.id).locked_by, 'worker-b')
+        run_job(redelivered)
+        self.assertEqual(Job.objects.get(id=job.id).status, 'succeeded')
+
+    def test_failures_back_off_then_fail_permanently(self):
+        job = enqueue('jobs.tests.fail')
+        self.assertEqual(job.max_attempts, 2)
+
+        before = timezone.now()
+        run_next('worker-a')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn("provider unavailable", job.last_error)
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=10))
+        self.assertIsNone(job.locked_by)
+
+        self.make_due(job)
+        run_next('worker-a')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIsNone(claim_next('worker-a'))
+
+    def test_job_that_outlived_its_attempts_is_failed_without_running(self):
+        job = enqueue('jobs.tests.record')
+        Job.objects.filter(id=job.id).update(status='running', attempts=job.max_attempts,
+                                             locked_until=timezone.now() - timedelta(seconds=1))
+        run_next('worker-a')
+        self.assertEqual(Job.objects.get(id=job.id).status, 'failed')
+        self.assertEqual(CALLS, [])
+
+    def test_voluntary_retry_keeps_its_attempts(self):
+        job = enqueue('jobs.tests.not_yet')
+        run_next('worker-a')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.last_error), ('queued', 0, "waiting for chunks"))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=25))
+
+    def test_dedupe_returns_the_queued_job(self):
+        first = enqueue('jobs.tests.record', dedupe_key='chunk_audio:1')
+        self.assertEqual(enqueue('jobs.tests.record', dedupe_key='chunk_audio:1').id, first.id)
+
+        # Once the job is running, the same key may be queued again
+        claim_next('worker-a')
+        second = enqueue('jobs.tests.record', dedupe_key='chunk_audio:1')
+        self.assertNotEqual(second.id, first.id)
+
+    def test_concurrent_enqueue_of_one_key_inserts_once(self):
+        queued = enqueue('jobs.tests.record', dedupe_key='chunk_audio:1')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Job.objects.create(name='jobs.tests.record', dedupe_key='chunk_audio:1')
+
+        # The other process's insert lands between our lookup and our insert
+        with mock.patch('django.db.models.QuerySet.first', side_effect=[None, queued]):
+            job = enqueue('jobs.tests.record', dedupe_key='chunk_audio:1')
+        self.assertEqual(job.id, queued.id)
+        self.assertEqual(Job.objects.filter(dedupe_key='chunk_audio:1').count(), 1)
+
+    def test_retry_superseded_by_a_newer_queued_job(self):
+        enqueue('jobs.tests.fail', dedupe_key='transcribe:1')
+        running = claim_next('worker-a')
+        newer = enqueue('jobs.tests.fail', dedupe_key='transcribe:1')
+
+        run_job(running)
+        self.assertEqual(Job.objects.get(id=running.id).status, 'failed')
+        self.assertEqual(Job.objects.get(id=newer.id).status, 'queued')
+
+
+@override_settings(JOBS_POLL_INTERVAL=5)
+class RunWorkerTests(SimpleTestCase):
+    """The worker sleeps for --poll-interval, or JOBS_POLL_INTERVAL when it is not given, on an empty queue."""
+
+    def run_worker(self, **options):
+        with mock.patch('jobs.management.commands.run_worker.run_next', side_effect=[None, object()]), \
+                mock.patch('jobs.management.commands.run_worker.close_old_connections'), \
+                mock.patch('jobs.management.commands.run_worker.signal.signal'), \
+                mock.patch('jobs.management.commands.run_worker.time.sleep') as sleep:
+            call_command('run_worker', max_jobs=1, stdout=StringIO(), **options)
+        return sleep.call_args.args[0]
+
+    def test_explicit_zero_poll_interval_is_kept(self):
+        self.assertEqual(self.run_worker(poll_interval=0), 0)
+
+    def test_poll_interval_defaults_to_the_setting(self):
+        self.assertEqual(self.run_worker(), 5)
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from search.models import SearchDocument
+
+
+@admin.register(SearchDocument)
+class SearchDocumentAdmin(admin.ModelAdmin):
+    list_display = ('transcription', 'source', 'title', 'date_updated')
+    list_filter = ('source',)
+    readonly_fields = ('date_updated',)
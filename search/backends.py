@@ -0,0 +1,104 @@
+import re
+from django.db import NotSupportedError, connections, router
+from search.models import SearchDocument
+
+TERM_RE = re.compile(r"\w+")
+MAX_TERMS = 32
+HIGHLIGHT = ('[b]', '[/b]')  # the markup case briefs already use for bold text
+SNIPPET_WORDS = 24
+
+
+# Ignored in queries, as PostgreSQL's english configuration does, so both backends match alike
+STOP_WORDS = frozenset("""
+    a an and are as at be but by for from has have he her his i if in into is it its me my no not
+    of on or our she so that the their them then there they this to was we were will with you your
+""".split())
+
+
+def search_terms(query):
+    """The words of a query; documents must contain every one (after stemming) to match."""
+    return [term for term in TERM_RE.findall(query.lower()) if term not in STOP_WORDS][:MAX_TERMS]
+
+
+class PostgresSearchBackend:
+    """Ranks matches of the generated tsvector column with ts_rank_cd and highlights with ts_headline."""
+
+    def search(self, connection, terms, sources, offset, limit):
+        table = SearchDocument._meta.db_table
+        source_filter, params = '', [" ".join(terms)]
+        if sources:
+            source_filter = f"AND d.source IN ({', '.join(['%s'] * len(sources))})"
+            params += sources
+        params += [limit, offset]
+        headline_options = (f'StartSel="{HIGHLIGHT[0]}", StopSel="{HIGHLIGHT[1]}", MaxFragments=2, '
+                            f'MaxWords={SNIPPET_WORDS}, MinWords={SNIPPET_WORDS // 2}, FragmentDelimiter=" … "')
+        # Only the rows of the requested page are highlighted: ts_headline re-parses the whole body
+        sql = f"""
+            WITH query AS (SELECT plainto_tsquery('english', %s) AS q),
+            page AS (
+                SELECT d.id, ts_rank_cd(d.search_vector, query.q, 32) AS rank
+                FROM {table} d, query
+                WHERE d.search_vector @@ query.q {source_filter}
+                ORDER BY rank DESC, d.id DESC
+                LIMIT %s OFFSET %s
+            )
+            SELECT d.id, d.source, d.transcription_id, d.title, page.rank,
+                   ts_headline('english', d.body, query.q, %s)
+            FROM page JOIN {table} d ON d.id = page.id, query
+            ORDER BY page.rank DESC, d.id DESC
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [headline_options])
+            return cursor.fetchall()
+
+
+class SQLiteSearchBackend:
+    """Ranks matches of the FTS5 table with BM25 (title weighted above body) and highlights with snippet()."""
+
+    def search(self, connection, terms, sources, offset, limit):
+        table = SearchDocument._meta.db_table
+        # Quoted, so query words are never read as FTS5 operators; juxtaposed terms must all match
+        params = [" ".join(f'"{term}"' for term in terms)]
+        source_filter = ''
+        if sources:
+            source_filter = f"AND d.source IN ({', '.join(['%s'] * len(sources))})"
+            params += sources
+        sql = f"""
+            SELECT d.id, d.source, d.transcription_id, d.title, -bm25({table}_fts, 4.0, 1.0) AS rank,
+                   snippet({table}_fts, 1, %s, %s, ' … ', {SNIPPET_WORDS})
+            FROM {table}_fts JOIN {table} d ON d.id = {table}_fts.rowid
+            WHERE {table}_fts MATCH %s {source_filter}
+            ORDER BY rank DESC, d.id DESC
+            LIMIT %s OFFSET %s
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*HIGHLIGHT] + params + [limit, offset])
+            return cursor.fetchall()
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend(),
+    'sqlite': SQLiteSearchBackend(),
+}
+
+
+def search(query, sources=None, offset=0, limit=20, using=None):
+    """Ranked full-text search over transcripts, diarized transcripts and case briefs.
+
+    Returns up to `limit` hits, best first, from position `offset`, each with a snippet of the
+    text around the matched words.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    connection = connections[using or router.db_for_read(SearchDocument)]
+    try:
+        backend = BACKENDS[connection.vendor]
+    except KeyError:
+        raise NotSupportedError(f"Full-text search is not available on {connection.vendor}")
+
+    rows = backend.search(connection, terms, list(sources or []), offset, limit)
+    return [
+        {'id': id, 'source': source, 'transcription': transcription_id, 'title': title, 'rank': rank, 'snippet': snippet}
+        for id, source, transcription_id, title, rank, snippet in rows
+    ]
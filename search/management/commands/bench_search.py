@@ -0,0 +1,69 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from case_matching.management.commands.bench_case_law_index import CASE_TERMS, synthetic_corpus
+from search.backends import search
+from search.models import SearchDocument
+from transcription.models import Transcription
+
+
+class Command(BaseCommand):
+    help = ("Measures full-text search latency over synthetic transcripts, against an unranked substring scan. "
+            "Everything is written in a transaction that is rolled back at the end.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=10000)
+        parser.add_argument('--words', type=int, default=500, help="Average words per transcript.")
+        parser.add_argument('--queries', type=int, default=100, help="Queries of each kind.")
+        parser.add_argument('--page-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._run(options)
+            transaction.set_rollback(True)
+
+    def _run(self, options):
+        documents = options['documents']
+        start_time = time.perf_counter()
+        transcriptions = Transcription.objects.bulk_create(
+            [Transcription(case_name=f"Republic v Accused {n}") for n in range(documents)], batch_size=1000)
+        texts = dict(synthetic_corpus(documents, words_per_document=options['words']))
+        SearchDocument.objects.bulk_create(
+            [SearchDocument(source='transcription', transcription_id=transcription.id, title=transcription.case_name, body=texts[n])
+             for n, transcription in enumerate(transcriptions)],
+            batch_size=500,
+        )
+        self.stdout.write(f"indexed {documents} transcripts ({sum(map(len, texts.values())) / 1e6:.1f} MB of text) "
+                          f"on {connection.vendor} in {time.perf_counter() - start_time:.1f}s")
+
+        # Common words match thousands of transcripts and rare ones a handful, which stresses
+        # ranking and lookup differently
+        rng = np.random.default_rng(1)
+        kinds = {
+            'case type': [str(rng.choice(CASE_TERMS)) for _ in range(options['queries'])],
+            'judge + case type': [f"judge{rng.integers(200)} {rng.choice(CASE_TERMS)}" for _ in range(options['queries'])],
+            'accused name': [f"accused{rng.integers(20000)}" for _ in range(options['queries'])],
+        }
+        page_size = options['page_size']
+        self.stdout.write(f"{'query':<20}{'method':<12}{'hits/page':>10}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}")
+        for kind, queries in kinds.items():
+            for method in ('full-text', 'substring'):
+                latencies, hits = [], 0
+                for query in queries:
+                    start_time = time.perf_counter()
+                    if method == 'full-text':
+                        results = search(query, offset=0, limit=page_size + 1)
+                    else:
+                        # What grepping the list endpoint amounts to: every body scanned, nothing ranked
+                        matches = SearchDocument.objects.all()
+                        for term in query.split():
+                            matches = matches.filter(body__icontains=term)
+                        results = list(matches.values_list('id', flat=True)[:page_size + 1])
+                    latencies.append(time.perf_counter() - start_time)
+                    hits += min(len(results), page_size)
+                latencies = np.array(latencies) * 1000
+                self.stdout.write(
+                    f"{kind:<20}{method:<12}{hits / len(queries):>10.1f}{np.percentile(latencies, 50):>9.2f}"
+                    f"{np.percentile(latencies, 95):>9.2f}{latencies.max():>9.2f}"
+                )
@@ -0,0 +1,37 @@
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand
+from case_brief.models import CaseBrief
+from diarization.models import DiarizedSegment
+from search.models import SearchDocument
+from transcription.models import Transcription
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the search documents from every transcript, diarized transcript and case brief."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        sources = [
+            ('transcription', Transcription.objects.values_list('id', 'case_name', 'transcription_text')),
+            ('diarization', DiarizedSegment.objects.values_list('transcription_id', 'transcription__case_name', 'diarization_data')),
+            ('case_brief', CaseBrief.objects.values_list('transcription_id', 'transcription__case_name', 'generated_caseBrief')),
+        ]
+        with transaction.atomic():
+            SearchDocument.objects.all().delete()
+            for source, rows in sources:
+                documents = SearchDocument.objects.bulk_create(
+                    (
+                        SearchDocument(source=source, transcription_id=transcription_id, title=(title or '')[:255], body=body)
+                        for transcription_id, title, body in rows.iterator()
+                        if body and body.strip()
+                    ),
+                    batch_size=options['batch_size'],
+                )
+                self.stdout.write(f"{source}: {len(documents)} documents")
+
+        if connection.vendor == 'sqlite':
+            # Re-reads every row into the FTS5 table, repairing it if rows were ever written without the triggers
+            with connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {SearchDocument._meta.db_table}_fts({SearchDocument._meta.db_table}_fts) VALUES ('rebuild')")
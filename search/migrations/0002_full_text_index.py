@@ -0,0 +1,100 @@
+from django.db import migrations
+
+# PostgreSQL: a generated tsvector column, so the index is current as soon as a row is written,
+# weighting the title above the body, and a GIN index over it.
+POSTGRES_INDEX = [
+    """
+    ALTER TABLE search_searchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A')
+        || setweight(to_tsvector('english'::regconfig, coalesce(body, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX searchdocument_vector_gin ON search_searchdocument USING GIN (search_vector)",
+]
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS searchdocument_vector_gin",
+    "ALTER TABLE search_searchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+# SQLite: an external-content FTS5 table over title and body, kept in step by triggers. Django
+# rebuilds SQLite tables for most schema changes, which drops these triggers, so a later migration
+# that alters search_searchdocument must run SQLITE_DROP and SQLITE_INDEX again.
+SQLITE_INDEX = [
+    """
+    CREATE VIRTUAL TABLE search_searchdocument_fts USING fts5(
+        title, body, content='search_searchdocument', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER search_searchdocument_fts_insert AFTER INSERT ON search_searchdocument BEGIN
+        INSERT INTO search_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER search_searchdocument_fts_delete AFTER DELETE ON search_searchdocument BEGIN
+        INSERT INTO search_searchdocument_fts(search_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER search_searchdocument_fts_update AFTER UPDATE ON search_searchdocument BEGIN
+        INSERT INTO search_searchdocument_fts(search_searchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO search_searchdocument_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    "INSERT INTO search_searchdocument_fts(search_searchdocument_fts) VALUES ('rebuild')",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS search_searchdocument_fts_insert",
+    "DROP TRIGGER IF EXISTS search_searchdocument_fts_delete",
+    "DROP TRIGGER IF EXISTS search_searchdocument_fts_update",
+    "DROP TABLE IF EXISTS search_searchdocument_fts",
+]
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+def index_existing_documents(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    Transcription = apps.get_model("transcription", "Transcription")
+    DiarizedSegment = apps.get_model("diarization", "DiarizedSegment")
+    CaseBrief = apps.get_model("case_brief", "CaseBrief")
+    SearchDocument = apps.get_model("search", "SearchDocument")
+
+    sources = [
+        ("transcription", Transcription.objects.values_list("id", "case_name", "transcription_text")),
+        ("diarization", DiarizedSegment.objects.values_list("transcription_id", "transcription__case_name", "diarization_data")),
+        ("case_brief", CaseBrief.objects.values_list("transcription_id", "transcription__case_name", "generated_caseBrief")),
+    ]
+    for source, rows in sources:
+        SearchDocument.objects.using(db_alias).bulk_create(
+            (
+                SearchDocument(source=source, transcription_id=transcription_id, title=(title or "")[:255], body=body)
+                for transcription_id, title, body in rows.using(db_alias).iterator()
+                if body and body.strip()
+            ),
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("search", "0001_initial"),
+        ("diarization", "0001_initial"),
+        ("case_brief", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({"postgresql": POSTGRES_INDEX, "sqlite": SQLITE_INDEX}),
+            run_for_vendor({"postgresql": POSTGRES_DROP, "sqlite": SQLITE_DROP}),
+        ),
+        migrations.RunPython(index_existing_documents, migrations.RunPython.noop),
+    ]
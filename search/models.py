@@ -0,0 +1,31 @@
+from django.db import models
+from transcription.models import Transcription
+
+
+class SearchDocument(models.Model):
+    """The searchable text of one transcript, diarized transcript or case brief.
+
+    Rows are kept current by the receivers in search.signals. The full-text index over them is
+    maintained by the database (see migration 0002): a generated tsvector column with a GIN index
+    on PostgreSQL, and an FTS5 table updated by triggers on SQLite.
+    """
+
+    SOURCE_CHOICES = [
+        ('transcription', 'Transcript'),
+        ('diarization', 'Diarized transcript'),
+        ('case_brief', 'Case brief'),
+    ]
+
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    transcription = models.ForeignKey(Transcription, on_delete=models.CASCADE, related_name='search_documents')
+    title = models.CharField(max_length=255, blank=True, default='')
+    body = models.TextField()
+    date_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'transcription'], name='searchdocument_source_txn_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_source_display()} of {self.title or f'transcription {self.transcription_id}'}"
@@ -0,0 +1,56 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from case_brief.models import CaseBrief
+from diarization.models import DiarizedSegment
+from search.models import SearchDocument
+from transcription.models import Transcription
+
+INDEXED_TRANSCRIPTION_FIELDS = {'transcription_text', 'case_name'}
+
+
+def index_document(source, transcription_id, title, body, using='default'):
+    """Stores the text of one document for search, in one upsert; empty text removes it."""
+    if body and body.strip():
+        SearchDocument.objects.using(using).bulk_create(
+            [SearchDocument(source=source, transcription_id=transcription_id, title=(title or '')[:255], body=body)],
+            update_conflicts=True,
+            unique_fields=['source', 'transcription'],
+            update_fields=['title', 'body', 'date_updated'],
+        )
+    else:
+        SearchDocument.objects.using(using).filter(source=source, transcription_id=transcription_id).delete()
+
+
+@receiver(post_save, sender=Transcription)
+def index_transcription(sender, instance, created, update_fields, raw, using, **kwargs):
+    # Most saves only move the transcription through the pipeline and change nothing searchable
+    if raw or (update_fields is not None and not INDEXED_TRANSCRIPTION_FIELDS & set(update_fields)):
+        return
+    if created and not instance.transcription_text:
+        return
+    index_document('transcription', instance.id, instance.case_name, instance.transcription_text, using)
+    if not created and (update_fields is None or 'case_name' in update_fields):
+        SearchDocument.objects.using(using).filter(transcription_id=instance.id).exclude(source='transcription').update(
+            title=(instance.case_name or '')[:255])
+
+
+@receiver(post_save, sender=DiarizedSegment)
+def index_diarized_segment(sender, instance, raw, using, **kwargs):
+    if not raw:
+        index_document('diarization', instance.transcription_id, instance.transcription.case_name, instance.diarization_data, using)
+
+
+@receiver(post_save, sender=CaseBrief)
+def index_case_brief(sender, instance, raw, using, **kwargs):
+    if not raw:
+        index_document('case_brief', instance.transcription_id, instance.transcription.case_name, instance.generated_caseBrief, using)
+
+
+@receiver(post_delete, sender=DiarizedSegment)
+def unindex_diarized_segment(sender, instance, using, **kwargs):
+    index_document('diarization', instance.transcription_id, '', '', using)
+
+
+@receiver(post_delete, sender=CaseBrief)
+def unindex_case_brief(sender, instance, using, **kwargs):
+    index_document('case_brief', instance.transcription_id, '', '', using)
@@ -0,0 +1,93 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from case_brief.models import CaseBrief
+from diarization.models import DiarizedSegment
+from search.backends import search
+from search.models import SearchDocument
+from transcription.models import Transcription
+
+
+@override_settings(JOBS_RUN_INLINE=False)
+class SearchDocumentTests(TestCase):
+    """Search documents follow the text they index and the database keeps the full-text index current."""
+
+    def setUp(self):
+        self.transcription = Transcription.objects.create(
+            case_name="Republic v Kamande", transcription_text="The accused was charged with murdering her boyfriend.")
+
+    def documents(self):
+        return dict(SearchDocument.objects.filter(transcription=self.transcription).values_list('source', 'title'))
+
+    def test_documents_follow_saves(self):
+        self.assertEqual(self.documents(), {'transcription': "Republic v Kamande"})
+        with CaptureQueriesContext(connection) as queries:
+            self.transcription.status = 'in_progress'
+            self.transcription.save(update_fields=['status'])  # pipeline saves skip indexing
+        self.assertFalse([query for query in queries if SearchDocument._meta.db_table in query['sql']])
+
+        DiarizedSegment.objects.create(transcription=self.transcription, diarization_data="SPEAKER A: Order in court.")
+        CaseBrief.objects.create(transcription=self.transcription, generated_caseBrief="Verdict: guilty of murder.")
+        self.transcription.case_name = "Republic v Ruth Kamande"
+        self.transcription.save()
+        self.assertEqual(set(self.documents().values()), {"Republic v Ruth Kamande"})
+        self.assertEqual(len(self.documents()), 3)
+
+        self.transcription.transcription_text = "The accused pleaded guilty to theft."
+        self.transcription.save(update_fields=['transcription_text'])
+        self.assertEqual([hit['source'] for hit in search("theft")], ['transcription'])
+        self.assertEqual([hit['source'] for hit in search("murdering")], ['case_brief'])
+
+        self.transcription.transcription_text = ""
+        self.transcription.save(update_fields=['transcription_text'])
+        self.assertNotIn('transcription', self.documents())
+        self.transcription.delete()
+        self.assertEqual(search("murder"), [])
+
+    def test_deleted_documents_leave_the_index(self):
+        segment = DiarizedSegment.objects.create(transcription=self.transcription, diarization_data="SPEAKER A: Order in court.")
+        case_brief = CaseBrief.objects.create(transcription=self.transcription, generated_caseBrief="Verdict: guilty of arson.")
+        self.assertEqual([hit['source'] for hit in search("arson")], ['case_brief'])
+        self.assertEqual([hit['source'] for hit in search("order court")], ['diarization'])
+
+        case_brief.delete()
+        segment.delete()
+        self.assertEqual(search("arson"), [])
+        self.assertEqual(search("order court"), [])
+        self.assertEqual(self.documents(), {'transcription': "Republic v Kamande"})
+
+    def test_search_ranks_stems_and_highlights(self):
+        Transcription.objects.create(case_name="Republic v Otieno",
+                                     transcription_text="Murder was mentioned once in this robbery hearing.")
+        Transcription.objects.create(case_name="Murder trial of Wekesa", transcription_text="The murder weapon was never found.")
+
+        hits = search("murder")
+        self.assertEqual(len(hits), 3)
+        self.assertEqual(hits[0]['title'], "Murder trial of Wekesa")  # a title match outranks body matches
+        self.assertEqual(sorted(hit['rank'] for hit in hits)[::-1], [hit['rank'] for hit in hits])
+        kamande = next(hit for hit in hits if hit['transcription'] == self.transcription.id)
+        self.assertIn("[b]murdering[/b]", kamande['snippet'])
+
+        self.assertEqual(len(search("murder robbery")), 1)
+        self.assertEqual(search("murder", sources=['case_brief']), [])
+        self.assertEqual([hit['transcription'] for hit in search("murder", offset=1, limit=1)], [hits[1]['transcription']])
+        # Query syntax characters are treated as plain words
+        self.assertEqual(len(search('murder" AND (accused* -')), 1)
+        self.assertEqual(search("  ...  "), [])
+
+    def test_search_endpoint_pages(self):
+        for n in range(4):
+            Transcription.objects.create(case_name=f"Case {n}", transcription_text=f"Hearing {n}: the accused was charged.")
+
+        body = self.client.get('/api/search/', {'q': 'charged', 'page_size': 3}).json()
+        self.assertEqual(len(body['results']), 3)
+        self.assertIsNone(body['previous'])
+        body = self.client.get(body['next']).json()
+        self.assertEqual(len(body['results']), 2)
+        self.assertIsNone(body['next'])
+        self.assertNotIn('page=', self.client.get(body['previous']).request['QUERY_STRING'])
+
+        self.assertEqual(self.client.get('/api/search/', {'q': 'charged', 'source': 'case_brief'}).json()['results'], [])
+        self.assertEqual(self.client.get('/api/search/').status_code, 400)
+        self.assertEqual(self.client.get('/api/search/', {'q': 'charged', 'source': 'emails'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/search/', {'q': 'charged', 'page': 'x'}).status_code, 400)
@@ -3,6 +3,18 @@ ASGI config for themis project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The progress event endpoints (/api/transcription/<pk>/events/) are served by
+api.progress without going through Django's request handler, so idle watchers
+hold no threads. Every middleware is async-capable (see api.middleware), so the
+async views (api/case_laws/async/, api/case_briefs/async/) wait on LeMUR and
+the PDF pool without holding one either.
+
+The Procfile still serves themis.wsgi, where the same endpoints work but hold
+a worker while they wait. To serve this application instead, start the web
+process with:
+
+    gunicorn themis.asgi:application -k uvicorn.workers.UvicornWorker --log-file -
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -13,4 +25,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "themis.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from api.progress import with_progress_routes  # noqa: E402  (needs the app registry loaded above)
+
+application = with_progress_routes(django_application)
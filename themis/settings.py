@@ -45,13 +45,15 @@ INSTALLED_APPS = [
     "api",
     "rest_framework",
     "case_matching",
+    "jobs.apps.JobsConfig",
+    "search.apps.SearchConfig",
     "corsheaders",
     
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "api.middleware.AsyncWhiteNoiseMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -140,10 +142,10 @@ STATIC_URL = "static/"
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
-# AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
-# AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
-# AWS_STORAGE_BUCKET_NAME = os.getenv('AWS_STORAGE_BUCKET_NAME')
-# AWS_S3_REGION_NAME = os.getenv('AWS_S3_REGION_NAME')
+AWS_ACCESS_KEY_ID = os.getenv('AWS_ACCESS_KEY_ID')
+AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
+AWS_STORAGE_BUCKET_NAME = os.getenv('AWS_STORAGE_BUCKET_NAME')
+AWS_S3_REGION_NAME = os.getenv('AWS_S3_REGION_NAME')
 
 # DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
 
@@ -168,3 +170,125 @@ AAI_KEY = os.getenv("AAI_KEY", " ")
 HF_AUTH_TOKEN = os.getenv("HF_AUTH_TOKEN", " ")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", " ")
 
+
+# Audio chunking: 'segment' has ffmpeg decode, resample and split the upload into chunk files in one
+# pass, 'streaming' pipes PCM to Python one chunk at a time, 'in_memory' loads the whole file with pydub
+AUDIO_CHUNKING_MODE = os.getenv("AUDIO_CHUNKING_MODE", "segment")
+AUDIO_CHUNK_LENGTH_MS = int(os.getenv("AUDIO_CHUNK_LENGTH_MS", 2 * 60 * 1000))
+AUDIO_CHUNK_DIR = os.getenv("AUDIO_CHUNK_DIR", "audio_chunks")
+
+# Chunk encoding sent to Whisper/pyannote: 'wav', 'flac' (lossless) or 'opus'.
+# Chunks are resampled to AUDIO_CHUNK_SAMPLE_RATE Hz and downmixed to AUDIO_CHUNK_CHANNELS channels;
+# set either to 0 to keep the source value.
+AUDIO_CHUNK_FORMAT = os.getenv("AUDIO_CHUNK_FORMAT", "flac")
+AUDIO_CHUNK_SAMPLE_RATE = int(os.getenv("AUDIO_CHUNK_SAMPLE_RATE", 16000)) or None
+AUDIO_CHUNK_CHANNELS = int(os.getenv("AUDIO_CHUNK_CHANNELS", 1)) or None
+
+# Background job queue (see jobs/). Run workers with `python manage.py run_worker`.
+# JOBS_RUN_INLINE runs every job synchronously in the enqueuing process, e.g. for local debugging.
+JOBS_RUN_INLINE = os.getenv("JOBS_RUN_INLINE", "false").lower() == "true"
+JOBS_VISIBILITY_TIMEOUT = int(os.getenv("JOBS_VISIBILITY_TIMEOUT", 900))  # seconds a lease lasts
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", 5))
+JOBS_RETRY_DELAY = int(os.getenv("JOBS_RETRY_DELAY", 10))  # base of the exponential backoff, in seconds
+JOBS_POLL_INTERVAL = float(os.getenv("JOBS_POLL_INTERVAL", 2))
+
+# Concurrent external API calls (chunk transcription, sectioned case-brief extraction) run on a
+# 'thread' pool, with per-provider limits on requests in flight and requests per minute (per process).
+ASR_DISPATCH_POOL = os.getenv("ASR_DISPATCH_POOL", "thread")
+ASR_PROVIDER_LIMITS = {
+    'openai': {
+        'concurrency': int(os.getenv("OPENAI_ASR_CONCURRENCY", 4)),
+        'requests_per_minute': int(os.getenv("OPENAI_ASR_REQUESTS_PER_MINUTE", 50)),
+    },
+    'lemur': {
+        'concurrency': int(os.getenv("LEMUR_CONCURRENCY", 4)),
+        'requests_per_minute': int(os.getenv("LEMUR_REQUESTS_PER_MINUTE", 30)),
+    },
+}
+
+# Case-law scraping: a per-process pool of headless Chrome sessions, recycled after
+# BROWSER_POOL_MAX_USES searches or BROWSER_POOL_MAX_AGE seconds.
+KENYALAW_SEARCH_URL = os.getenv("KENYALAW_SEARCH_URL", "https://new.kenyalaw.org/search/")
+CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH")  # defaults to webdriver-manager's download
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", 2))
+BROWSER_POOL_MAX_USES = int(os.getenv("BROWSER_POOL_MAX_USES", 50))
+BROWSER_POOL_MAX_AGE = int(os.getenv("BROWSER_POOL_MAX_AGE", 30 * 60))
+SCRAPER_PAGE_TIMEOUT = float(os.getenv("SCRAPER_PAGE_TIMEOUT", 10))  # seconds to wait for results to render
+
+# Local case-law corpus (CaseLawDocument) and its on-disk BM25 index. Case matching searches the
+# index first and only scrapes kenyalaw.org, backfilling the corpus, when it has no matches.
+CASE_LAW_INDEX_PATH = os.getenv("CASE_LAW_INDEX_PATH", str(BASE_DIR / "case_law_index.npz"))
+CASE_LAW_SCRAPE_FALLBACK = os.getenv("CASE_LAW_SCRAPE_FALLBACK", "true").lower() == "true"
+
+# Cache for scraped case-law search results, keyed on the normalized search term.
+# Backends: 'local' (per process), 'file' (CASE_LAW_CACHE_DIR, shared on the host) or 'django'
+# (the CASE_LAW_CACHE_ALIAS entry of CACHES, which then also decides eviction).
+CASE_LAW_CACHE_BACKEND = os.getenv("CASE_LAW_CACHE_BACKEND", "local")
+CASE_LAW_CACHE_TTL = int(os.getenv("CASE_LAW_CACHE_TTL", 24 * 60 * 60))  # seconds
+CASE_LAW_CACHE_MAX_ENTRIES = int(os.getenv("CASE_LAW_CACHE_MAX_ENTRIES", 1024))
+CASE_LAW_CACHE_DIR = os.getenv("CASE_LAW_CACHE_DIR", str(BASE_DIR / "case_law_cache"))
+CASE_LAW_CACHE_ALIAS = os.getenv("CASE_LAW_CACHE_ALIAS", "default")
+
+# Case-brief extraction. LLM_CLIENT is the class that sends prompts, e.g. 'api.llm.SimulatedLLMClient'
+# to run offline. CASE_BRIEF_EXTRACTION_MODE is 'single' (whole transcript in one request),
+# 'map_reduce' (sections of CASE_BRIEF_SECTION_CHARS extracted concurrently, then merged) or 'auto'
+# (map_reduce only for transcripts longer than one section).
+LLM_CLIENT = os.getenv("LLM_CLIENT", "api.llm.LemurClient")
+ASYNC_LLM_CLIENT = os.getenv("ASYNC_LLM_CLIENT", "api.llm.AsyncLemurClient")  # used by the async views
+# Long generations take well over the AssemblyAI SDK's 15 second default HTTP timeout
+LEMUR_TIMEOUT_SECONDS = float(os.getenv("LEMUR_TIMEOUT_SECONDS", 300))
+CASE_BRIEF_EXTRACTION_MODE = os.getenv("CASE_BRIEF_EXTRACTION_MODE", "auto")
+CASE_BRIEF_SECTION_CHARS = int(os.getenv("CASE_BRIEF_SECTION_CHARS", 30000))
+
+# Cache of extracted case information (api.LLMResponseCache), keyed on the transcript's hash, the
+# prompt version and the model. Least recently used entries are evicted above LLM_CACHE_MAX_BYTES.
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 50 * 1024 * 1024))
+
+# Case-brief PDFs are rendered in a pool of PDF_RENDER_WORKERS processes (0 renders in the calling thread)
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", 2))
+
+# Prometheus metrics (api/metrics/) are served only when METRICS_TOKEN is set, and only to requests
+# with an "Authorization: Bearer <METRICS_TOKEN>" header
+METRICS_TOKEN = os.getenv("METRICS_TOKEN") or None
+
+# Hand file downloads to the front-end server instead of streaming them from a worker:
+# 'x-sendfile' (Apache/lighttpd) or 'x-accel-redirect' (nginx, with an internal location at
+# FILE_DOWNLOAD_ACCEL_PREFIX aliasing FILE_DOWNLOAD_ROOT). Unset streams from Django.
+FILE_DOWNLOAD_OFFLOAD = os.getenv("FILE_DOWNLOAD_OFFLOAD") or None
+FILE_DOWNLOAD_ROOT = os.getenv("FILE_DOWNLOAD_ROOT", str(BASE_DIR))
+FILE_DOWNLOAD_ACCEL_PREFIX = os.getenv("FILE_DOWNLOAD_ACCEL_PREFIX", "/protected/")
+
+# List endpoints are cursor-paginated; clients may ask for up to API_MAX_PAGE_SIZE rows with ?page_size=
+API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", 50))
+API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", 500))
+
+# Progress events (/api/transcription/<pk>/events/). Each ASGI worker polls for new events every
+# PROGRESS_POLL_INTERVAL seconds with one query, however many clients are watching.
+PROGRESS_POLL_INTERVAL = float(os.getenv("PROGRESS_POLL_INTERVAL", 0.5))
+PROGRESS_KEEPALIVE_SECONDS = float(os.getenv("PROGRESS_KEEPALIVE_SECONDS", 15))
+PROGRESS_STREAM_MAX_SECONDS = float(os.getenv("PROGRESS_STREAM_MAX_SECONDS", 300))
+PROGRESS_MAX_POLL_SECONDS = float(os.getenv("PROGRESS_MAX_POLL_SECONDS", 60))
+
+# Async views (case_briefs/async/) call AssemblyAI LeMUR through one pooled httpx client per ASGI
+# worker process, keeping up to ASYNC_HTTP_MAX_KEEPALIVE connections open.
+ASYNC_HTTP_TIMEOUT = float(os.getenv("ASYNC_HTTP_TIMEOUT", 120))
+ASYNC_HTTP_MAX_CONNECTIONS = int(os.getenv("ASYNC_HTTP_MAX_CONNECTIONS", 100))
+ASYNC_HTTP_MAX_KEEPALIVE = int(os.getenv("ASYNC_HTTP_MAX_KEEPALIVE", 20))
+
+# Full-text search (api/search/) over transcripts, diarized transcripts and case briefs: a tsvector
+# column with a GIN index on PostgreSQL, FTS5 on SQLite. SEARCH_PAGE_SIZE hits per page by default.
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", 20))
+
+# Pipeline artifacts (audio chunks, case-brief PDFs) go to S3 over one shared client. Files above
+# S3_MULTIPART_THRESHOLD bytes are sent in S3_MULTIPART_CHUNKSIZE parts, S3_MAX_CONCURRENCY at a
+# time, and bulk uploads run S3_UPLOAD_WORKERS files at once. S3_UPLOAD_CHUNKS uploads each chunk
+# as the chunker writes it; S3_FAKE_ROOT stores objects under a local directory instead of S3.
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", 16 * 1024 * 1024))
+S3_MULTIPART_CHUNKSIZE = int(os.getenv("S3_MULTIPART_CHUNKSIZE", 16 * 1024 * 1024))
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", 8))
+S3_UPLOAD_WORKERS = int(os.getenv("S3_UPLOAD_WORKERS", 8))
+S3_ARTIFACT_PREFIX = os.getenv("S3_ARTIFACT_PREFIX", "transcriptions")
+S3_UPLOAD_CHUNKS = os.getenv("S3_UPLOAD_CHUNKS", "false").lower() == "true"
+S3_FAKE_ROOT = os.getenv("S3_FAKE_ROOT") or None
@@ -0,0 +1,223 @@
+import os
+import wave
+import logging
+import tempfile
+import subprocess
+from pydub import AudioSegment
+from pydub.utils import mediainfo
+
+logger = logging.getLogger(__name__)
+
+# Chunk size used by the pipeline (2 minutes)
+DEFAULT_CHUNK_LENGTH_MS = 2 * 60 * 1000
+
+# Sample widths pydub can wrap directly without conversion
+SUPPORTED_SAMPLE_WIDTHS = (1, 2, 4)
+
+# Chunk encodings the pipeline can produce. Whisper and pyannote both accept all of them.
+CHUNK_FORMATS = {
+    'wav': {'extension': 'wav', 'format': 'wav'},
+    'flac': {'extension': 'flac', 'format': 'flac'},
+    'opus': {'extension': 'ogg', 'format': 'ogg', 'codec': 'libopus', 'bitrate': '32k'},
+}
+
+# ffmpeg encoder options for each chunk format when ffmpeg writes the chunks itself ('segment' mode)
+SEGMENT_ENCODERS = {
+    'wav': ["-c:a", "pcm_s16le"],
+    'flac': ["-c:a", "flac"],
+    'opus': ["-c:a", "libopus", "-b:a", "32k"],
+}
+
+
+def probe_audio(audio_file_path):
+    """Returns (sample_rate, channels) of an audio file without decoding it."""
+    info = mediainfo(audio_file_path)
+    sample_rate = int(info.get('sample_rate') or 44100)
+    channels = int(info.get('channels') or 1)
+    return sample_rate, channels
+
+
+def _iter_wav_chunks(audio_file_path, chunk_length_ms):
+    """Reads a PCM WAV file one chunk at a time using the stdlib wave reader."""
+    with wave.open(audio_file_path, 'rb') as wav_file:
+        frame_rate = wav_file.getframerate()
+        channels = wav_file.getnchannels()
+        sample_width = wav_file.getsampwidth()
+        frames_per_chunk = int(frame_rate * chunk_length_ms / 1000)
+
+        while True:
+            data = wav_file.readframes(frames_per_chunk)
+            if not data:
+                break
+            yield AudioSegment(data=data, sample_width=sample_width, frame_rate=frame_rate, channels=channels)
+
+
+def _finish_ffmpeg(process, command, stderr_file):
+    """Waits for ffmpeg and raises CalledProcessError with its stderr if it failed."""
+    return_code = process.wait()
+    if return_code != 0:
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode(errors='replace')
+        raise subprocess.CalledProcessError(return_code, command, stderr=stderr)
+
+
+def _iter_ffmpeg_chunks(audio_file_path, chunk_length_ms, sample_rate, channels, sample_width=2):
+    """Decodes any ffmpeg-readable file to raw PCM over a pipe and yields fixed-size chunks."""
+    bytes_per_chunk = int(sample_rate * chunk_length_ms / 1000) * channels * sample_width
+    command = [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-i", audio_file_path,
+        "-f", f"s{sample_width * 8}le",
+        "-acodec", f"pcm_s{sample_width * 8}le",
+        "-ac", str(channels),
+        "-ar", str(sample_rate),
+        "pipe:1",
+    ]
+    # stderr goes to a file rather than a pipe: a pipe nobody reads until stdout ends would fill up on
+    # a stream of decode errors and leave ffmpeg and this reader waiting on each other
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file)
+        try:
+            while True:
+                # BufferedReader.read blocks until the full chunk is available or EOF
+                data = process.stdout.read(bytes_per_chunk)
+                if not data:
+                    break
+                yield AudioSegment(data=data, sample_width=sample_width, frame_rate=sample_rate, channels=channels)
+        finally:
+            process.stdout.close()
+            process.wait()
+        _finish_ffmpeg(process, command, stderr_file)
+
+
+def _is_streamable_wav(audio_file_path):
+    """Checks whether a file is a plain PCM WAV the wave module can read."""
+    if not audio_file_path.lower().endswith(".wav"):
+        return False
+    try:
+        with wave.open(audio_file_path, 'rb') as wav_file:
+            return wav_file.getsampwidth() in SUPPORTED_SAMPLE_WIDTHS
+    except (wave.Error, EOFError):
+        return False
+
+
+def _wav_matches(audio_file_path, sample_rate, channels):
+    """Checks whether a WAV file already has the requested sample rate and channel count."""
+    with wave.open(audio_file_path, 'rb') as wav_file:
+        return (sample_rate is None or wav_file.getframerate() == sample_rate) and \
+            (channels is None or wav_file.getnchannels() == channels)
+
+
+def iter_streaming_chunks(audio_file_path, chunk_length_ms=DEFAULT_CHUNK_LENGTH_MS, sample_rate=None, channels=None):
+    """Yields audio chunks in one pass, holding at most one chunk of PCM in memory.
+
+    When sample_rate/channels are given, ffmpeg resamples and downmixes while decoding.
+    """
+    if _is_streamable_wav(audio_file_path) and _wav_matches(audio_file_path, sample_rate, channels):
+        logger.debug(f"Streaming WAV chunks from {audio_file_path}")
+        yield from _iter_wav_chunks(audio_file_path, chunk_length_ms)
+        return
+
+    if sample_rate is None or channels is None:
+        source_rate, source_channels = probe_audio(audio_file_path)
+        sample_rate = sample_rate or source_rate
+        channels = channels or source_channels
+    logger.debug(f"Streaming chunks from {audio_file_path} through ffmpeg ({sample_rate} Hz, {channels} ch)")
+    yield from _iter_ffmpeg_chunks(audio_file_path, chunk_length_ms, sample_rate, channels)
+
+
+def iter_in_memory_chunks(audio_file_path, chunk_length_ms=DEFAULT_CHUNK_LENGTH_MS, sample_rate=None, channels=None):
+    """Decodes the whole file with pydub and yields slices of it (legacy behaviour)."""
+    audio = AudioSegment.from_file(audio_file_path)
+    if sample_rate:
+        audio = audio.set_frame_rate(sample_rate)
+    if channels:
+        audio = audio.set_channels(channels)
+    logger.info(f"Audio loaded into memory from {audio_file_path}, length: {len(audio)} ms")
+    for start in range(0, len(audio), chunk_length_ms):
+        yield audio[start:start + chunk_length_ms]
+
+
+CHUNKING_MODES = {
+    'streaming': iter_streaming_chunks,
+    'in_memory': iter_in_memory_chunks,
+}
+
+
+def iter_audio_chunks(audio_file_path, chunk_length_ms=DEFAULT_CHUNK_LENGTH_MS, mode='streaming', sample_rate=None, channels=None):
+    """Yields chunks of an audio file using the requested chunking mode."""
+    try:
+        chunker = CHUNKING_MODES[mode]
+    except KeyError:
+        raise ValueError(f"Unknown chunking mode '{mode}'. Expected one of: {', '.join(CHUNKING_MODES)}")
+    return chunker(audio_file_path, chunk_length_ms, sample_rate, channels)
+
+
+def export_chunk(chunk, chunk_file_path, chunk_format='wav'):
+    """Encodes a single AudioSegment chunk to disk in one of CHUNK_FORMATS."""
+    export_options = dict(CHUNK_FORMATS[chunk_format])
+    export_options.pop('extension')
+    chunk.export(chunk_file_path, **export_options)
+
+
+def export_segmented_chunks(audio_file_path, chunk_dir, prefix, chunk_length_ms=DEFAULT_CHUNK_LENGTH_MS,
+                            chunk_format='wav', sample_rate=None, channels=None):
+    """Decodes, resamples, encodes and splits the file in a single ffmpeg process using the segment muxer.
+
+    No PCM passes through Python and nothing but the chunks is written. ffmpeg reports each chunk
+    on its segment list (stdout) when the chunk is complete, so (index, chunk_file_path) pairs are
+    yielded while later chunks are still being encoded. Chunks are cut at the source's packet
+    boundaries, a few milliseconds from chunk_length_ms.
+    """
+    extension = CHUNK_FORMATS[chunk_format]['extension']
+    command = ["ffmpeg", "-nostdin", "-loglevel", "error", "-y", "-i", audio_file_path, "-vn"]
+    if channels:
+        command += ["-ac", str(channels)]
+    if sample_rate:
+        command += ["-ar", str(sample_rate)]
+    command += SEGMENT_ENCODERS[chunk_format] + [
+        "-f", "segment",
+        "-segment_time", f"{chunk_length_ms / 1000:g}",
+        "-segment_format", CHUNK_FORMATS[chunk_format]['format'],
+        "-reset_timestamps", "1",
+        "-segment_list", "pipe:1",
+        "-segment_list_type", "flat",
+        os.path.join(chunk_dir, f"{prefix}_chunk_%d.{extension}"),
+    ]
+    logger.debug(f"Segmenting {audio_file_path} with ffmpeg ({sample_rate or 'source'} Hz, {channels or 'source'} ch)")
+    # stderr goes to a file for the same reason as in _iter_ffmpeg_chunks
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file, text=True)
+        try:
+            for index, line in enumerate(process.stdout):
+                yield index, os.path.join(chunk_dir, line.strip())
+        finally:
+            process.stdout.close()
+            process.wait()
+        _finish_ffmpeg(process, command, stderr_file)
+
+
+def export_audio_chunks(audio_file_path, chunk_dir, prefix, chunk_length_ms=DEFAULT_CHUNK_LENGTH_MS, mode='streaming',
+                        chunk_format='wav', sample_rate=None, channels=None):
+    """Writes each chunk to disk as soon as it is decoded and yields (index, chunk_file_path).
+
+    Any format ffmpeg reads is decoded directly; no intermediate copy of the whole recording is made.
+    """
+    if chunk_format not in CHUNK_FORMATS:
+        raise ValueError(f"Unknown chunk format '{chunk_format}'. Expected one of: {', '.join(CHUNK_FORMATS)}")
+
+    if not os.path.exists(chunk_dir):
+        os.makedirs(chunk_dir)
+        logger.info(f"Created directory for chunks: {chunk_dir}")
+
+    if mode == 'segment':
+        yield from export_segmented_chunks(audio_file_path, chunk_dir, prefix, chunk_length_ms, chunk_format, sample_rate, channels)
+        return
+
+    extension = CHUNK_FORMATS[chunk_format]['extension']
+    chunks = iter_audio_chunks(audio_file_path, chunk_length_ms, mode, sample_rate, channels)
+    for index, chunk in enumerate(chunks):
+        chunk_file_path = os.path.join(chunk_dir, f"{prefix}_chunk_{index}.{extension}")
+        export_chunk(chunk, chunk_file_path, chunk_format)
+        logger.debug(f"Exported chunk {index} to {chunk_file_path}")
+        yield index, chunk_file_path
@@ -0,0 +1,77 @@
+import os
+import time
+import shutil
+import tempfile
+import subprocess
+from django.core.management.base import BaseCommand, CommandError
+from transcription.audio import CHUNK_FORMATS, DEFAULT_CHUNK_LENGTH_MS, export_chunk, iter_audio_chunks
+
+
+class Command(BaseCommand):
+    help = "Reports bytes and wall time per audio minute for each chunk format."
+
+    def add_arguments(self, parser):
+        parser.add_argument('audio_file', nargs='?', help="Audio file to chunk. A synthetic recording is generated when omitted.")
+        parser.add_argument('--minutes', type=float, default=10, help="Length of the synthetic recording in minutes.")
+        parser.add_argument('--chunk-length-ms', type=int, default=DEFAULT_CHUNK_LENGTH_MS)
+        parser.add_argument('--sample-rate', type=int, default=16000, help="Target sample rate (0 keeps the source rate).")
+        parser.add_argument('--channels', type=int, default=1, help="Target channel count (0 keeps the source layout).")
+        parser.add_argument('--formats', nargs='+', default=list(CHUNK_FORMATS), choices=list(CHUNK_FORMATS))
+
+    def handle(self, *args, **options):
+        work_dir = tempfile.mkdtemp(prefix="bench_chunks_")
+        try:
+            audio_file = options['audio_file'] or self._generate_recording(work_dir, options['minutes'])
+            if not os.path.exists(audio_file):
+                raise CommandError(f"Audio file does not exist at {audio_file}")
+
+            self.stdout.write(f"{'format':<8}{'chunks':>8}{'bytes/min':>14}{'encode s/min':>15}{'decode s/min':>15}")
+            for chunk_format in options['formats']:
+                self._bench_format(audio_file, work_dir, chunk_format, options)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _generate_recording(self, work_dir, minutes):
+        """Synthesizes a stereo 44.1 kHz speech-like recording with ffmpeg."""
+        audio_file = os.path.join(work_dir, "source.wav")
+        subprocess.run([
+            "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.3:duration={minutes * 60}",
+            "-af", "volume='0.5+0.5*sin(2*PI*t*3)':eval=frame",
+            "-ar", "44100", "-ac", "2", audio_file,
+        ], check=True)
+        return audio_file
+
+    def _bench_format(self, audio_file, work_dir, chunk_format, options):
+        chunk_dir = os.path.join(work_dir, chunk_format)
+        os.makedirs(chunk_dir)
+        extension = CHUNK_FORMATS[chunk_format]['extension']
+
+        chunk_files = []
+        audio_ms = 0
+        start_time = time.perf_counter()
+        chunks = iter_audio_chunks(
+            audio_file, options['chunk_length_ms'], 'streaming',
+            sample_rate=options['sample_rate'] or None,
+            channels=options['channels'] or None,
+        )
+        for index, chunk in enumerate(chunks):
+            chunk_file_path = os.path.join(chunk_dir, f"bench_chunk_{index}.{extension}")
+            export_chunk(chunk, chunk_file_path, chunk_format)
+            chunk_files.append(chunk_file_path)
+            audio_ms += len(chunk)
+        encode_time = time.perf_counter() - start_time
+
+        # Decode every chunk back to PCM, which is what pyannote does before diarizing
+        start_time = time.perf_counter()
+        for path in chunk_files:
+            subprocess.run(["ffmpeg", "-nostdin", "-loglevel", "error", "-i", path, "-f", "null", "-"], check=True)
+        decode_time = time.perf_counter() - start_time
+
+        total_bytes = sum(os.path.getsize(path) for path in chunk_files)
+        minutes = max(audio_ms / 60000, 1e-9)
+
+        self.stdout.write(
+            f"{chunk_format:<8}{len(chunk_files):>8}{total_bytes / minutes:>14,.0f}"
+            f"{encode_time / minutes:>15.3f}{decode_time / minutes:>15.3f}"
+        )
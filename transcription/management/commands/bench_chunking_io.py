@@ -0,0 +1,94 @@
+import os
+import time
+import shutil
+import resource
+import tempfile
+import subprocess
+from django.core.management.base import BaseCommand, CommandError
+from transcription.audio import CHUNK_FORMATS, DEFAULT_CHUNK_LENGTH_MS, export_audio_chunks
+
+
+def bytes_written():
+    """Bytes this process and its finished child processes (ffmpeg) have written to storage."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_oublock
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_oublock
+    return (own + children) * 512
+
+
+class Command(BaseCommand):
+    help = ("Compares disk writes and wall time of chunking a compressed (m4a) upload: converting it to a "
+            "full WAV first and chunking that, as the pipeline used to, against decoding it directly "
+            "('streaming') and against one ffmpeg segment-muxer pass ('segment').")
+
+    def add_arguments(self, parser):
+        parser.add_argument('audio_file', nargs='?', help="Audio file to chunk. A synthetic m4a recording is generated when omitted.")
+        parser.add_argument('--hours', type=float, default=2, help="Length of the synthetic recording in hours.")
+        parser.add_argument('--chunk-length-ms', type=int, default=DEFAULT_CHUNK_LENGTH_MS)
+        parser.add_argument('--format', default='flac', choices=list(CHUNK_FORMATS))
+        parser.add_argument('--sample-rate', type=int, default=16000, help="Target sample rate (0 keeps the source rate).")
+        parser.add_argument('--channels', type=int, default=1, help="Target channel count (0 keeps the source layout).")
+
+    def handle(self, *args, **options):
+        work_dir = tempfile.mkdtemp(prefix="bench_chunking_io_")
+        try:
+            audio_file = options['audio_file'] or self._generate_recording(work_dir, options['hours'])
+            if not os.path.exists(audio_file):
+                raise CommandError(f"Audio file does not exist at {audio_file}")
+
+            self.stdout.write(f"{os.path.basename(audio_file)}: {os.path.getsize(audio_file) / 1e6:.0f} MB, "
+                              f"{options['format']} chunks")
+            self.stdout.write(f"{'method':<24}{'chunks':>8}{'seconds':>9}{'written MB':>12}{'left on disk MB':>17}")
+            for method in ('wav intermediate', 'streaming', 'segment'):
+                self._bench(method, audio_file, work_dir, options)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _generate_recording(self, work_dir, hours):
+        """Synthesizes a stereo 44.1 kHz speech-like recording, AAC-encoded like phone and recorder uploads."""
+        audio_file = os.path.join(work_dir, "source.m4a")
+        subprocess.run([
+            "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.3:duration={hours * 3600}",
+            "-af", "volume='0.5+0.5*sin(2*PI*t*3)':eval=frame",
+            "-ar", "44100", "-ac", "2", "-c:a", "aac", "-b:a", "64k", audio_file,
+        ], check=True)
+        return audio_file
+
+    def _bench(self, method, audio_file, work_dir, options):
+        method_dir = os.path.join(work_dir, method.replace(' ', '_'))
+        os.makedirs(method_dir)
+        source = os.path.join(method_dir, os.path.basename(audio_file))
+        try:
+            os.link(audio_file, source)
+        except OSError:
+            # Hard links cannot cross filesystems (EXDEV), e.g. from the upload's disk to a tmpfs /tmp.
+            # A symlink still adds no writes to the measurement, which a copy would.
+            os.symlink(os.path.abspath(audio_file), source)
+
+        written_before = bytes_written()
+        start_time = time.perf_counter()
+        mode = method
+        if method == 'wav intermediate':
+            wav_file = os.path.splitext(source)[0] + ".wav"
+            subprocess.run(["ffmpeg", "-nostdin", "-loglevel", "error", "-i", source, wav_file], check=True)
+            source, mode = wav_file, 'streaming'
+        chunks = list(export_audio_chunks(
+            source, os.path.join(method_dir, "chunks"), "bench", options['chunk_length_ms'], mode, options['format'],
+            sample_rate=options['sample_rate'] or None, channels=options['channels'] or None,
+        ))
+        # Flush dirty pages so every write is counted, whichever process made it
+        os.sync()
+        elapsed = time.perf_counter() - start_time
+        written = bytes_written() - written_before
+
+        # What stays behind besides the upload and its chunks, i.e. the intermediate WAV
+        chunk_paths = {path for _, path in chunks}
+        left_over = sum(
+            os.path.getsize(os.path.join(directory, name))
+            for directory, _, names in os.walk(method_dir) for name in names
+            if os.path.join(directory, name) not in chunk_paths and name != os.path.basename(audio_file)
+        )
+        self.stdout.write(
+            f"{method:<24}{len(chunks):>8}{elapsed:>9.2f}{written / 1e6:>12.1f}{left_over / 1e6:>17.1f}"
+        )
+        shutil.rmtree(method_dir, ignore_errors=True)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from transcription.models import TranscriptionStatusCount
+
+
+class Command(BaseCommand):
+    help = "Recounts transcriptions per status and repairs the status counters that drifted."
+
+    def handle(self, *args, **options):
+        drift = TranscriptionStatusCount.reconcile()
+        for status, (was, now) in drift.items():
+            self.stdout.write(f"{status}: {was} -> {now}")
+        self.stdout.write(f"Repaired {len(drift)} status counters" if drift else "Status counters are accurate")
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transcription", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transcription",
+            index=models.Index(fields=["status"], name="transcription_status_idx"),
+        ),
+    ]
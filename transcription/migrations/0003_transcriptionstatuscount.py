@@ -0,0 +1,46 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:13
+
+from django.db import migrations, models
+
+
+def count_existing_transcriptions(apps, schema_editor):
+    Transcription = apps.get_model("transcription", "Transcription")
+    TranscriptionStatusCount = apps.get_model("transcription", "TranscriptionStatusCount")
+    db_alias = schema_editor.connection.alias
+    counts = {status: 0 for status, _ in Transcription._meta.get_field("status").choices}
+    counts.update(
+        Transcription.objects.using(db_alias)
+        .values("status")
+        .annotate(total=models.Count("id"))
+        .values_list("status", "total")
+    )
+    TranscriptionStatusCount.objects.using(db_alias).bulk_create(
+        TranscriptionStatusCount(status=status, count=total) for status, total in counts.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transcription", "0002_transcription_status_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TranscriptionStatusCount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("status", models.CharField(max_length=255, unique=True)),
+                ("count", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(count_existing_transcriptions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transcription", "0003_transcriptionstatuscount"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TranscriptionEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("status", "Status changed"),
+                            ("chunked", "Audio chunked"),
+                            ("chunk_transcribed", "Chunk transcribed"),
+                            ("chunk_diarized", "Chunk diarized"),
+                            ("chunk_failed", "Chunk failed"),
+                            ("joined", "Diarization joined"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("chunk_index", models.IntegerField(blank=True, null=True)),
+                ("data", models.JSONField(blank=True, default=dict)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "transcription",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="events",
+                        to="transcription.transcription",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["transcription", "id"],
+                        name="transcriptionevent_txn_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations, models
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+
+def number_existing_events(apps, schema_editor):
+    """Numbers each transcription's existing events in id order."""
+    TranscriptionEvent = apps.get_model("transcription", "TranscriptionEvent")
+    db = schema_editor.connection.alias
+    numbered = (
+        TranscriptionEvent.objects.using(db)
+        .annotate(number=Window(RowNumber(), partition_by=[F("transcription_id")], order_by=F("id").asc()))
+        .values_list("id", "number")
+    )
+    batch = []
+    for event_id, number in numbered.iterator(chunk_size=2000):
+        batch.append(TranscriptionEvent(id=event_id, sequence=number))
+        if len(batch) == 2000:
+            TranscriptionEvent.objects.using(db).bulk_update(batch, ["sequence"])
+            batch = []
+    TranscriptionEvent.objects.using(db).bulk_update(batch, ["sequence"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transcription", "0004_transcriptionevent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transcriptionevent",
+            name="sequence",
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.RunPython(number_existing_events, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name="transcriptionevent",
+            name="transcriptionevent_txn_idx",
+        ),
+        migrations.AddConstraint(
+            model_name="transcriptionevent",
+            constraint=models.UniqueConstraint(
+                fields=("transcription", "sequence"), name="transcriptionevent_txn_seq_uniq"
+            ),
+        ),
+    ]
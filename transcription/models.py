@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import F
 
 # Create your models here.
 from django.contrib.auth.models import User
@@ -22,6 +23,147 @@ class Transcription(models.Model):
     date_updated = models.DateTimeField(auto_now=True)
     is_chunked = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='transcription_status_idx'),
+        ]
+
     def __str__(self):
         return self.case_name or f"Transcription {self.id}"
 
+    def save(self, *args, **kwargs):
+        """Saves the transcription and, in the same transaction, moves it between status counters.
+
+        The stored status is read under a row lock rather than trusted from when this instance was
+        loaded, so concurrent workers saving the same transcription cannot double-count it.
+        QuerySet.update() and bulk_create() bypass this; reconcile_status_counts repairs them.
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'status' not in update_fields:
+            return super().save(*args, **kwargs)
+
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            previous = None
+            if not self._state.adding and self.pk is not None:
+                previous = (
+                    Transcription.objects.using(using).select_for_update()
+                    .filter(pk=self.pk).values_list('status', flat=True).first()
+                )
+            super().save(*args, **kwargs)
+            if previous != self.status:
+                TranscriptionStatusCount.shift(previous, self.status, using=using)
+                TranscriptionEvent.record(self.pk, 'status', using=using, status=self.status)
+
+
+class TranscriptionStatusCount(models.Model):
+    """Number of transcriptions in each status, kept current by Transcription.save and deletion,
+    so status summaries read a handful of rows instead of grouping the whole table."""
+
+    status = models.CharField(max_length=255, unique=True)
+    count = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.status}: {self.count}"
+
+    @classmethod
+    def shift(cls, old_status, new_status, using='default'):
+        """Moves one transcription from old_status to new_status; either may be None (created/deleted).
+
+        Must run inside the transaction that changes the transcription. Counter rows are updated in
+        a fixed order so two opposite transitions cannot deadlock on them.
+        """
+        if old_status == new_status:
+            return
+        deltas = {old_status: -1, new_status: 1}
+        for status in sorted(status for status in deltas if status is not None):
+            updated = cls.objects.using(using).filter(status=status).update(count=F('count') + deltas[status])
+            if not updated:
+                cls.objects.using(using).bulk_create([cls(status=status, count=0)], ignore_conflicts=True)
+                cls.objects.using(using).filter(status=status).update(count=F('count') + deltas[status])
+
+    @classmethod
+    def counts(cls):
+        """Count for every status in Transcription.STATUS_CHOICES (and any other stored status)."""
+        counts = {status: 0 for status, _ in Transcription.STATUS_CHOICES}
+        counts.update(cls.objects.values_list('status', 'count'))
+        return counts
+
+    @classmethod
+    def reconcile(cls):
+        """Recounts every status from the Transcription table and returns {status: (was, now)} for drifted ones.
+
+        The counter rows are locked before counting, so transitions committing meanwhile either are
+        already visible to the count or apply their shift after the recount is stored.
+        """
+        with transaction.atomic():
+            stored = dict(cls.objects.select_for_update().values_list('status', 'count'))
+            actual = {status: 0 for status, _ in Transcription.STATUS_CHOICES}
+            actual.update(Transcription.objects.values('status').annotate(total=models.Count('id')).values_list('status', 'total'))
+
+            drift = {}
+            for status in sorted(set(stored) | set(actual)):
+                was, now = stored.get(status), actual.get(status, 0)
+                if was == now:
+                    continue
+                drift[status] = (was or 0, now)
+                cls.objects.update_or_create(status=status, defaults={'count': now})
+            return drift
+
+
+
+class TranscriptionEvent(models.Model):
+    """A step of a transcription's progress, streamed to watchers by the progress endpoints.
+
+    `sequence` numbers a transcription's events 1, 2, 3, ... and is the watchers' cursor: a client
+    resumes by asking for events after the last sequence it saw. Sequences are assigned under the
+    transcription's row lock, so they become visible in order; ids, drawn from the table's sequence
+    before commit, can become visible out of order when events are recorded concurrently.
+    """
+
+    KIND_CHOICES = [
+        ('status', 'Status changed'),
+        ('chunked', 'Audio chunked'),
+        ('chunk_transcribed', 'Chunk transcribed'),
+        ('chunk_diarized', 'Chunk diarized'),
+        ('chunk_failed', 'Chunk failed'),
+        ('joined', 'Diarization joined'),
+    ]
+
+    transcription = models.ForeignKey(Transcription, on_delete=models.CASCADE, related_name='events')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    chunk_index = models.IntegerField(blank=True, null=True)
+    data = models.JSONField(default=dict, blank=True)
+    sequence = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['transcription', 'sequence'], name='transcriptionevent_txn_seq_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} for transcription {self.transcription_id}"
+
+    @classmethod
+    def record(cls, transcription_id, kind, chunk_index=None, using='default', **data):
+        """Stores the next event of the transcription.
+
+        The row lock is held until the surrounding transaction commits, so a concurrent event of the
+        same transcription waits for this one to be visible before it takes the next sequence.
+        """
+        with transaction.atomic(using=using, savepoint=False):
+            Transcription.objects.using(using).select_for_update().filter(pk=transcription_id).values_list('pk').first()
+            last = cls.objects.using(using).filter(transcription_id=transcription_id).aggregate(last=models.Max('sequence'))['last']
+            return cls.objects.using(using).create(
+                transcription_id=transcription_id, kind=kind, chunk_index=chunk_index, data=data, sequence=(last or 0) + 1,
+            )
+
+    def as_dict(self):
+        return {
+            'id': self.sequence,
+            'kind': self.kind,
+            'chunk_index': self.chunk_index,
+            'data': self.data,
+            'created_at': self.created_at.isoformat(),
+        }
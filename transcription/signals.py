@@ -1,13 +1,17 @@
 import os
 import json
 import logging
-from pydub import AudioSegment
 from pydub.utils import which
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from transcription.models import Transcription
+from transcription.models import Transcription, TranscriptionEvent, TranscriptionStatusCount
 from transcription_chunks.models import AudioChunk
+from transcription_chunks.signals import refresh_transcription_status
+from jobs.queue import enqueue
+from transcription.audio import DEFAULT_CHUNK_LENGTH_MS, export_audio_chunks
+from api.s3 import S3Uploader, upload_chunks_as_exported
 import subprocess
+from django.conf import settings
 from django.db import transaction
 
 # Set up logging
@@ -33,12 +37,24 @@ def safe_parse_json(json_string, default=None):
         logger.warning(f"JSON parsing failed: {str(e)}")
         return default
 
+@receiver(post_delete, sender=Transcription)
+def uncount_deleted_transcription(sender, instance, using, **kwargs):
+    """Removes a deleted transcription from its status counter, inside the deleting transaction."""
+    TranscriptionStatusCount.shift(instance.status, None, using=using)
+
+
 @receiver(post_save, sender=Transcription)
 def auto_chunk_audio(sender, instance, created, **kwargs):
-    """Chunks the audio file when a new Transcription is created."""
+    """Queues chunking of the audio file when a new Transcription is created."""
     logger.debug(f"Signal received for Transcription: {instance.id}, created: {created}, is_chunked: {instance.is_chunked}")
 
     if created and instance.audio_file and not instance.is_chunked:
+        enqueue('transcription.chunk_audio', dedupe_key=f"chunk_audio:{instance.id}", transcription_id=instance.id)
+
+
+def chunk_audio(instance):
+    """Chunks the audio file of a Transcription into AudioChunk rows."""
+    if instance.audio_file and not instance.is_chunked:
         logger.info(f"audio file type {type(instance.audio_file)}")
         try:
             # Prevent concurrent processing
@@ -47,6 +63,8 @@ def auto_chunk_audio(sender, instance, created, **kwargs):
                 if instance.is_chunked:
                     logger.debug(f"Transcription {instance.id} is already chunked. Exiting.")
                     return
+                instance.status = 'chunking'
+                instance.save(update_fields=['status'])
 
             # Check if the audio file exists
             audio_file_path = instance.audio_file.path
@@ -59,58 +77,53 @@ def auto_chunk_audio(sender, instance, created, **kwargs):
             audio_file_size = os.path.getsize(audio_file_path)
             logger.debug(f"Audio file size: {audio_file_size} bytes")
 
-            # Convert m4a to wav if needed, handle .mp3 as well
-            if audio_file_path.endswith(".m4a"):
-                wav_file_path = audio_file_path.replace(".m4a", ".wav")
-                logger.info(f"Converting {audio_file_path} to {wav_file_path} using ffmpeg...")
-                subprocess.run(["ffmpeg", "-i", audio_file_path, wav_file_path], check=True)
-                audio_file_path = wav_file_path  # Update to the new wav file
-                logger.info(f"Conversion complete. New file path: {audio_file_path}")
-            elif audio_file_path.endswith(".mp3"):
-                logger.debug("MP3 file detected, no conversion needed.")
-
-            # Load the audio file
+            # Split the audio into 2-minute chunks, exporting each one as soon as it is decoded.
+            # m4a, mp3 and other compressed uploads are decoded by ffmpeg in the same pass.
+            chunking_mode = getattr(settings, 'AUDIO_CHUNKING_MODE', 'segment')
+            chunk_length_ms = getattr(settings, 'AUDIO_CHUNK_LENGTH_MS', DEFAULT_CHUNK_LENGTH_MS)
+            logger.info(f"Chunking audio file for transcription {instance.id} from {audio_file_path} (mode: {chunking_mode})")
+
+            chunk_files = export_audio_chunks(
+                audio_file_path, getattr(settings, 'AUDIO_CHUNK_DIR', 'audio_chunks'), instance.id, chunk_length_ms, chunking_mode,
+                chunk_format=getattr(settings, 'AUDIO_CHUNK_FORMAT', 'wav'),
+                sample_rate=getattr(settings, 'AUDIO_CHUNK_SAMPLE_RATE', None),
+                channels=getattr(settings, 'AUDIO_CHUNK_CHANNELS', None),
+            )
+
+            # Upload each chunk while the next one is being exported, straight from the chunker's file
+            uploader = S3Uploader() if getattr(settings, 'S3_UPLOAD_CHUNKS', False) else None
+            if uploader:
+                chunk_files = upload_chunks_as_exported(chunk_files, uploader, instance.id)
+
             try:
-                logger.info(f"Loading audio file for transcription {instance.id} from {audio_file_path}")
-                audio = AudioSegment.from_file(audio_file_path)
-                logger.info(f"Audio loaded successfully for transcription {instance.id}, length: {len(audio)} ms")
-            except Exception as e:
-                logger.error(f"Error loading audio file {audio_file_path} for Transcription {instance.id}: {str(e)}")
-                raise
-
-            # Log the length of the audio file
-            logger.debug(f"Audio length: {len(audio)} ms")
-            logger.debug(f"Audio format : {type(audio)} format")
-
-            # Chunk the audio into 2-minute segments
-            chunk_length_ms = 2 * 60 * 1000  # Chunk size of 2 minutes
-            chunks = [audio[i:i + chunk_length_ms] for i in range(0, len(audio), chunk_length_ms)]
+                rows = [
+                    AudioChunk(transcription=instance, chunk_file=chunk_file_path, chunk_index=index)
+                    for index, chunk_file_path in chunk_files
+                ]
+            finally:
+                if uploader:
+                    stats = uploader.close()
+                    logger.info(f"Uploaded {stats['files']} chunks of transcription {instance.id} at {stats['mb_per_s']:.1f} MB/s")
+
+            # Create every AudioChunk row in a single bulk insert, in the same transaction that marks the
+            # transcription chunked, so a retried job never finds half the work done. bulk_create skips
+            # post_save, so transcription is dispatched once for the whole transcription below.
+            with transaction.atomic():
+                # Rows an earlier attempt left without marking the transcription chunked are replaced
+                AudioChunk.objects.filter(transcription=instance).delete()
+                chunks = AudioChunk.objects.bulk_create(rows)
+                TranscriptionEvent.record(instance.id, 'chunked', chunks=len(chunks))
+
+                # Mark chunking as done; the transcription completes once every chunk is transcribed
+                instance.is_chunked = True
+                instance.save(update_fields=['is_chunked'])
             logger.info(f"Created {len(chunks)} chunks for transcription {instance.id}")
+            refresh_transcription_status(instance)
+            logger.info(f"Updated transcription {instance.id} status to '{instance.status}'")
 
-            # Ensure the chunk directory exists
-            chunk_dir = "audio_chunks"
-            if not os.path.exists(chunk_dir):
-                os.makedirs(chunk_dir)
-                logger.info(f"Created directory for chunks: {chunk_dir}")
-
-            # Create an AudioChunk object for each chunk
-            for index, chunk in enumerate(chunks):
-                chunk_file_path = os.path.join(chunk_dir, f"{instance.id}_chunk_{index}.wav")
-                chunk.export(chunk_file_path, format="wav")
-                logger.debug(f"Exported chunk {index} to {chunk_file_path}")
-
-                AudioChunk.objects.create(
-                    transcription=instance,
-                    chunk_file=chunk_file_path,
-                    chunk_index=index
-                )
-                logger.info(f"Created chunk {index} in database for transcription {instance.id}")
-
-            # Update transcription status
-            instance.is_chunked = True
-            instance.status = 'completed'
-            instance.save(update_fields=['is_chunked', 'status'])
-            logger.info(f"Updated transcription {instance.id} status to 'completed'")
+            if chunks:
+                enqueue('transcription_chunks.transcribe_transcription', dedupe_key=f"transcribe_transcription:{instance.id}",
+                        transcription_id=instance.id)
 
         except FileNotFoundError as e:
             instance.status = 'failed'
@@ -120,7 +133,7 @@ def auto_chunk_audio(sender, instance, created, **kwargs):
         except subprocess.CalledProcessError as e:
             instance.status = 'failed'
             instance.save(update_fields=['status'])
-            logger.error(f"FFmpeg conversion failed for transcription {instance.id}: {str(e)}")
+            logger.error(f"FFmpeg decoding failed for transcription {instance.id}: {str(e)}")
 
         except Exception as e:
             instance.status = 'failed'
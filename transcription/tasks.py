@@ -0,0 +1,9 @@
+from jobs.queue import task
+from transcription.models import Transcription
+from transcription.signals import chunk_audio
+
+
+@task('transcription.chunk_audio', visibility_timeout=3600)
+def chunk_audio_task(transcription_id):
+    """Splits the uploaded audio of a transcription into chunks."""
+    chunk_audio(Transcription.objects.get(id=transcription_id))
@@ -1,3 +1,305 @@
-from django.test import TestCase
+import io
+import os
+import wave
+import shutil
+import tempfile
+import subprocess
+from unittest import mock, skipUnless
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from api.s3 import reset_s3_client
+from transcription.audio import CHUNK_FORMATS, export_audio_chunks, iter_audio_chunks, iter_streaming_chunks
+from transcription.models import Transcription, TranscriptionEvent, TranscriptionStatusCount
+from transcription.signals import chunk_audio
+from transcription_chunks.models import AudioChunk
+from transcription_chunks.signals import transcribe_transcription_chunks
+from jobs.models import Job
 
-# Create your tests here.
+
+def make_wav(seconds, sample_rate=16000):
+    """Returns the bytes of a silent mono 16-bit WAV file."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(b'\0\0' * sample_rate * seconds)
+    return buffer.getvalue()
+
+
+requires_ffmpeg = skipUnless(shutil.which('ffmpeg'), "ffmpeg is not installed")
+
+
+def write_wav(path, seconds, sample_rate=16000, channels=1):
+    """Writes a 16-bit WAV file of a repeating, non-silent pattern, so chunk contents can be compared."""
+    frame_count = int(sample_rate * seconds)
+    with wave.open(path, 'wb') as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(bytes(i % 251 for i in range(frame_count * channels * 2)))
+    return path
+
+
+class StreamingChunkerTests(SimpleTestCase):
+    """The streaming chunker yields the same chunks as decoding the whole file, one chunk at a time."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_wav_chunks_match_whole_file_decoding(self):
+        path = write_wav(os.path.join(self.directory, 'hearing.wav'), 2.5)
+        # A WAV that needs no resampling is read with the wave module, without starting ffmpeg
+        with mock.patch('transcription.audio.subprocess.Popen', side_effect=AssertionError("ffmpeg was started")):
+            streamed = list(iter_audio_chunks(path, 1000, 'streaming', 16000, 1))
+        in_memory = list(iter_audio_chunks(path, 1000, 'in_memory'))
+
+        self.assertEqual([len(chunk) for chunk in streamed], [1000, 1000, 500])
+        self.assertEqual([chunk.raw_data for chunk in streamed], [chunk.raw_data for chunk in in_memory])
+
+    def test_chunks_are_decoded_lazily(self):
+        path = write_wav(os.path.join(self.directory, 'hearing.wav'), 3)
+        with mock.patch('wave.Wave_read.readframes', autospec=True, side_effect=wave.Wave_read.readframes) as readframes:
+            chunks = iter_streaming_chunks(path, 1000)
+            next(chunks)
+            self.assertEqual(readframes.call_count, 1)
+            self.assertEqual(readframes.call_args.args[1], 16000)
+            chunks.close()
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            iter_audio_chunks('hearing.wav', 1000, 'everything_at_once')
+
+    @requires_ffmpeg
+    def test_ffmpeg_pipe_resamples_and_downmixes(self):
+        path = write_wav(os.path.join(self.directory, 'hearing.wav'), 2.5, sample_rate=44100, channels=2)
+        chunks = list(iter_streaming_chunks(path, 1000, sample_rate=16000, channels=1))
+        self.assertEqual([len(chunk) for chunk in chunks], [1000, 1000, 500])
+        self.assertEqual({(chunk.frame_rate, chunk.channels, chunk.sample_width) for chunk in chunks}, {(16000, 1, 2)})
+
+    def test_ffmpeg_errors_beyond_a_pipe_buffer_do_not_block(self):
+        # A stand-in ffmpeg that reports decode errors well past the ~64 KB a pipe holds, then fails
+        bin_dir = os.path.join(self.directory, 'bin')
+        os.mkdir(bin_dir)
+        with open(os.path.join(bin_dir, 'ffmpeg'), 'w') as script:
+            script.write("#!/bin/sh\nhead -c 262144 /dev/zero | tr '\\0' e >&2\nhead -c 64000 /dev/zero\nexit 1\n")
+        os.chmod(os.path.join(bin_dir, 'ffmpeg'), 0o755)
+
+        with mock.patch.dict(os.environ, {'PATH': f"{bin_dir}{os.pathsep}{os.environ['PATH']}"}), \
+                self.assertRaises(subprocess.CalledProcessError) as raised:
+            list(iter_streaming_chunks(os.path.join(self.directory, 'corrupt.m4a'), 1000, sample_rate=16000, channels=1))
+        self.assertEqual(len(raised.exception.stderr), 262144)
+
+
+class ChunkFormatTests(SimpleTestCase):
+    """Chunks are resampled to the ASR rate and written in the configured encoding."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_unknown_format(self):
+        path = write_wav(os.path.join(self.directory, 'hearing.wav'), 1)
+        with self.assertRaises(ValueError):
+            list(export_audio_chunks(path, self.directory, 'test', 1000, chunk_format='mp3'))
+
+    @requires_ffmpeg
+    def test_every_format_is_written_at_the_target_rate(self):
+        path = write_wav(os.path.join(self.directory, 'hearing.wav'), 2, sample_rate=44100, channels=2)
+        magic = {'wav': b'RIFF', 'flac': b'fLaC', 'opus': b'OggS'}
+        for chunk_format in CHUNK_FORMATS:
+            with self.subTest(chunk_format=chunk_format):
+                chunk_dir = os.path.join(self.directory, chunk_format)
+                chunk_files = list(export_audio_chunks(path, chunk_dir, 'test', 1000, chunk_format=chunk_format,
+                                                       sample_rate=16000, channels=1))
+                self.assertEqual([index for index, _ in chunk_files], [0, 1])
+                for _, chunk_file in chunk_files:
+                    self.assertTrue(chunk_file.endswith('.' + CHUNK_FORMATS[chunk_format]['extension']))
+                    with open(chunk_file, 'rb') as f:
+                        self.assertEqual(f.read(4), magic[chunk_format])
+                probe = subprocess.run(["ffmpeg", "-nostdin", "-i", chunk_files[0][1]], capture_output=True, text=True).stderr
+                # Opus always decodes at 48 kHz; the others keep the rate they were encoded at
+                rate = 48000 if chunk_format == 'opus' else 16000
+                self.assertRegex(probe, rf"Audio: \w+.*, {rate} Hz, mono")
+
+
+class ChunkingQueryCountTests(TestCase):
+    """Chunking and transcribing a recording must cost O(chunks) database round-trips."""
+
+    chunk_length_ms = 1000
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            AUDIO_CHUNK_DIR=os.path.join(self.media_root, 'audio_chunks'),
+            AUDIO_CHUNK_LENGTH_MS=self.chunk_length_ms,
+            AUDIO_CHUNK_FORMAT='wav',
+            AUDIO_CHUNK_SAMPLE_RATE=16000,
+            AUDIO_CHUNK_CHANNELS=1,
+            AUDIO_CHUNKING_MODE='streaming',
+            JOBS_RUN_INLINE=False,
+        )
+        self.settings_override.enable()
+        self.asr_patch = mock.patch(
+            'transcription_chunks.signals.transcribe_audio_with_words',
+            return_value={'text': "chunk text", 'words': [], 'requests': 1},
+        )
+        self.asr_patch.start()
+
+    def tearDown(self):
+        self.asr_patch.stop()
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def run_pipeline(self, chunk_count):
+        """Returns (chunking queries, transcription queries) for a recording of chunk_count chunks."""
+        transcription = Transcription.objects.create(
+            audio_file=ContentFile(make_wav(chunk_count), name=f"{chunk_count}.wav")
+        )
+
+        with CaptureQueriesContext(connection) as chunking:
+            chunk_audio(Transcription.objects.get(id=transcription.id))
+        self.assertEqual(AudioChunk.objects.filter(transcription=transcription).count(), chunk_count)
+
+        with CaptureQueriesContext(connection) as transcribing:
+            transcribe_transcription_chunks(Transcription.objects.get(id=transcription.id))
+        self.assertFalse(AudioChunk.objects.filter(transcription=transcription, status='pending').exists())
+
+        return len(chunking.captured_queries), len(transcribing.captured_queries)
+
+    def test_chunking_is_a_single_bulk_step(self):
+        small, _ = self.run_pipeline(2)
+        large, _ = self.run_pipeline(8)
+        self.assertEqual(small, large)
+
+    def test_chunk_creation_queues_one_dispatch_per_transcription(self):
+        self.run_pipeline(5)
+        self.assertEqual(Job.objects.filter(name='transcription_chunks.transcribe_transcription').count(), 1)
+
+    def test_retried_chunking_creates_one_set_of_chunks(self):
+        transcription = Transcription.objects.create(audio_file=ContentFile(make_wav(3), name="3.wav"))
+        # Left by an attempt that died after inserting chunks but before marking the transcription chunked
+        AudioChunk.objects.create(transcription=transcription, chunk_file='audio_chunks/stale.wav', chunk_index=0)
+
+        record = TranscriptionEvent.record
+
+        def die_after_inserting_chunks(transcription_id, kind, **fields):
+            if kind == 'chunked':
+                raise RuntimeError("worker killed")
+            return record(transcription_id, kind, **fields)
+
+        with mock.patch.object(TranscriptionEvent, 'record', side_effect=die_after_inserting_chunks):
+            chunk_audio(Transcription.objects.get(id=transcription.id))
+        self.assertFalse(Transcription.objects.get(id=transcription.id).is_chunked)
+        self.assertEqual(list(AudioChunk.objects.filter(transcription=transcription).values_list('chunk_file', flat=True)),
+                         ['audio_chunks/stale.wav'])
+
+        chunk_audio(Transcription.objects.get(id=transcription.id))
+        self.assertTrue(Transcription.objects.get(id=transcription.id).is_chunked)
+        self.assertEqual(sorted(AudioChunk.objects.filter(transcription=transcription).values_list('chunk_index', flat=True)), [0, 1, 2])
+
+    def test_chunks_upload_as_they_are_exported(self):
+        fake_root = os.path.join(self.media_root, 's3')
+        with self.settings(S3_UPLOAD_CHUNKS=True, S3_FAKE_ROOT=fake_root, AWS_STORAGE_BUCKET_NAME='artifacts'):
+            reset_s3_client()
+            self.addCleanup(reset_s3_client)
+            transcription = Transcription.objects.create(audio_file=ContentFile(make_wav(3), name="3.wav"))
+            chunk_audio(Transcription.objects.get(id=transcription.id))
+        uploaded = os.path.join(fake_root, 'artifacts', 'transcriptions', str(transcription.id), 'chunks')
+        for chunk in AudioChunk.objects.filter(transcription=transcription):
+            with open(chunk.chunk_file.path, 'rb') as exported, open(os.path.join(uploaded, os.path.basename(chunk.chunk_file.name)), 'rb') as stored:
+                self.assertEqual(exported.read(), stored.read())
+        self.assertEqual(len(os.listdir(uploaded)), 3)
+
+    def test_transcription_queries_grow_linearly(self):
+        counts = {n: self.run_pipeline(n)[1] for n in (2, 4, 8)}
+        per_chunk = (counts[4] - counts[2]) / 2
+        self.assertEqual(counts[8] - counts[4], per_chunk * 4)
+        self.assertLessEqual(per_chunk, 10)
+
+
+@override_settings(JOBS_RUN_INLINE=False, AUDIO_CHUNKING_MODE='segment', AUDIO_CHUNK_LENGTH_MS=1000,
+                   AUDIO_CHUNK_FORMAT='wav', AUDIO_CHUNK_SAMPLE_RATE=16000, AUDIO_CHUNK_CHANNELS=1)
+class SegmentChunkingTests(TestCase):
+    """Compressed uploads are decoded, resampled and split by one ffmpeg pass, with no WAV copy left behind."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media_override = override_settings(MEDIA_ROOT=self.media_root, AUDIO_CHUNK_DIR=os.path.join(self.media_root, 'audio_chunks'))
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+
+    @requires_ffmpeg
+    def test_m4a_upload_is_segmented_in_one_pass(self):
+        source = os.path.join(self.media_root, 'source.wav')
+        with open(source, 'wb') as f:
+            f.write(make_wav(3, sample_rate=44100))
+        m4a = os.path.join(self.media_root, 'hearing.m4a')
+        subprocess.run(["ffmpeg", "-nostdin", "-loglevel", "error", "-i", source, "-c:a", "aac", m4a], check=True)
+        with open(m4a, 'rb') as f:
+            transcription = Transcription.objects.create(audio_file=ContentFile(f.read(), name="hearing.m4a"))
+        os.remove(source)
+        os.remove(m4a)
+
+        chunk_audio(Transcription.objects.get(id=transcription.id))
+
+        # AAC padding can leave a few milliseconds for a last, short chunk
+        durations = []
+        for chunk in AudioChunk.objects.filter(transcription=transcription).order_by('chunk_index'):
+            with wave.open(chunk.chunk_file.path, 'rb') as wav_file:
+                self.assertEqual((wav_file.getframerate(), wav_file.getnchannels()), (16000, 1))
+                durations.append(wav_file.getnframes() / 16000)
+        self.assertEqual(len(durations[:3]), 3)
+        for duration in durations[:3]:
+            self.assertAlmostEqual(duration, 1, delta=0.05)
+        self.assertAlmostEqual(sum(durations), 3, delta=0.1)
+        upload_dir = os.path.dirname(Transcription.objects.get(id=transcription.id).audio_file.path)
+        self.assertEqual([name for name in os.listdir(upload_dir) if name.endswith('.wav')], [])
+
+    def test_ffmpeg_failure_fails_the_transcription(self):
+        transcription = Transcription.objects.create(audio_file=ContentFile(b"not audio", name="broken.m4a"))
+        chunk_audio(Transcription.objects.get(id=transcription.id))
+        self.assertEqual(Transcription.objects.get(id=transcription.id).status, 'failed')
+        self.assertFalse(AudioChunk.objects.filter(transcription=transcription).exists())
+
+
+@override_settings(JOBS_RUN_INLINE=False)
+class StatusCountTests(TestCase):
+    """Status counters follow every create, transition and delete, and reconciliation repairs drift."""
+
+    def test_counters_follow_transitions(self):
+        first = Transcription.objects.create()
+        second = Transcription.objects.create()
+        first.status = 'in_progress'
+        first.save(update_fields=['status'])
+        second.case_name = "Not a status change"
+        second.save()
+
+        # A stale instance must not move the transcription out of a status it already left
+        stale = Transcription.objects.get(id=first.id)
+        first.status = 'completed'
+        first.save()
+        stale.status = 'completed'
+        stale.save()
+        second.delete()
+
+        counts = TranscriptionStatusCount.counts()
+        self.assertEqual(set(counts), {status for status, _ in Transcription.STATUS_CHOICES})
+        self.assertEqual(counts, {'pending': 0, 'chunking': 0, 'in_progress': 0, 'completed': 1, 'failed': 0})
+        self.assertEqual(self.client.get('/api/transcriptions/transcription_status_counts/').json(), counts)
+
+    def test_reconcile_repairs_drift(self):
+        Transcription.objects.create()
+        Transcription.objects.bulk_create([Transcription(status='failed'), Transcription(status='failed')])
+        self.assertEqual(TranscriptionStatusCount.counts()['failed'], 0)
+
+        call_command('reconcile_status_counts', stdout=io.StringIO())
+        counts = TranscriptionStatusCount.counts()
+        self.assertEqual((counts['pending'], counts['failed']), (1, 2))
+        self.assertEqual(TranscriptionStatusCount.reconcile(), {})
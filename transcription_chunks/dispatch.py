@@ -0,0 +1,176 @@
+import time
+import asyncio
+import logging
+import weakref
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Allows at most `requests_per_minute` acquisitions in any rolling 60 second window."""
+
+    window = 60.0
+
+    def __init__(self, requests_per_minute, clock=time.monotonic, sleep=time.sleep):
+        self.requests_per_minute = requests_per_minute
+        self.clock = clock
+        self.sleep = sleep
+        self.calls = deque()
+        self.lock = threading.Lock()
+
+    def _reserve(self):
+        """Takes a slot in the window and returns None, or returns how long to wait for one."""
+        with self.lock:
+            now = self.clock()
+            while self.calls and now - self.calls[0] >= self.window:
+                self.calls.popleft()
+            if len(self.calls) < self.requests_per_minute:
+                self.calls.append(now)
+                return None
+            return self.window - (now - self.calls[0])
+
+    def acquire(self):
+        if not self.requests_per_minute:
+            return
+        while True:
+            wait = self._reserve()
+            if wait is None:
+                return
+            logger.debug(f"Rate limit reached, waiting {wait:.2f} seconds")
+            self.sleep(wait)
+
+    async def acquire_async(self):
+        """acquire() for coroutines: waits for a slot without blocking the event loop."""
+        if not self.requests_per_minute:
+            return
+        while True:
+            wait = self._reserve()
+            if wait is None:
+                return
+            logger.debug(f"Rate limit reached, waiting {wait:.2f} seconds")
+            await asyncio.sleep(wait)
+
+
+class ProviderLimiter:
+    """Caps in-flight requests and requests per minute for one ASR provider.
+
+    Use `with limiter:` from threads and `async with limiter:` from coroutines. Both share the
+    requests-per-minute budget; threads and each event loop get their own `concurrency` slots.
+    """
+
+    def __init__(self, name, concurrency=4, requests_per_minute=None):
+        self.name = name
+        self.concurrency = max(int(concurrency), 1)
+        self.semaphore = threading.BoundedSemaphore(self.concurrency)
+        self.rate_limiter = RateLimiter(requests_per_minute)
+        self.loop_semaphores = weakref.WeakKeyDictionary()
+
+    def __enter__(self):
+        self.semaphore.acquire()
+        try:
+            self.rate_limiter.acquire()
+        except BaseException:
+            self.semaphore.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.semaphore.release()
+
+    def _loop_semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self.loop_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self.loop_semaphores[loop] = asyncio.BoundedSemaphore(self.concurrency)
+        return semaphore
+
+    async def __aenter__(self):
+        semaphore = self._loop_semaphore()
+        await semaphore.acquire()
+        try:
+            await self.rate_limiter.acquire_async()
+        except BaseException:
+            semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._loop_semaphore().release()
+
+
+# One limiter per provider per process, so concurrent dispatches share the same budget
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_provider_limiter(provider):
+    with _limiters_lock:
+        if provider not in _limiters:
+            limits = getattr(settings, 'ASR_PROVIDER_LIMITS', {}).get(provider, {})
+            _limiters[provider] = ProviderLimiter(
+                provider,
+                concurrency=limits.get('concurrency', 4),
+                requests_per_minute=limits.get('requests_per_minute'),
+            )
+        return _limiters[provider]
+
+
+def _iter_threads(func, items, max_workers):
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="asr-dispatch") as executor:
+        futures = {executor.submit(func, item): index for index, item in enumerate(items)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+POOLS = {
+    'thread': _iter_threads,
+}
+
+
+def dispatch_as_completed(func, items, provider='openai', pool=None, acquire_limiter=True):
+    """Calls func(item) for every item concurrently within the provider's limits.
+
+    Yields (index, result) pairs in the calling thread as each call finishes, so results can be
+    saved one by one. Exceptions raised by func are yielded in place of the result rather than
+    propagated. With acquire_limiter=False, func takes the provider limiter itself around each
+    request it makes, e.g. so that its retries also count against the request window.
+    """
+    items = list(items)
+    if not items:
+        return
+
+    pool = pool or getattr(settings, 'ASR_DISPATCH_POOL', 'thread')
+    try:
+        runner = POOLS[pool]
+    except KeyError:
+        raise ValueError(f"Unknown dispatch pool '{pool}'. Expected one of: {', '.join(POOLS)}")
+
+    limiter = get_provider_limiter(provider)
+
+    def call(item):
+        try:
+            if not acquire_limiter:
+                return func(item)
+            with limiter:
+                return func(item)
+        except Exception as e:
+            logger.error(f"{provider} request failed: {e}")
+            return e
+
+    start_time = time.monotonic()
+    yield from runner(call, items, limiter.concurrency)
+    logger.info(f"Dispatched {len(items)} {provider} requests with concurrency {limiter.concurrency} "
+                f"in {time.monotonic() - start_time:.2f} seconds")
+
+
+def dispatch(func, items, provider='openai', pool=None, acquire_limiter=True):
+    """dispatch_as_completed, collected into a list in the same order as `items`."""
+    items = list(items)
+    results = [None] * len(items)
+    for index, result in dispatch_as_completed(func, items, provider, pool, acquire_limiter):
+        results[index] = result
+    return results
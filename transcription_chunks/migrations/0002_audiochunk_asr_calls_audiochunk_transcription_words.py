@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transcription_chunks", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="audiochunk",
+            name="asr_calls",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="audiochunk",
+            name="transcription_words",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        (
+            "transcription_chunks",
+            "0002_audiochunk_asr_calls_audiochunk_transcription_words",
+        ),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="audiochunk",
+            index=models.Index(
+                fields=["transcription", "status", "chunk_index"],
+                name="audiochunk_txn_status_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="audiochunk",
+            index=models.Index(
+                condition=models.Q(("transcription_text__isnull", False)),
+                fields=["transcription", "chunk_index"],
+                name="audiochunk_transcribed_idx",
+            ),
+        ),
+    ]
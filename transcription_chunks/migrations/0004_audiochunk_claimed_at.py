@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("transcription_chunks", "0003_audiochunk_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="audiochunk",
+            name="claimed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
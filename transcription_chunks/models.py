@@ -6,9 +6,24 @@ class AudioChunk(models.Model):
     chunk_file = models.FileField(upload_to='audio_chunks/')
     chunk_index = models.IntegerField()
     transcription_text = models.TextField(blank=True, null=True)
+    transcription_words = models.JSONField(blank=True, null=True)  # [{"word", "start", "end"}] from Whisper
+    asr_calls = models.PositiveIntegerField(default=0)  # speech-to-text requests spent on this chunk
     diarization_data = models.TextField(blank=True, null=True) 
     status = models.CharField(max_length=20, default='pending')  
+    claimed_at = models.DateTimeField(blank=True, null=True)  # when a transcription job last claimed the chunk
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Chunks of a transcription by status, in chunk order (dispatch, completion and join checks)
+            models.Index(fields=['transcription', 'status', 'chunk_index'], name='audiochunk_txn_status_idx'),
+            # Transcribed chunks in chunk order, read whenever the transcript is assembled
+            models.Index(
+                fields=['transcription', 'chunk_index'],
+                condition=models.Q(transcription_text__isnull=False),
+                name='audiochunk_transcribed_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"Chunk {self.chunk_index} for {self.transcription}"
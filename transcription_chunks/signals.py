@@ -1,28 +1,50 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from transcription.models import TranscriptionEvent
 from transcription_chunks.models import AudioChunk
-from api.utils import transcribe_audio_with_retry, diarize_audio_with_retry, format_diarization
+from transcription_chunks.dispatch import dispatch_as_completed, get_provider_limiter
+from api.utils import transcribe_audio_with_words, diarize_audio_with_retry, format_diarization
+from datetime import timedelta
 from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.conf import settings
+from jobs.queue import TASKS, enqueue
 
 
 
 
-# Function to append chunk transcription to the parent Transcription model
-def append_to_transcription(transcription, chunk_text):
-    """Appends chunk text to the parent Transcription model."""
-    if transcription.transcription_text:
-        # Append the new chunk transcription to the existing transcription text
-        transcription.transcription_text += "\n" + chunk_text
+def chunk_texts(transcription):
+    """Yields the transcribed text of each chunk in chunk_index order, skipping chunks without text."""
+    return AudioChunk.objects.filter(transcription=transcription, transcription_text__isnull=False) \
+        .exclude(transcription_text='').order_by('chunk_index').values_list('transcription_text', flat=True).iterator()
+
+
+def build_transcript(transcription):
+    """Joins the text of every transcribed chunk so far, in chunk_index order."""
+    return "\n".join(chunk_texts(transcription))
+
+
+def save_transcription_result(chunk, result):
+    """Stores the ASR result on a chunk: its text, word timestamps and how many ASR requests it took."""
+    if result and result['text']:
+        chunk.transcription_text = result['text']
+        chunk.transcription_words = result['words']
+        chunk.asr_calls = F('asr_calls') + result['requests']
+        chunk.status = 'completed'
+        print(f"Transcription successful for chunk {chunk.chunk_index}")
     else:
-        # If no transcription text exists yet, start with the first chunk
-        transcription.transcription_text = chunk_text
+        chunk.status = 'failed'
+        print(f"Transcription failed for chunk {chunk.chunk_index}")
+
+    # Save the updated chunk status and transcription text to the database
+    chunk.save(update_fields=['transcription_text', 'transcription_words', 'asr_calls', 'status'])
+    print(f"Chunk {chunk.chunk_index} saved with status: {chunk.status}")
 
-    transcription.save(update_fields=['transcription_text'])
-    print(f"Updated Transcription ID {transcription.id} with new chunk.")
 
 # Function to transcribe individual chunks
 def transcribe_chunk(chunk):
-    """Transcribe a single chunk with retry mechanism and update parent Transcription model."""
+    """Transcribe a single chunk with retry mechanism and store the text on the chunk."""
     print(f"Attempting to transcribe chunk {chunk.chunk_index}") 
 
     if chunk.chunk_file and chunk.status == 'pending':
@@ -33,73 +55,128 @@ def transcribe_chunk(chunk):
                 chunk.save(update_fields=['status'])
 
                 # Transcribe the chunk using retry logic
-                transcription_text = transcribe_audio_with_retry(chunk.chunk_file.path)
+                save_transcription_result(chunk, transcribe_audio_with_words(chunk.chunk_file.path))
+
+        except Exception as e:
+            chunk.status = 'failed'
+            chunk.save(update_fields=['status'])
+            print(f"Error processing audio chunk {chunk.chunk_index}: {e}")
+
+    # Checking if all chunks are completed
+    refresh_transcription_status(chunk.transcription)
+
+
+def claim_timeout():
+    """Seconds after which a chunk claimed by a transcribe_transcription job counts as abandoned: the job's lease."""
+    handler = TASKS.get('transcription_chunks.transcribe_transcription')
+    return handler.visibility_timeout if handler else getattr(settings, 'JOBS_VISIBILITY_TIMEOUT', 900)
+
 
-                if transcription_text:
-                    chunk.transcription_text = transcription_text
-                    chunk.status = 'completed'
-                    print(f"Transcription successful for chunk {chunk.chunk_index}") 
+def claimable_chunks(now):
+    """Pending chunks, and chunks whose claim is older than the job lease (or predates claimed_at)."""
+    expired = Q(claimed_at__lt=now - timedelta(seconds=claim_timeout())) | Q(claimed_at__isnull=True)
+    return Q(status='pending') | (Q(status='processing') & expired)
 
-                    # Append the chunk's transcribed text to the parent Transcription model
-                    append_to_transcription(chunk.transcription, transcription_text)
-                else:
-                    chunk.status = 'failed'
-                    print(f"Transcription failed for chunk {chunk.chunk_index}") 
 
-                # Save the updated chunk status and transcription text to the database
-                chunk.save(update_fields=['transcription_text', 'status'])
-                print(f"Chunk {chunk.chunk_index} saved with status: {chunk.status}") 
+def seconds_until_claims_expire(transcription):
+    """Seconds until the next chunk held by another job may be claimed again, or None if no chunk is held."""
+    claimed_at = AudioChunk.objects.filter(transcription=transcription, status='processing', claimed_at__isnull=False) \
+        .order_by('claimed_at').values_list('claimed_at', flat=True).first()
+    if claimed_at is None:
+        return None
+    return max((claimed_at + timedelta(seconds=claim_timeout()) - timezone.now()).total_seconds(), 0) + 1
 
+
+def transcribe_transcription_chunks(transcription):
+    """Transcribe all pending chunks of a transcription concurrently, saving each result as soon as it arrives.
+
+    Chunks still 'processing' under a claim older than the job's lease were left by a worker that
+    died or lost its lease, and are claimed again.
+    """
+    now = timezone.now()
+    claimable = claimable_chunks(now)
+    chunks = []
+    for chunk in AudioChunk.objects.filter(claimable, transcription=transcription).order_by('chunk_index'):
+        # Claim each chunk so another worker dispatching the same transcription skips it
+        if chunk.chunk_file and AudioChunk.objects.filter(claimable, id=chunk.id).update(status='processing', claimed_at=now):
+            chunk.status = 'processing'
+            chunks.append(chunk)
+
+    print(f"Dispatching {len(chunks)} chunks of transcription {transcription.id}")
+    limiter = get_provider_limiter('openai')
+    results = dispatch_as_completed(lambda chunk: transcribe_audio_with_words(chunk.chunk_file.path, limiter=limiter), chunks,
+                                    provider='openai', acquire_limiter=False)
+
+    for index, result in results:
+        chunk = chunks[index]
+        try:
+            save_transcription_result(chunk, None if isinstance(result, Exception) else result)
         except Exception as e:
             chunk.status = 'failed'
             chunk.save(update_fields=['status'])
             print(f"Error processing audio chunk {chunk.chunk_index}: {e}")
 
-    # Checking if all chunks are completed
-    incomplete_chunks = AudioChunk.objects.filter(transcription=chunk.transcription, status__in=['pending', 'processing']).exists()
-    if not incomplete_chunks:
-        chunk.transcription.status = 'completed'
-        chunk.transcription.save(update_fields=['status'])
-        print(f"Transcription {chunk.transcription.id} marked as completed.")
+    refresh_transcription_status(transcription)
+
+
+def refresh_transcription_status(transcription):
+    """Marks a transcription completed once it is fully chunked and no chunk is left to transcribe.
+
+    The full transcript is written to the Transcription exactly once, at completion.
+    """
+    transcription.refresh_from_db(fields=['is_chunked'])
+    incomplete_chunks = AudioChunk.objects.filter(transcription=transcription, status__in=['pending', 'processing']).exists()
+    if transcription.is_chunked and not incomplete_chunks:
+        transcription.transcription_text = build_transcript(transcription)
+        transcription.status = 'completed'
+        transcription.save(update_fields=['transcription_text', 'status'])
+        print(f"Transcription {transcription.id} marked as completed.")
     else:
-        chunk.transcription.status = 'in_progress'
-        chunk.transcription.save(update_fields=['status'])
-        print(f"Transcription {chunk.transcription.id} is still in progress.")
+        transcription.status = 'in_progress'
+        transcription.save(update_fields=['status'])
+        print(f"Transcription {transcription.id} is still in progress.")
 
 
 # Signal to handle audio chunk creation and trigger transcription
 @receiver(post_save, sender=AudioChunk)
 def auto_transcribe_chunk(sender, instance, created, **kwargs):
-    """Signal to transcribe chunk when a new AudioChunk is created."""
+    """Signal to queue transcription of a chunk when a new AudioChunk is created."""
     print(f"Signal received for AudioChunk: {instance.chunk_index}") 
 
     if created:
-        chunks = AudioChunk.objects.filter(transcription=instance.transcription, status='pending')
+        # One job dispatches every pending chunk of the transcription concurrently
+        enqueue('transcription_chunks.transcribe_transcription', dedupe_key=f"transcribe_transcription:{instance.transcription_id}",
+                transcription_id=instance.transcription_id)
 
-        for chunk in chunks:
-            transcribe_chunk(chunk)
-
-        # Checking if all chunks for the transcription have been completed
-        incomplete_chunks = AudioChunk.objects.filter(transcription=instance.transcription, status__in=['pending', 'processing']).exists()
-        
-        if not incomplete_chunks:
-            # If no incomplete chunks, mark the transcription as completed
-            instance.transcription.status = 'completed'
-            instance.transcription.save(update_fields=['status'])
-            print(f"Transcription {instance.transcription.id} marked as completed.")
 
+CHUNK_STATUS_EVENTS = {'completed': 'chunk_transcribed', 'diarized': 'chunk_diarized', 'failed': 'chunk_failed'}
 
 
+@receiver(post_save, sender=AudioChunk)
+def record_chunk_progress(sender, instance, created, update_fields=None, using=None, **kwargs):
+    """Records a progress event when a chunk is transcribed, diarized or fails."""
+    if created or not update_fields or 'status' not in update_fields:
+        return
+    kind = CHUNK_STATUS_EVENTS.get(instance.status)
+    if kind:
+        TranscriptionEvent.record(instance.transcription_id, kind, chunk_index=instance.chunk_index, using=using)
 
 
 @receiver(post_save, sender=AudioChunk)
 def auto_diarize_chunk(sender, instance, created, **kwargs):
-    """Signal to diarize a chunk when transcription is completed."""
+    """Signal to queue diarization of a chunk when its transcription is completed."""
+    if instance.status == 'completed' and instance.chunk_file:
+        enqueue('transcription_chunks.diarize_chunk', dedupe_key=f"diarize_chunk:{instance.id}", chunk_id=instance.id)
+
+
+def diarize_chunk(instance):
+    """Diarizes a transcribed chunk and stores the formatted speaker text on it."""
     if instance.status == 'completed' and instance.chunk_file:
         try:
             print(f"Performing diarization for chunk {instance.chunk_index} of transcription {instance.transcription.id}")
             
-            diarization_data = diarize_audio_with_retry(instance.chunk_file.path)
+            # Reuse the chunk's Whisper output instead of transcribing the audio a second time
+            diarization_data = diarize_audio_with_retry(instance.chunk_file.path, instance.transcription_text, instance.transcription_words)
             
             if diarization_data:
                 # Now move into transaction block after diarization is successful
@@ -0,0 +1,27 @@
+from jobs.queue import Retry, task
+from transcription_chunks.models import AudioChunk
+from transcription.models import Transcription
+from transcription_chunks.signals import diarize_chunk, seconds_until_claims_expire, transcribe_chunk, transcribe_transcription_chunks
+
+
+@task('transcription_chunks.transcribe_chunk')
+def transcribe_chunk_task(chunk_id):
+    """Transcribes a single audio chunk with Whisper."""
+    transcribe_chunk(AudioChunk.objects.get(id=chunk_id))
+
+
+@task('transcription_chunks.transcribe_transcription', visibility_timeout=3600)
+def transcribe_transcription_task(transcription_id):
+    """Transcribes every pending chunk of a transcription through the concurrent dispatcher."""
+    transcription = Transcription.objects.get(id=transcription_id)
+    transcribe_transcription_chunks(transcription)
+    # Chunks another job still holds are picked up here once its claim expires, should that job die
+    wait = seconds_until_claims_expire(transcription)
+    if wait is not None:
+        raise Retry(f"Chunks of transcription {transcription_id} are claimed by another job", countdown=wait)
+
+
+@task('transcription_chunks.diarize_chunk')
+def diarize_chunk_task(chunk_id):
+    """Diarizes a single transcribed audio chunk."""
+    diarize_chunk(AudioChunk.objects.get(id=chunk_id))
@@ -1,3 +1,214 @@
-from django.test import TestCase
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from api.metrics import ASR_REQUESTS
+from api.utils import transcribe_audio_with_words
+from jobs.queue import Retry
+from transcription.models import Transcription
+from transcription_chunks.models import AudioChunk
+from transcription_chunks import signals
+from transcription_chunks.dispatch import ProviderLimiter, RateLimiter, dispatch
+from transcription_chunks.signals import diarize_chunk, refresh_transcription_status, save_transcription_result, transcribe_transcription_chunks
+from transcription_chunks.tasks import transcribe_transcription_task
 
-# Create your tests here.
+
+class FakeDiarization:
+    """Stands in for a pyannote Annotation with two speaker turns."""
+
+    turns = [(0.0, 1.0, 'SPEAKER_00'), (1.0, 2.0, 'SPEAKER_01')]
+
+    def itertracks(self, yield_label=False):
+        for start, end, speaker in self.turns:
+            yield SimpleNamespace(start=start, end=end), None, speaker
+
+    def get_timeline(self):
+        return SimpleNamespace(extent=lambda: SimpleNamespace(duration=2.0))
+
+
+WHISPER_RESPONSE = {
+    'text': "good morning my lord",
+    'words': [
+        {'word': 'good', 'start': 0.1, 'end': 0.3},
+        {'word': 'morning', 'start': 0.4, 'end': 0.8},
+        {'word': 'my', 'start': 1.1, 'end': 1.2},
+        {'word': 'lord', 'start': 1.3, 'end': 1.6},
+    ],
+}
+
+
+class SingleASRCallTests(TestCase):
+    """Each chunk costs exactly one speech-to-text request, shared by transcription and diarization."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, JOBS_RUN_INLINE=False)
+        self.settings_override.enable()
+        ASR_REQUESTS.reset()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_diarization_reuses_chunk_transcription(self):
+        transcription = Transcription.objects.create(is_chunked=True)
+        for index in range(3):
+            chunk = AudioChunk(transcription=transcription, chunk_index=index)
+            chunk.chunk_file.save(f"chunk_{index}.wav", ContentFile(b"RIFF"), save=False)
+            chunk.save()
+
+        with mock.patch('api.utils.openai.Audio.transcribe', return_value=WHISPER_RESPONSE) as whisper, \
+                mock.patch('api.utils.get_diarization_pipeline', return_value=lambda path: FakeDiarization()):
+            transcribe_transcription_chunks(transcription)
+            for chunk in AudioChunk.objects.filter(transcription=transcription):
+                diarize_chunk(chunk)
+
+        self.assertEqual(whisper.call_count, 3)
+        self.assertEqual(ASR_REQUESTS.value(provider='openai', model='whisper-1'), 3)
+        for chunk in AudioChunk.objects.filter(transcription=transcription):
+            self.assertEqual(chunk.status, 'diarized')
+            self.assertEqual(chunk.asr_calls, 1)
+            self.assertEqual(chunk.transcription_words, WHISPER_RESPONSE['words'])
+
+
+class ProviderLimiterTests(SimpleTestCase):
+    """Requests stay within the provider's per-minute window, and retries give up their slot while backing off."""
+
+    def test_rolling_window(self):
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        limiter = RateLimiter(2, clock=lambda: now[0], sleep=sleep)
+        limiter.acquire()
+        now[0] = 10.0
+        limiter.acquire()
+        limiter.acquire()
+        # The third request waits until the first leaves the 60 second window
+        self.assertEqual(sleeps, [50.0])
+        self.assertEqual(now[0], 60.0)
+
+    def test_each_retry_takes_the_limiter_and_sleeps_outside_it(self):
+        limiter = ProviderLimiter('openai', concurrency=1, requests_per_minute=100)
+        held_while_sleeping = []
+        with tempfile.NamedTemporaryFile(suffix='.wav') as audio, \
+                mock.patch('api.utils.openai.Audio.transcribe', side_effect=[ValueError("429"), ValueError("429"), WHISPER_RESPONSE]), \
+                mock.patch('api.utils.time.sleep', side_effect=lambda seconds: held_while_sleeping.append(limiter.semaphore._value == 0)):
+            result = transcribe_audio_with_words(audio.name, limiter=limiter)
+
+        self.assertEqual(result['requests'], 3)
+        self.assertEqual(held_while_sleeping, [False, False])
+        self.assertEqual(len(limiter.rate_limiter.calls), 3)
+        self.assertEqual(limiter.semaphore._value, 1)
+
+    def test_dispatch_keeps_item_order_and_rejects_unknown_pools(self):
+        results = dispatch(lambda item: 1 / item, [1, 0, 4], provider='openai', pool='thread')
+        self.assertEqual(results[0], 1.0)
+        self.assertIsInstance(results[1], ZeroDivisionError)
+        self.assertEqual(results[2], 0.25)
+        with self.assertRaises(ValueError):
+            dispatch(str, [1], pool='async')
+
+
+class ChunkClaimTests(TestCase):
+    """Chunk results are saved as they arrive, and chunks left 'processing' by a dead job are claimed again."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, JOBS_RUN_INLINE=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.transcription = Transcription.objects.create(is_chunked=True)
+
+    def make_chunk(self, index, **fields):
+        chunk = AudioChunk(transcription=self.transcription, chunk_index=index, **fields)
+        chunk.chunk_file.save(f"chunk_{index}.wav", ContentFile(b"RIFF"), save=False)
+        chunk.save()
+        return chunk
+
+    def test_results_are_saved_as_they_arrive(self):
+        for index in range(2):
+            self.make_chunk(index)
+        first_saved = threading.Event()
+        waited = []
+
+        def whisper(model, file, **kwargs):
+            # Chunk 1 answers only once chunk 0's result is in the database
+            if file.name.endswith('chunk_1.wav'):
+                waited.append(first_saved.wait(5))
+            return WHISPER_RESPONSE
+
+        def save(chunk, result):
+            save_transcription_result(chunk, result)
+            first_saved.set()
+
+        save_transcription_result = signals.save_transcription_result
+        with mock.patch('api.utils.openai.Audio.transcribe', side_effect=whisper), \
+                mock.patch('transcription_chunks.signals.save_transcription_result', side_effect=save):
+            transcribe_transcription_chunks(self.transcription)
+
+        self.assertEqual(waited, [True])
+        self.assertEqual(set(AudioChunk.objects.values_list('status', flat=True)), {'completed'})
+
+    def test_abandoned_claims_are_reclaimed(self):
+        stale = self.make_chunk(0, status='processing', claimed_at=timezone.now() - timedelta(hours=2))
+        held = self.make_chunk(1, status='processing', claimed_at=timezone.now())
+        pending = self.make_chunk(2)
+
+        with mock.patch('api.utils.openai.Audio.transcribe', return_value=WHISPER_RESPONSE) as whisper, \
+                self.assertRaises(Retry) as retry:
+            transcribe_transcription_task(transcription_id=self.transcription.id)
+
+        self.assertEqual(whisper.call_count, 2)
+        self.assertEqual(AudioChunk.objects.get(id=stale.id).status, 'completed')
+        self.assertEqual(AudioChunk.objects.get(id=pending.id).status, 'completed')
+        # The live claim is left to its job; this one comes back once that claim would have expired
+        self.assertEqual(AudioChunk.objects.get(id=held.id).status, 'processing')
+        self.assertGreater(retry.exception.countdown, 3000)
+        self.transcription.refresh_from_db()
+        self.assertEqual(self.transcription.status, 'in_progress')
+
+
+@override_settings(JOBS_RUN_INLINE=False)
+class TranscriptAssemblyTests(TestCase):
+    """The transcript is joined in chunk_index order, whatever order chunks finish in, and written once."""
+
+    def test_out_of_order_chunks_assemble_in_index_order(self):
+        transcription = Transcription.objects.create(is_chunked=True)
+        chunks = [AudioChunk.objects.create(transcription=transcription, chunk_index=index, chunk_file=f"chunk_{index}.wav")
+                  for index in range(3)]
+
+        for index in (2, 0):
+            save_transcription_result(chunks[index], {'text': f"part {index}", 'words': [], 'requests': 1})
+            refresh_transcription_status(transcription)
+        transcription.refresh_from_db()
+        self.assertEqual(transcription.status, 'in_progress')
+        self.assertFalse(transcription.transcription_text)
+
+        response = self.client.get(f'/api/transcription/{transcription.id}/partial/').json()
+        self.assertEqual((response['chunks_total'], response['chunks_transcribed']), (3, 2))
+        self.assertEqual(response['transcription_text'], "part 0\npart 2")
+
+        save_transcription_result(chunks[1], {'text': "part 1", 'words': [], 'requests': 1})
+        refresh_transcription_status(transcription)
+        transcription.refresh_from_db()
+        self.assertEqual(transcription.status, 'completed')
+        self.assertEqual(transcription.transcription_text, "part 0\npart 1\npart 2")
+
+    def test_failed_chunks_are_left_out(self):
+        transcription = Transcription.objects.create(is_chunked=True)
+        for index in range(3):
+            chunk = AudioChunk.objects.create(transcription=transcription, chunk_index=index, chunk_file=f"chunk_{index}.wav")
+            save_transcription_result(chunk, None if index == 1 else {'text': f"part {index}", 'words': [], 'requests': 1})
+        refresh_transcription_status(transcription)
+        transcription.refresh_from_db()
+        self.assertEqual((transcription.status, transcription.transcription_text), ('completed', "part 0\npart 2"))